@@ -0,0 +1,344 @@
+"""
+Analytics module for work hours tracker.
+Loads all finished timespans into NumPy arrays once and answers totals,
+subtree rollups, hour/weekday histograms and utilization with vectorized
+operations instead of per-row Python loops.
+
+Requires NumPy (``pip install numpy``); the rest of the tracker does not.
+
+Usage:
+    python analytics.py --since 2024-01-01 --root "Work/Client 1"
+"""
+
+import argparse
+import itertools
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from database import Database, TimeValue, archived_day_range, to_epoch_ms
+from task_manager import TaskManager
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("analytics.py needs NumPy; install it with 'pip install numpy'") from e
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+DAY_MS = 24 * HOUR_MS
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_CHUNK = 250000  # Timespans split into hour pieces at a time (bounds memory use)
+
+
+def _local_offsets(first_hour: int, last_hour: int) -> np.ndarray:
+    """UTC offset in milliseconds of every UTC hour in [first_hour, last_hour]."""
+    return np.array([time.localtime(hour * 3600).tm_gmtoff * 1000
+                     for hour in range(first_hour, last_hour + 1)], dtype=np.int64)
+
+
+class TimespanColumns:
+    """Finished timespans as int64 NumPy columns, keyed by tree position.
+
+    Tasks are numbered in pre-order (each task right before its subtree),
+    so the subtree of the task at position ``i`` is positions ``i`` up to
+    ``subtree_end[i]``. A subtree total is then one difference of prefix
+    sums, and "is in this subtree" is a range check on the position column.
+    Running timespans are left out, as in the stored totals.
+
+    Archived time is only known per task and local day (``archived_totals``).
+    It counts in the totals and in the per-day, per-year and utilization
+    figures (for the days whose midnight lies in the range, like
+    ``Database.get_all_task_totals()``), but not in the hour/weekday histograms.
+    """
+
+    def __init__(self, task_ids: np.ndarray, subtree_end: np.ndarray,
+                 task: np.ndarray, start: np.ndarray, end: np.ndarray,
+                 archived: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None):
+        """Wrap prepared columns; use ``TimespanColumns.load()`` to read a database.
+
+        Args:
+            task_ids: Task ID at each pre-order position
+            subtree_end: Position just past each task's subtree
+            task: Pre-order position of each timespan's task
+            start: Start of each timespan (epoch milliseconds)
+            end: End of each timespan (epoch milliseconds)
+            archived: (task position, local day number since 1970-01-01,
+                seconds) columns of the archived days, if any
+        """
+        self.task_ids = task_ids
+        self.subtree_end = subtree_end
+        self.task = task
+        self.start = start
+        self.end = end
+        if archived is None:
+            archived = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0))
+        self.archived_task, self.archived_day, self.archived_seconds = archived
+        self._positions = {int(task_id): position for position, task_id in enumerate(task_ids)}
+
+    @classmethod
+    def load(cls, db: Database, task_manager: Optional[TaskManager] = None) -> 'TimespanColumns':
+        """Read the task tree and every finished timespan in one pass each."""
+        nodes = (task_manager or TaskManager(db)).get_task_nodes()
+        count = len(nodes)
+        task_ids = np.fromiter((node[0] for node in nodes), dtype=np.int64, count=count)
+
+        # Close every open subtree when a task at the same or a higher level appears
+        subtree_end = np.full(count, count, dtype=np.int64)
+        open_tasks: List[Tuple[int, int]] = []
+        for position, (task_id, parent_id, name, level) in enumerate(nodes):
+            while open_tasks and open_tasks[-1][1] >= level:
+                subtree_end[open_tasks.pop()[0]] = position
+            open_tasks.append((position, level))
+
+        cursor = db.read_connection.cursor()
+        cursor.row_factory = None
+        cursor.execute("SELECT COUNT(*) FROM timespans WHERE end_time IS NOT NULL")
+        rows = cursor.fetchone()[0]
+        cursor.execute("SELECT task_id, start_time, end_time FROM timespans "
+                       "WHERE end_time IS NOT NULL")
+        columns = np.fromiter(itertools.chain.from_iterable(cursor),
+                              dtype=np.int64, count=3 * rows).reshape(rows, 3)
+
+        # Days are few (one row per task and day), so they are read in one go
+        cursor.execute("SELECT task_id, CAST(julianday(day) - 2440587.5 AS INTEGER), seconds "
+                       "FROM archived_totals")
+        days = cursor.fetchall()
+        archived_task = np.array([row[0] for row in days], dtype=np.int64)
+        archived_day = np.array([row[1] for row in days], dtype=np.int64)
+        archived_seconds = np.array([row[2] for row in days], dtype=np.float64)
+
+        # Map task IDs to positions; timespans of tasks outside the tree are dropped
+        lookup = np.full(int(max(task_ids.max(initial=0), columns[:, 0].max(initial=0),
+                                 archived_task.max(initial=0))) + 1,
+                         -1, dtype=np.int64)
+        lookup[task_ids] = np.arange(count, dtype=np.int64)
+        task = lookup[columns[:, 0]]
+        known = task >= 0
+        archived_task = lookup[archived_task]
+        archived_known = archived_task >= 0
+        return cls(task_ids, subtree_end, task[known],
+                   columns[known, 1].copy(), columns[known, 2].copy(),
+                   (archived_task[archived_known], archived_day[archived_known],
+                    archived_seconds[archived_known]))
+
+    def __len__(self) -> int:
+        """Number of timespans."""
+        return len(self.task)
+
+    def position(self, task_id: int) -> int:
+        """Pre-order position of a task."""
+        try:
+            return self._positions[task_id]
+        except KeyError:
+            raise ValueError(f"Task {task_id} does not exist") from None
+
+    def _clipped(self, since: Optional[TimeValue], until: Optional[TimeValue],
+                 root_id: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(task, start, end) of the timespans in a subtree, clipped to [since, until)."""
+        task, start, end = self.task, self.start, self.end
+        if since is not None:
+            start = np.maximum(start, to_epoch_ms(since))
+        if until is not None:
+            end = np.minimum(end, to_epoch_ms(until))
+        keep = end > start
+        if root_id is not None:
+            first = self.position(root_id)
+            keep &= (task >= first) & (task < self.subtree_end[first])
+        return task[keep], start[keep], end[keep]
+
+    def _archived(self, since: Optional[TimeValue], until: Optional[TimeValue],
+                  root_id: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(task, day, seconds) of the archived days in a subtree whose midnight is in range."""
+        task, day = self.archived_task, self.archived_day
+        keep = np.ones(len(task), dtype=bool)
+        first_day, end_day = archived_day_range(since, until)
+        if first_day is not None:
+            keep &= day >= np.datetime64(first_day, 'D').astype(np.int64)
+        if end_day is not None:
+            keep &= day < np.datetime64(end_day, 'D').astype(np.int64)
+        if root_id is not None:
+            first = self.position(root_id)
+            keep &= (task >= first) & (task < self.subtree_end[first])
+        return task[keep], day[keep], self.archived_seconds[keep]
+
+    def own_seconds(self, since: Optional[TimeValue] = None,
+                    until: Optional[TimeValue] = None) -> np.ndarray:
+        """Seconds tracked on each task itself, by pre-order position."""
+        task, start, end = self._clipped(since, until)
+        seconds = np.bincount(task, weights=(end - start) / 1000.0, minlength=len(self.task_ids))
+        task, day, archived_seconds = self._archived(since, until)
+        return seconds + np.bincount(task, weights=archived_seconds, minlength=len(self.task_ids))
+
+    def subtree_seconds(self, own_seconds: np.ndarray) -> np.ndarray:
+        """Roll per-task seconds up the tree: one prefix-sum difference per task."""
+        prefix = np.concatenate(([0.0], np.cumsum(own_seconds)))
+        return prefix[self.subtree_end] - prefix[:-1]
+
+    def totals(self, since: Optional[TimeValue] = None,
+               until: Optional[TimeValue] = None) -> Dict[int, Tuple[float, float]]:
+        """Hours per task, in the format of ``Database.get_all_task_totals()``.
+
+        Returns:
+            Dict mapping task_id to (own_hours, total_hours_including_children)
+        """
+        own = self.own_seconds(since, until)
+        total = self.subtree_seconds(own)
+        return dict(zip(self.task_ids.tolist(), zip((own / 3600.0).tolist(),
+                                                    (total / 3600.0).tolist())))
+
+    def _local_pieces(self, since: Optional[TimeValue], until: Optional[TimeValue],
+                      root_id: Optional[int]) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Timespans cut at local hour boundaries, as (local start ms, milliseconds) chunks.
+
+        Pieces are cut in UTC and then shifted by the local UTC offset of
+        their hour, so durations stay exact across DST changes. Zones with
+        half- or quarter-hour offsets are cut every 15 minutes instead.
+        """
+        task, start, end = self._clipped(since, until, root_id)
+        if not len(start):
+            return
+        first_hour = int(start.min()) // HOUR_MS
+        offsets = _local_offsets(first_hour, int(end.max() - 1) // HOUR_MS)
+        step = HOUR_MS if not (offsets % HOUR_MS).any() else 15 * MINUTE_MS
+
+        for chunk in range(0, len(start), _CHUNK):
+            chunk_start = start[chunk:chunk + _CHUNK]
+            chunk_end = end[chunk:chunk + _CHUNK]
+            first_step = chunk_start // step
+            pieces = (chunk_end - 1) // step - first_step + 1
+            span = np.repeat(np.arange(len(chunk_start)), pieces)
+            piece_step = first_step[span] + (np.arange(len(span)) -
+                                             np.repeat(np.cumsum(pieces) - pieces, pieces))
+            piece_start = np.maximum(chunk_start[span], piece_step * step)
+            piece_end = np.minimum(chunk_end[span], (piece_step + 1) * step)
+            yield (piece_start + offsets[piece_start // HOUR_MS - first_hour],
+                   piece_end - piece_start)
+
+    def weekday_hour_hours(self, root_id: Optional[int] = None,
+                           since: Optional[TimeValue] = None,
+                           until: Optional[TimeValue] = None) -> np.ndarray:
+        """Hours tracked per local weekday (rows, Monday first) and hour of day (columns)."""
+        hours = np.zeros(7 * 24)
+        for local_start, duration in self._local_pieces(since, until, root_id):
+            # 1970-01-01 was a Thursday (weekday 3)
+            weekday = (local_start // DAY_MS + 3) % 7
+            hour = local_start // HOUR_MS % 24
+            hours += np.bincount(weekday * 24 + hour, weights=duration, minlength=7 * 24)
+        return (hours / HOUR_MS).reshape(7, 24)
+
+    def hour_histogram(self, root_id: Optional[int] = None, since: Optional[TimeValue] = None,
+                       until: Optional[TimeValue] = None) -> np.ndarray:
+        """Hours tracked in each local hour of the day (24 values)."""
+        return self.weekday_hour_hours(root_id, since, until).sum(axis=0)
+
+    def weekday_histogram(self, root_id: Optional[int] = None, since: Optional[TimeValue] = None,
+                          until: Optional[TimeValue] = None) -> np.ndarray:
+        """Hours tracked on each local weekday, Monday first (7 values)."""
+        return self.weekday_hour_hours(root_id, since, until).sum(axis=1)
+
+    def daily_hours(self, root_id: Optional[int] = None, since: Optional[TimeValue] = None,
+                    until: Optional[TimeValue] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Hours tracked per local calendar day.
+
+        Returns:
+            (days as datetime64[D], hours) covering every day from the first
+            to the last one with tracked time
+        """
+        pieces = ((local_start // DAY_MS, duration)
+                  for local_start, duration in self._local_pieces(since, until, root_id))
+        task, archived_day, seconds = self._archived(since, until, root_id)
+        if len(archived_day):
+            pieces = itertools.chain(pieces, [(archived_day, seconds * 1000.0)])
+
+        first_day, totals = None, np.zeros(0)
+        for day, duration in pieces:
+            if first_day is None:
+                first_day = int(day.min())
+            elif day.min() < first_day:
+                totals = np.concatenate((np.zeros(first_day - int(day.min())), totals))
+                first_day = int(day.min())
+            counts = np.bincount(day - first_day, weights=duration)
+            if len(counts) > len(totals):
+                totals = np.concatenate((totals, np.zeros(len(counts) - len(totals))))
+            totals[:len(counts)] += counts
+        if first_day is None:
+            return np.zeros(0, dtype='datetime64[D]'), totals
+        days = np.arange(first_day, first_day + len(totals)).astype('datetime64[D]')
+        return days, totals / HOUR_MS
+
+    def yearly_hours(self, root_id: Optional[int] = None) -> Dict[int, float]:
+        """Hours tracked per local calendar year, for year-over-year comparisons."""
+        days, hours = self.daily_hours(root_id)
+        years = days.astype('datetime64[Y]').astype(np.int64) + 1970
+        if not len(years):
+            return {}
+        totals = np.bincount(years - years[0], weights=hours)
+        return {int(years[0]) + offset: float(total) for offset, total in enumerate(totals)}
+
+    def utilization(self, since: TimeValue, until: TimeValue, hours_per_day: float = 8.0,
+                    root_id: Optional[int] = None) -> float:
+        """Tracked hours divided by the working hours (Monday to Friday) in [since, until)."""
+        tracked = self.daily_hours(root_id, since, until)[1].sum()
+        first = np.datetime64(_as_datetime(since).date(), 'D')
+        last = np.datetime64(_as_datetime(until).date(), 'D')
+        workdays = np.busday_count(first, last)
+        return float(tracked / (workdays * hours_per_day)) if workdays else 0.0
+
+
+def _as_datetime(value: TimeValue) -> datetime:
+    """Datetime for a datetime or epoch milliseconds."""
+    return value if isinstance(value, datetime) else datetime.fromtimestamp(value / 1000.0)
+
+
+def _parse_date_arg(value: str) -> datetime:
+    """argparse type for --since/--until."""
+    return datetime.fromisoformat(value)
+
+
+def main(argv=None) -> int:
+    """Print hours per weekday and hour of day, per year and the utilization."""
+    parser = argparse.ArgumentParser(description="Hour/weekday analysis of tracked time.")
+    parser.add_argument('--db', default='workhours.db')
+    parser.add_argument('--since', type=_parse_date_arg)
+    parser.add_argument('--until', type=_parse_date_arg, default=None,
+                        help="End of the range (default: now)")
+    parser.add_argument('--root', help="Only analyse this task path and its children")
+    parser.add_argument('--hours-per-day', type=float, default=8.0,
+                        help="Working hours per weekday, for the utilization")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    try:
+        task_manager = TaskManager(db)
+        root_id = None
+        if args.root:
+            root_id = task_manager.resolve_task_path(args.root, create=False)
+            if root_id is None:
+                print(f"Task {args.root!r} does not exist", file=sys.stderr)
+                return 1
+        columns = TimespanColumns.load(db, task_manager)
+        until = args.until or datetime.now()
+
+        matrix = columns.weekday_hour_hours(root_id, args.since, until)
+        if len(columns.archived_day):
+            print("Archived time is only kept per day; the weekday and hour figures "
+                  "exclude it, the yearly hours and the utilization include it.")
+        print("Hours per weekday: " + "  ".join(
+            f"{day} {hours:.1f}" for day, hours in zip(WEEKDAYS, matrix.sum(axis=1))))
+        print("Hours per hour of day:")
+        for hour, hours in enumerate(matrix.sum(axis=0)):
+            if hours:
+                print(f"  {hour:02d}:00  {hours:8.1f}")
+        print("Hours per year: " + "  ".join(
+            f"{year} {hours:.1f}" for year, hours in columns.yearly_hours(root_id).items()))
+        if args.since:
+            utilization = columns.utilization(args.since, until, args.hours_per_day, root_id)
+            print(f"Utilization: {utilization:.0%} of {args.hours_per_day:g} h per weekday")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,10 +5,14 @@ A simple desktop application to track work hours on different tasks.
 
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-from datetime import datetime
+from background import BackgroundWorker
 from database import Database
+from search import TaskPathIndex
+from events import (DataReset, TaskAdded, TaskDeleted, TaskMoved, TimespanReassigned,
+                    TimespansAdded, TimespanStarted, TimespanStopped)
 from task_manager import TaskManager
 from timer import Timer
+from views import SummaryTotals, TimespanWindow, TreeModel, format_timespan
 
 
 class WorkHoursApp:
@@ -25,12 +29,43 @@ class WorkHoursApp:
         self.task_manager = TaskManager(self.db)
         self.timer = Timer(self.db)
         
+        # Slow queries run here so the window never freezes
+        self.worker = BackgroundWorker(self.db, self.root.after)
+        
         # Selected task ID
         self.selected_task_id = None
         
+        # Rows loaded into the timespans tab (only a window of the history)
+        self.timespan_window = TimespanWindow(self.db)
+        self.selected_timespan_id = None
+        self._timespans_loading = False
+        
+        # What each tree currently shows, so refreshes only apply the differences
+        self.tasks_model = TreeModel()
+        self.summary_model = TreeModel()
+        self.timespans_model = TreeModel()
+        self.timespan_count = 0
+        
+        # Saved hours per task; the running timer's time is added on each tick
+        self.summary_totals = SummaryTotals()
+        self._timer_tick = None
+        
+        # Task picker dialog and its path index, both created on first use
+        self.task_index = None
+        self.task_picker = None
+        
         # Setup UI
         self.setup_ui()
         
+        # Update only what each database change affects
+        self.subscribe_to_changes()
+        
+        # Pick up a timer left running, e.g. one started from tracker.py
+        if self.timer.resume():
+            self.play_button.config(text="⏸ Stop")
+            task_path = self.task_manager.get_task_path(self.timer.current_task_id)
+            self.current_task_label.config(text=f"Task: {task_path}")
+        
         # Start timer update loop
         self.update_timer_display()
         
@@ -158,6 +193,11 @@ class WorkHoursApp:
         # Refresh button
         ttk.Button(parent, text="Refresh Summary", command=self.refresh_summary).grid(row=1, column=0, pady=(5, 0))
         
+        # Shown while the summary is being computed in the background
+        self.summary_progress = ttk.Progressbar(parent, mode='indeterminate')
+        self.summary_progress.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=(5, 0))
+        self.summary_progress.grid_remove()
+        
         self.refresh_summary()
     
     def setup_timespans_tab(self, parent):
@@ -188,76 +228,258 @@ class WorkHoursApp:
         
         # Bind double-click event for editing
         self.timespans_tree.bind('<Double-Button-1>', self.on_timespan_double_click)
+        self.timespans_tree.bind('<<TreeviewSelect>>', self.on_timespan_select)
         
-        # Scrollbar
-        timespans_scroll = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.timespans_tree.yview)
-        timespans_scroll.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        self.timespans_tree.configure(yscrollcommand=timespans_scroll.set)
+        # Scrollbar (scroll events also trigger loading of further pages)
+        self.timespans_scroll = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.timespans_tree.yview)
+        self.timespans_scroll.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.timespans_tree.configure(yscrollcommand=self.on_timespans_scroll)
         
-        # Refresh button
+        # Refresh button and row count
         ttk.Button(parent, text="Refresh Timespans", command=self.refresh_timespans).grid(row=1, column=0, pady=(5, 0))
+        self.timespans_count_label = ttk.Label(parent, text="")
+        self.timespans_count_label.grid(row=2, column=0, sticky=tk.W)
         
         self.refresh_timespans()
     
     def refresh_tasks(self):
         """Refresh the tasks tree display."""
-        # Clear existing items
-        for item in self.tasks_tree.get_children():
-            self.tasks_tree.delete(item)
-        
-        # Get task tree
-        task_tree = self.task_manager.get_task_tree()
-        
-        # Add tasks to tree
-        for task_id, indented_name, level in task_tree:
-            self.tasks_tree.insert('', 'end', iid=str(task_id), text=indented_name, values=(task_id,))
+        self.task_manager.invalidate()  # Re-read tasks added elsewhere, e.g. by tracker.py
+        rows = [(str(task_id), str(parent_id) if parent_id is not None else '', name, (task_id,))
+                for task_id, parent_id, name, level in self.task_manager.get_task_nodes()]
+        self.tasks_model.apply(self.tasks_tree, rows)
     
     def refresh_summary(self):
-        """Refresh the summary display."""
-        # Clear existing items
-        for item in self.summary_tree.get_children():
-            self.summary_tree.delete(item)
-        
-        # Get task tree and add hours
-        task_tree = self.task_manager.get_task_tree()
-        
-        for task_id, indented_name, level in task_tree:
-            hours = self.db.get_task_total_hours(task_id, include_children=True)
-            self.summary_tree.insert(
-                '', 'end', 
-                text=indented_name, 
-                values=(f"{hours:.2f}",)
-            )
+        """Recompute the summary in the background; the tree updates when it is done.
+        
+        A refresh requested while another one is still running replaces it.
+        """
+        self.summary_progress.grid()
+        self.summary_progress.start(10)
+        self.worker.submit('summary', self.compute_summary_rows,
+                           self.show_summary_rows, self.on_summary_error)
+    
+    def compute_summary_rows(self, db):
+        """Build the summary rows (runs on the worker thread, no widget access)."""
+        # Get task tree and all totals in a single query
+        totals = db.get_all_task_totals()
+        
+        rows = []
+        parents = {}
+        hours_by_task = {}
+        for task_id, parent_id, name, level in TaskManager(db).get_task_nodes():
+            own_hours, hours = totals.get(task_id, (0.0, 0.0))
+            parent_iid = str(parent_id) if parent_id is not None else ''
+            rows.append((str(task_id), parent_iid, name, (f"{hours:.2f}",)))
+            parents[task_id] = parent_id
+            hours_by_task[task_id] = hours
+        return rows, parents, hours_by_task
+    
+    def show_summary_rows(self, result):
+        """Apply freshly computed summary rows to the tree."""
+        rows, parents, hours_by_task = result
+        self.summary_model.apply(self.summary_tree, rows)
+        self.summary_totals.load(parents, hours_by_task)
+        self.show_live_totals()
+        self.summary_progress.stop()
+        self.summary_progress.grid_remove()
+    
+    def on_summary_error(self, error):
+        """Report a failed summary computation."""
+        self.summary_progress.stop()
+        self.summary_progress.grid_remove()
+        messagebox.showerror("Error", f"Failed to compute summary: {error}")
     
     def refresh_timespans(self):
-        """Refresh the timespans display."""
-        # Clear existing items
-        for item in self.timespans_tree.get_children():
-            self.timespans_tree.delete(item)
-        
-        # Get all timespans
-        timespans = self.db.get_all_timespans()
+        """Refresh the timespans display with the newest page of history."""
+        self.timespan_window.reset()
+        self.show_timespan_window()
+        self.restore_timespan_selection()
+        self.recount_timespans()
+    
+    def recount_timespans(self):
+        """Count the timespans in the background; the label updates when it is done."""
+        self.worker.submit('timespan_count', lambda db: db.count_timespans(),
+                           self.show_timespan_count)
+    
+    def show_timespan_count(self, count):
+        """Show a freshly computed timespan count."""
+        self.timespan_count = count
+        self.update_timespan_count()
+    
+    def add_to_timespan_count(self, delta):
+        """Adjust the shown timespan count after a change."""
+        if self.worker.is_busy('timespan_count'):
+            # The running count may predate this change, so start over
+            self.recount_timespans()
+            return
+        self.timespan_count += delta
+        self.update_timespan_count()
+    
+    def update_timespan_count(self):
+        """Show the number of recorded timespans."""
+        self.timespans_count_label.config(text=f"{self.timespan_count} timespans")
+    
+    def show_timespan_window(self):
+        """Update the timespans tree to match the loaded window."""
+        rows = [(str(row[0]), '', '', format_timespan(row)) for row in self.timespan_window.rows]
+        self.timespans_model.apply(self.timespans_tree, rows)
+    
+    def subscribe_to_changes(self):
+        """Subscribe the views to database change events."""
+        events = self.db.events
+        events.subscribe(TaskAdded, self.on_task_added)
+        events.subscribe(TaskDeleted, self.on_task_deleted)
+        events.subscribe(TaskMoved, self.on_tasks_reloaded)
+        events.subscribe(DataReset, self.on_tasks_reloaded)
+        events.subscribe(TimespanStarted, self.on_timespan_started)
+        events.subscribe(TimespanStopped, self.on_timespan_stopped)
+        events.subscribe(TimespanReassigned, self.on_timespan_reassigned)
+        events.subscribe(TimespansAdded, self.on_timespans_added)
+    
+    def on_task_added(self, event):
+        """Add the new task's row to the task and summary trees."""
+        parent_iid = str(event.parent_id) if event.parent_id is not None else ''
+        iid = str(event.task_id)
+        self.tasks_model.set_row(self.tasks_tree, iid, parent_iid, event.name, (event.task_id,))
+        if self.worker.is_busy('summary'):
+            self.refresh_summary()
+        else:
+            self.summary_model.set_row(self.summary_tree, iid, parent_iid, event.name, ("0.00",))
+            self.summary_totals.add_task(event.task_id, event.parent_id)
+    
+    def on_task_deleted(self, event):
+        """Remove the deleted subtree and its timespans, and fix the ancestors' hours."""
+        iid = str(event.task_id)
+        self.tasks_model.remove(self.tasks_tree, iid)
+        self.summary_model.remove(self.summary_tree, iid)
+        self.summary_totals.remove_tasks(event.deleted_ids)
+        if self.worker.is_busy('summary'):
+            self.refresh_summary()
+        elif event.parent_id is not None:
+            self.update_summary_totals(event.parent_id)
+        if self.timespan_window.remove_tasks(event.deleted_ids):
+            self.show_timespan_window()
+        self.add_to_timespan_count(-event.timespan_count)
+    
+    def on_tasks_reloaded(self, event):
+        """Reload every view after the hierarchy or the totals changed wholesale."""
+        self.refresh_tasks()
+        self.refresh_summary()
+        self.refresh_timespans()
+    
+    def on_timespan_started(self, event):
+        """Show the new running timespan."""
+        self.update_timespan_row(event.timespan_id)
+        self.add_to_timespan_count(1)
+    
+    def on_timespan_stopped(self, event):
+        """Show the end time and add the hours to the task and its ancestors."""
+        self.update_timespan_row(event.timespan_id)
+        self.update_summary_totals(event.task_id)
+        if event.timespan_id != self.timer.current_timespan_id:
+            self.show_live_totals()
+    
+    def on_timespan_reassigned(self, event):
+        """Show the new task and move the hours between the two ancestor chains."""
+        if event.timespan_id == self.timer.current_timespan_id:
+            # The running timespan now counts towards the other task
+            self.timer.current_task_id = event.new_task_id
+            task_path = self.task_manager.get_task_path(event.new_task_id)
+            self.current_task_label.config(text=f"Task: {task_path}")
+        self.update_timespan_row(event.timespan_id)
+        self.update_summary_totals(event.old_task_id)
+        self.update_summary_totals(event.new_task_id)
+        self.show_live_totals()
+    
+    def on_timespans_added(self, event):
+        """Reload the views touched by a bulk insert."""
+        self.refresh_summary()
+        self.refresh_timespans()
+    
+    def update_summary_totals(self, task_id):
+        """Update the hours shown for a task and its ancestors."""
+        if self.worker.is_busy('summary'):
+            # The running computation may predate this change, so start over
+            self.refresh_summary()
+            return
+        for ancestor_id, (own_hours, hours) in self.db.get_ancestor_totals(task_id).items():
+            self.summary_totals.hours[ancestor_id] = hours
+            self.summary_model.set_values(self.summary_tree, str(ancestor_id), (f"{hours:.2f}",))
+    
+    def show_live_totals(self):
+        """Add the running timer's unsaved time to its task and ancestors in the summary.
         
-        for ts in timespans:
-            task_name = ts['task_name']
-            start_time = datetime.fromisoformat(ts['start_time']).strftime('%Y-%m-%d %H:%M:%S')
-            
-            if ts['end_time']:
-                end_time = datetime.fromisoformat(ts['end_time']).strftime('%Y-%m-%d %H:%M:%S')
-                start_dt = datetime.fromisoformat(ts['start_time'])
-                end_dt = datetime.fromisoformat(ts['end_time'])
-                duration_seconds = (end_dt - start_dt).total_seconds()
-                duration = f"{duration_seconds / 3600:.2f}h"
-            else:
-                end_time = "Running..."
-                duration = "N/A"
-            
-            self.timespans_tree.insert(
-                '', 'end',
-                iid=str(ts['id']),
-                values=(task_name, start_time, end_time, duration)
+        Uses the in-memory totals only, so it is cheap enough to run on every tick.
+        """
+        if not self.timer.is_running:
+            return
+        elapsed_hours = self.timer.get_elapsed_time().total_seconds() / 3600.0
+        live = self.summary_totals.live_hours(self.timer.current_task_id, elapsed_hours)
+        for task_id, hours in live.items():
+            self.summary_model.set_values(self.summary_tree, str(task_id), (f"{hours:.2f}",))
+    
+    def update_timespan_row(self, timespan_id):
+        """Insert or update one timespan row if it falls inside the loaded window."""
+        row = self.db.get_timespan_row(timespan_id)
+        if row is None:
+            return
+        index, dropped = self.timespan_window.upsert(row)
+        for old_row in dropped:
+            self.timespans_model.remove(self.timespans_tree, str(old_row[0]))
+        if index is not None:
+            self.timespans_model.set_row(
+                self.timespans_tree, str(row[0]), '', '', format_timespan(row), index
             )
     
+    def on_timespans_scroll(self, first, last):
+        """Update the scrollbar and load more rows when nearing either end."""
+        self.timespans_scroll.set(first, last)
+        if self._timespans_loading:
+            return
+        if float(last) > 0.9 and self.timespan_window.has_older:
+            self._timespans_loading = True
+            self.root.after_idle(self.load_older_timespans)
+        elif float(first) < 0.1 and self.timespan_window.has_newer:
+            self._timespans_loading = True
+            self.root.after_idle(self.load_newer_timespans)
+    
+    def load_older_timespans(self):
+        """Append older rows at the bottom and drop rows far above the view."""
+        anchor = self.timespans_tree.identify_row(0)
+        self.timespan_window.load_older()
+        self.show_timespan_window()
+        self.keep_timespan_anchor(anchor)
+        self._timespans_loading = False
+    
+    def load_newer_timespans(self):
+        """Prepend newer rows at the top and drop rows far below the view."""
+        anchor = self.timespans_tree.identify_row(0)
+        self.timespan_window.load_newer()
+        self.show_timespan_window()
+        self.keep_timespan_anchor(anchor)
+        self._timespans_loading = False
+    
+    def keep_timespan_anchor(self, anchor):
+        """Scroll so the row that was at the top stays there after rows moved."""
+        if anchor and self.timespans_tree.exists(anchor):
+            total = len(self.timespans_tree.get_children())
+            self.timespans_tree.yview_moveto(self.timespans_tree.index(anchor) / max(total, 1))
+        self.restore_timespan_selection()
+    
+    def restore_timespan_selection(self):
+        """Re-select the chosen timespan whenever it is inside the loaded window."""
+        iid = str(self.selected_timespan_id)
+        if self.selected_timespan_id is not None and self.timespans_tree.exists(iid):
+            if self.timespans_tree.selection() != (iid,):
+                self.timespans_tree.selection_set(iid)
+    
+    def on_timespan_select(self, event):
+        """Remember the selected timespan by ID so it survives window changes."""
+        selection = self.timespans_tree.selection()
+        if selection:
+            self.selected_timespan_id = int(selection[0])
+    
     def on_task_select(self, event):
         """Handle task selection."""
         selection = self.tasks_tree.selection()
@@ -279,74 +501,124 @@ class WorkHoursApp:
             try:
                 # Update the timespan with new task
                 self.db.update_timespan_task(timespan_id, new_task_id)
-                # Refresh displays
-                self.refresh_timespans()
-                self.refresh_summary()
                 messagebox.showinfo("Success", "Timespan task updated successfully!")
             except ValueError as e:
                 messagebox.showerror("Error", f"Failed to update timespan: {e}")
     
     def show_task_selection_dialog(self):
-        """Show dialog to select a task. Returns selected task_id or None."""
+        """Show dialog to select a task. Returns selected task_id or None.
+        
+        The dialog is built once and only hidden when closed, so reopening it
+        is instant. Typing filters tasks by any part of their path.
+        """
+        if self.task_picker is None:
+            self.build_task_picker()
+        
+        self.task_picker_choice = None
+        self.task_picker_query.set('')  # Also fills the list
+        self.task_picker.deiconify()
+        self.task_picker.grab_set()
+        self.task_picker_entry.focus_set()
+        
+        # Wait until Select or Cancel is pressed
+        self.root.wait_variable(self.task_picker_done)
+        
+        self.task_picker.grab_release()
+        self.task_picker.withdraw()
+        return self.task_picker_choice
+    
+    def build_task_picker(self):
+        """Create the (hidden) task picker dialog and the task path index."""
+        self.task_index = TaskPathIndex.for_task_manager(self.task_manager)
+        
         dialog = tk.Toplevel(self.root)
         dialog.title("Select Task")
         dialog.geometry("400x500")
         dialog.transient(self.root)
-        dialog.grab_set()
-        
-        selected_task_id = [None]  # Use list to store result from nested function
+        dialog.withdraw()
+        dialog.protocol("WM_DELETE_WINDOW", self.cancel_task_picker)
+        self.task_picker = dialog
+        self.task_picker_done = tk.BooleanVar(dialog)
+        self.task_picker_ids = []
         
-        # Create frame for tree
+        # Create frame for the search box and the matches
         frame = ttk.Frame(dialog, padding="10")
         frame.pack(fill=tk.BOTH, expand=True)
         
         # Label
-        ttk.Label(frame, text="Select a task:", font=("Arial", 12)).pack(pady=(0, 10))
+        ttk.Label(frame, text="Type to search tasks:", font=("Arial", 12)).pack(pady=(0, 10))
+        
+        # Search box
+        self.task_picker_query = tk.StringVar(dialog)
+        self.task_picker_query.trace_add('write', lambda *args: self.filter_task_picker())
+        self.task_picker_entry = ttk.Entry(frame, textvariable=self.task_picker_query)
+        self.task_picker_entry.pack(fill=tk.X, pady=(0, 5))
         
-        # Task tree
-        tree = ttk.Treeview(frame, selectmode='browse')
-        tree.pack(fill=tk.BOTH, expand=True)
+        # Matching task paths
+        self.task_picker_list = tk.Listbox(frame, activestyle='dotbox', exportselection=False)
+        self.task_picker_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
         # Scrollbar
-        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.task_picker_list.yview)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        tree.configure(yscrollcommand=scrollbar.set)
+        self.task_picker_list.configure(yscrollcommand=scrollbar.set)
         
-        # Populate tree with tasks
-        task_tree = self.task_manager.get_task_tree()
-        for task_id, indented_name, level in task_tree:
-            tree.insert('', 'end', iid=str(task_id), text=indented_name)
+        # Keyboard: arrows move through the matches, Enter picks, Escape cancels
+        self.task_picker_entry.bind('<Down>', lambda event: self.move_task_picker_selection(1))
+        self.task_picker_entry.bind('<Up>', lambda event: self.move_task_picker_selection(-1))
+        dialog.bind('<Return>', lambda event: self.select_task_picker())
+        dialog.bind('<Escape>', lambda event: self.cancel_task_picker())
+        self.task_picker_list.bind('<Double-Button-1>', lambda event: self.select_task_picker())
         
         # Button frame
         button_frame = ttk.Frame(dialog, padding="10")
         button_frame.pack(fill=tk.X)
         
-        def on_select():
-            selection = tree.selection()
-            if selection:
-                selected_task_id[0] = int(selection[0])
-                dialog.destroy()
-            else:
-                messagebox.showwarning("No Selection", "Please select a task.")
-        
-        def on_cancel():
-            dialog.destroy()
-        
-        ttk.Button(button_frame, text="Select", command=on_select).pack(side=tk.LEFT, padx=5)
-        ttk.Button(button_frame, text="Cancel", command=on_cancel).pack(side=tk.LEFT, padx=5)
-        
-        # Wait for dialog to close
-        self.root.wait_window(dialog)
-        
-        return selected_task_id[0]
+        ttk.Button(button_frame, text="Select", command=self.select_task_picker).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Cancel", command=self.cancel_task_picker).pack(side=tk.LEFT, padx=5)
+    
+    def filter_task_picker(self):
+        """Show the best matches for the current search text."""
+        matches = self.task_index.search(self.task_picker_query.get(), limit=200)
+        self.task_picker_ids = [task_id for task_id, path in matches]
+        self.task_picker_list.delete(0, tk.END)
+        if matches:
+            self.task_picker_list.insert(tk.END, *(path for task_id, path in matches))
+            self.task_picker_list.selection_set(0)
+            self.task_picker_list.activate(0)
+    
+    def move_task_picker_selection(self, step):
+        """Move the highlighted match up or down."""
+        if not self.task_picker_ids:
+            return 'break'
+        selection = self.task_picker_list.curselection()
+        index = selection[0] + step if selection else 0
+        index = max(0, min(index, len(self.task_picker_ids) - 1))
+        self.task_picker_list.selection_clear(0, tk.END)
+        self.task_picker_list.selection_set(index)
+        self.task_picker_list.activate(index)
+        self.task_picker_list.see(index)
+        return 'break'
+    
+    def select_task_picker(self):
+        """Close the picker with the highlighted task."""
+        selection = self.task_picker_list.curselection()
+        if not selection:
+            messagebox.showwarning("No Selection", "Please select a task.", parent=self.task_picker)
+            return
+        self.task_picker_choice = self.task_picker_ids[selection[0]]
+        self.task_picker_done.set(True)
+    
+    def cancel_task_picker(self):
+        """Close the picker without a choice."""
+        self.task_picker_choice = None
+        self.task_picker_done.set(True)
     
     def add_root_task(self):
         """Add a new root task."""
         name = simpledialog.askstring("Add Root Task", "Enter task name:")
         if name:
             self.task_manager.add_task(name, parent_id=None)
-            self.refresh_tasks()
-            self.refresh_summary()
     
     def add_child_task(self):
         """Add a child task to selected task."""
@@ -357,8 +629,6 @@ class WorkHoursApp:
         name = simpledialog.askstring("Add Child Task", "Enter task name:")
         if name:
             self.task_manager.add_task(name, parent_id=self.selected_task_id)
-            self.refresh_tasks()
-            self.refresh_summary()
     
     def delete_task(self):
         """Delete selected task."""
@@ -369,17 +639,22 @@ class WorkHoursApp:
         if messagebox.askyesno("Confirm Delete", "Delete this task and all its children?"):
             self.task_manager.delete_task(self.selected_task_id)
             self.selected_task_id = None
-            self.refresh_tasks()
-            self.refresh_summary()
     
     def toggle_timer(self):
         """Toggle timer play/stop."""
         if self.timer.is_running:
-            self.timer.stop()
-            self.play_button.config(text="▶ Play")
-            self.current_task_label.config(text="No task selected")
-            self.refresh_timespans()
-            self.refresh_summary()
+            if not self.timer.stop() and self.timer.resume():
+                # Stopped from the command line or the API, and another timer
+                # started there since: show that one instead of stopping it
+                self.play_button.config(text="⏸ Stop")
+                task_path = self.task_manager.get_task_path(self.timer.current_task_id)
+                self.current_task_label.config(text=f"Task: {task_path}")
+                messagebox.showinfo("Timer Changed",
+                                    f"The timer was switched elsewhere to {task_path}.")
+            else:
+                self.play_button.config(text="▶ Play")
+                self.current_task_label.config(text="No task selected")
+            self.restart_timer_display()
         else:
             if self.selected_task_id is None:
                 messagebox.showwarning("No Selection", "Please select a task first.")
@@ -389,20 +664,33 @@ class WorkHoursApp:
             self.play_button.config(text="⏸ Stop")
             task_path = self.task_manager.get_task_path(self.selected_task_id)
             self.current_task_label.config(text=f"Task: {task_path}")
+            self.restart_timer_display()
     
     def update_timer_display(self):
-        """Update timer display every second.
+        """Update the timer display and the running task's hours in the summary.
         
-        This runs continuously to keep the display updated, showing either
-        the elapsed time (when running) or 00:00:00 (when stopped).
+        While the timer runs, the next update is scheduled for the next whole
+        second of the wall clock, so ticks never drift.
+        When nothing runs the loop pauses until restart_timer_display().
+        Each tick also picks up tasks added by other processes.
         """
+        self._timer_tick = None
+        if self.task_manager.check_outside_changes():
+            self.refresh_tasks()
+            self.refresh_summary()
         if self.timer.is_running:
             self.timer_label.config(text=self.timer.format_elapsed_time())
+            self.show_live_totals()
+            self._timer_tick = self.root.after(self.timer.ms_until_next_second(),
+                                               self.update_timer_display)
         else:
             self.timer_label.config(text="00:00:00")
-        
-        # Schedule next update (always runs to keep display current)
-        self.root.after(1000, self.update_timer_display)
+    
+    def restart_timer_display(self):
+        """Cancel a pending tick and update the timer display right away."""
+        if self._timer_tick is not None:
+            self.root.after_cancel(self._timer_tick)
+        self.update_timer_display()
     
     def on_closing(self):
         """Handle application closing."""
@@ -412,6 +700,7 @@ class WorkHoursApp:
             else:
                 return
         
+        self.worker.stop()
         self.db.close()
         self.root.destroy()
 
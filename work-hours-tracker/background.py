@@ -0,0 +1,135 @@
+"""
+Background work module for work hours tracker.
+Runs slow queries on a worker thread and hands the results back to the GUI loop.
+"""
+
+import queue
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Optional
+from database import Database
+
+
+class BackgroundWorker:
+    """Runs computations on one worker thread with its own database connection.
+
+    Jobs are submitted under a key such as 'summary'. Submitting again under
+    the same key makes the earlier job stale: it is skipped if it has not
+    started yet, its running SQL query is interrupted, and its result is
+    never delivered. Results are handed to the main loop through
+    ``schedule`` (``root.after``), so callbacks may safely touch widgets.
+    """
+
+    def __init__(self, db: Database, schedule: Callable[[int, Callable], Any],
+                 poll_ms: int = 50):
+        """Start the worker thread.
+
+        Args:
+            db: Database to read from (the worker gets its own connection)
+            schedule: ``root.after``-like function used to poll for results
+            poll_ms: Delay between polls while jobs are outstanding
+        """
+        self.db = db
+        self.schedule = schedule
+        self.poll_ms = poll_ms
+        self._jobs: queue.Queue = queue.Queue()
+        self._results: queue.Queue = queue.Queue()
+        self._generations: Dict[str, int] = {}
+        self._outstanding: Dict[str, int] = {}
+        self._polling = False
+        self._thread = threading.Thread(target=self._run, name='workhours-background',
+                                        daemon=True)
+        self._thread.start()
+
+    def submit(self, key: str, compute: Callable[[Database], Any],
+               on_done: Callable[[Any], None],
+               on_error: Optional[Callable[[Exception], None]] = None) -> int:
+        """Queue ``compute(db)`` on the worker, replacing any job with the same key.
+
+        Args:
+            key: Job name; only the newest job per key delivers a result
+            compute: Runs on the worker thread; must not touch widgets
+            on_done: Called on the main loop with the result
+            on_error: Called on the main loop with the exception, if any
+
+        Returns:
+            Generation number of the submitted job
+        """
+        generation = self._generations.get(key, 0) + 1
+        self._generations[key] = generation
+        self._outstanding[key] = generation
+        self._jobs.put((key, generation, compute, on_done, on_error))
+        if not self._polling:
+            self._polling = True
+            self.schedule(self.poll_ms, self._poll)
+        return generation
+
+    def cancel(self, key: str):
+        """Make the current job under a key stale without submitting a new one."""
+        self._generations[key] = self._generations.get(key, 0) + 1
+        self._outstanding.pop(key, None)
+
+    def is_busy(self, key: Optional[str] = None) -> bool:
+        """Whether a job (under ``key``, or any job) has not delivered yet."""
+        return key in self._outstanding if key is not None else bool(self._outstanding)
+
+    def _is_stale(self, key: str, generation: int) -> bool:
+        """Whether a newer job was submitted (or the job was cancelled)."""
+        return self._generations.get(key) != generation
+
+    def _run(self):
+        """Worker thread: run jobs until stop() queues None."""
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    return
+                key, generation, compute, on_done, on_error = job
+                if self._is_stale(key, generation):
+                    continue
+
+                # SQLite calls this every few thousand VM steps; non-zero aborts the query
+                connection = self.db.connection
+                connection.set_progress_handler(
+                    lambda: self._is_stale(key, generation), 10000
+                )
+                try:
+                    result, error = compute(self.db), None
+                except sqlite3.OperationalError as e:
+                    if self._is_stale(key, generation):
+                        continue
+                    result, error = None, e
+                except Exception as e:
+                    result, error = None, e
+                finally:
+                    connection.set_progress_handler(None, 0)
+                self._results.put((key, generation, result, error, on_done, on_error))
+        finally:
+            self.db.connections.release_thread()
+
+    def _poll(self):
+        """Main loop: deliver finished results and keep polling while busy."""
+        while True:
+            try:
+                key, generation, result, error, on_done, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if self._is_stale(key, generation):
+                continue
+            self._outstanding.pop(key, None)
+            if error is None:
+                on_done(result)
+            elif on_error is not None:
+                on_error(error)
+
+        if self._outstanding:
+            self.schedule(self.poll_ms, self._poll)
+        else:
+            self._polling = False
+
+    def stop(self, timeout: float = 1.0):
+        """Cancel all jobs and stop the worker thread."""
+        for key in list(self._generations):
+            self.cancel(key)
+        self._jobs.put(None)
+        self._thread.join(timeout)
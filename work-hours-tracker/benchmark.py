@@ -0,0 +1,415 @@
+"""
+Benchmark script for work hours tracker.
+Generates a large synthetic database (10k tasks and 1M timespans by default)
+and times the task tree, totals, timespan queries and headless equivalents of
+the GUI refreshes. Timings can be written as JSON and checked against
+per-benchmark thresholds, e.g. before and after upgrading SQLite or Python:
+
+    python benchmark.py --db /tmp/bench.db --write-thresholds thresholds.json
+    python benchmark.py --db /tmp/bench.db --check thresholds.json --json results.json
+
+With --bare, each benchmark also runs on a copy without indexes and with
+SQLite's default PRAGMAs. With --memory, all timespans are also loaded as
+sqlite3.Row objects, Timespan records and a TimespanArray, and the memory
+each result holds is measured.
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Dict, List
+from database import Database, ConnectionProfile, from_epoch_ms, to_epoch_ms
+from records import TIMESPAN_COLUMNS
+from task_manager import TaskManager
+from views import TimespanWindow, TreeModel, format_timespan
+
+INDEXES = ['idx_timespans_task', 'idx_timespans_start', 'idx_tasks_parent',
+           'idx_timespans_running']
+
+
+def generate_database(db_path: str, num_tasks: int = 10000, num_timespans: int = 1000000,
+                      fanout: int = 8, depth: int = 6, years: int = 3, seed: int = 0) -> Database:
+    """Create a database filled with a random task tree and timespans.
+    
+    Args:
+        db_path: File to create
+        num_tasks: Number of tasks
+        num_timespans: Number of (finished) timespans
+        fanout: Maximum number of children per task
+        depth: Maximum number of levels in the tree
+        years: How far back the timespans go
+        seed: Random seed, so runs are comparable
+    """
+    rng = random.Random(seed)
+    db = Database(db_path)
+
+    # Tasks: each new task hangs under a random earlier task that still has room
+    with db.batch():
+        task_ids = [db.add_task('Task 1')]
+        open_parents = [task_ids[0]]
+        child_count = {task_ids[0]: 0}
+        level = {task_ids[0]: 0}
+        for number in range(2, num_tasks + 1):
+            if not open_parents:
+                raise ValueError(f"A tree with fan-out {fanout} and depth {depth} "
+                                 f"cannot hold {num_tasks} tasks")
+            parent_id = rng.choice(open_parents)
+            child_count[parent_id] += 1
+            if child_count[parent_id] >= fanout:
+                open_parents.remove(parent_id)
+            task_id = db.add_task(f'Task {number}', parent_id)
+            task_ids.append(task_id)
+            child_count[task_id] = 0
+            level[task_id] = level[parent_id] + 1
+            if level[task_id] < depth - 1:
+                open_parents.append(task_id)
+
+    # Timespans: 5 minutes to 4 hours each, starting on weekdays between 8:00
+    # and 18:00 over the last few years. A fifth of the tasks get most of them.
+    now = datetime.now()
+    first_day = (now - timedelta(days=365 * years)).replace(hour=0, minute=0, second=0,
+                                                            microsecond=0)
+    workdays = [to_epoch_ms(first_day + timedelta(days=day))
+                for day in range(365 * years)
+                if (first_day + timedelta(days=day)).weekday() < 5]
+    busy_tasks = rng.sample(task_ids, max(1, len(task_ids) // 5))
+
+    def timespans():
+        for _ in range(num_timespans):
+            span_start = rng.choice(workdays) + rng.randrange(8 * 3600 * 1000, 18 * 3600 * 1000)
+            span_end = span_start + rng.randrange(5 * 60 * 1000, 4 * 3600 * 1000)
+            task_id = rng.choice(busy_tasks) if rng.random() < 0.8 else rng.choice(task_ids)
+            yield task_id, span_start, span_end
+
+    db.add_timespans(timespans())
+    return db
+
+
+def make_bare_copy(source: Database, db_path: str) -> Database:
+    """Copy a database, drop the lookup indexes and reopen it with default PRAGMAs."""
+    target = sqlite3.connect(db_path)
+    source.connection.backup(target)
+    target.execute("PRAGMA journal_mode = DELETE")
+    for index in INDEXES:
+        target.execute(f"DROP INDEX IF EXISTS {index}")
+    target.commit()
+    target.close()
+    return Database(db_path, profile=ConnectionProfile.bare())
+
+
+class NullTree:
+    """Stand-in for ttk.Treeview that ignores every call, so the view models
+    can be timed without a display."""
+
+    def insert(self, *args, **kwargs):
+        pass
+
+    def move(self, *args, **kwargs):
+        pass
+
+    def item(self, *args, **kwargs):
+        pass
+
+    def delete(self, *args, **kwargs):
+        pass
+
+
+def task_tree_cold(db: Database, task_manager: TaskManager):
+    """Task tree from a fresh TaskManager (reads every task)."""
+    return TaskManager(db).get_task_tree()
+
+
+def task_tree_cached(db: Database, task_manager: TaskManager):
+    """Task tree from a TaskManager whose task maps are already loaded."""
+    return task_manager.get_task_tree()
+
+
+def every_task_path(db: Database, task_manager: TaskManager):
+    """get_task_path() for every task."""
+    return [task_manager.get_task_path(task_id) for task_id, name, level in
+            task_manager.get_task_tree()]
+
+
+def every_task_total(db: Database, task_manager: TaskManager):
+    """get_task_total_hours() for every task, one query each."""
+    return [db.get_task_total_hours(task_id) for task_id, name, level in
+            task_manager.get_task_tree()]
+
+
+def all_task_totals(db: Database, task_manager: TaskManager):
+    """Totals of every task in one query."""
+    return db.get_all_task_totals()
+
+
+def recent_task_totals(db: Database, task_manager: TaskManager):
+    """Totals restricted to the last 30 days (computed from raw timespans)."""
+    return db.get_all_task_totals(since=datetime.now() - timedelta(days=30))
+
+
+def all_timespans(db: Database, task_manager: TaskManager):
+    """Every timespan with its task name."""
+    return db.get_all_timespans()
+
+
+def refresh_summary(db: Database, task_manager: TaskManager):
+    """Headless equivalent of WorkHoursApp.refresh_summary (a full rebuild)."""
+    totals = db.get_all_task_totals()
+    rows = []
+    for task_id, parent_id, name, level in TaskManager(db).get_task_nodes():
+        own_hours, hours = totals.get(task_id, (0.0, 0.0))
+        parent_iid = str(parent_id) if parent_id is not None else ''
+        rows.append((str(task_id), parent_iid, name, (f"{hours:.2f}",)))
+    return TreeModel().apply(NullTree(), rows)
+
+
+def refresh_timespans(db: Database, task_manager: TaskManager):
+    """Headless equivalent of WorkHoursApp.refresh_timespans."""
+    window = TimespanWindow(db)
+    window.reset()
+    rows = [(str(row[0]), '', '', format_timespan(row)) for row in window.rows]
+    TreeModel().apply(NullTree(), rows)
+    return db.count_timespans()
+
+
+def timespan_rows(db: Database, task_manager: TaskManager):
+    """Every timespan with its task name as sqlite3.Row objects."""
+    cursor = db.connection.cursor()
+    cursor.row_factory = sqlite3.Row
+    cursor.execute(f"""
+        SELECT {TIMESPAN_COLUMNS} FROM timespans t
+        JOIN tasks ON t.task_id = tasks.id
+        ORDER BY t.start_time DESC
+    """)
+    return cursor.fetchall()
+
+
+def timespan_array(db: Database, task_manager: TaskManager):
+    """Every timespan with its task name in a TimespanArray."""
+    return db.get_timespan_array()
+
+
+def per_task_timespans(db: Database, task_manager: TaskManager):
+    """Fetch the timespans of 200 tasks one by one."""
+    for task_id in range(1, 201):
+        db.get_timespans_for_task(task_id)
+
+
+def weekday_hour_python(db: Database, task_manager: TaskManager):
+    """Hours per weekday and hour of day with a Python loop over all timespans."""
+    hours = [[0.0] * 24 for _ in range(7)]
+    for ts in db.get_all_timespans():
+        if ts.end_time is None:
+            continue
+        moment, end = from_epoch_ms(ts.start_time), from_epoch_ms(ts.end_time)
+        while moment < end:
+            piece_end = min(end, moment.replace(minute=0, second=0, microsecond=0) +
+                            timedelta(hours=1))
+            hours[moment.weekday()][moment.hour] += (piece_end - moment).total_seconds() / 3600
+            moment = piece_end
+    return hours
+
+
+_columns: Dict[int, object] = {}  # id(db) -> loaded analytics.TimespanColumns
+
+
+def load_columns(db: Database, task_manager: TaskManager):
+    """Load the timespans into NumPy arrays (analytics.py)."""
+    from analytics import TimespanColumns
+    _columns[id(db)] = TimespanColumns.load(db, task_manager)
+    return _columns[id(db)]
+
+
+def columns_of(db: Database, task_manager: TaskManager):
+    """NumPy columns of a database, loaded on first use."""
+    if id(db) not in _columns:
+        return load_columns(db, task_manager)
+    return _columns[id(db)]
+
+
+def numpy_totals(db: Database, task_manager: TaskManager):
+    """Own and subtree totals of every task from the loaded arrays."""
+    return columns_of(db, task_manager).totals()
+
+
+def numpy_recent_totals(db: Database, task_manager: TaskManager):
+    """Totals of the last 30 days from the loaded arrays."""
+    return columns_of(db, task_manager).totals(since=datetime.now() - timedelta(days=30))
+
+
+def numpy_weekday_hour(db: Database, task_manager: TaskManager):
+    """Hours per weekday and hour of day from the loaded arrays."""
+    return columns_of(db, task_manager).weekday_hour_hours()
+
+
+# Run only when NumPy is installed; compare with the SQL + Python rows above
+ANALYTICS_BENCHMARKS = [
+    ('weekday x hour, Python', weekday_hour_python),
+    ('numpy: load columns', load_columns),
+    ('numpy: all task totals', numpy_totals),
+    ('numpy: last 30 days', numpy_recent_totals),
+    ('numpy: weekday x hour', numpy_weekday_hour),
+]
+
+BENCHMARKS = [
+    ('task tree, cold', task_tree_cold),
+    ('task tree, cached', task_tree_cached),
+    ('path of every task', every_task_path),
+    ('total of every task', every_task_total),
+    ('all task totals', all_task_totals),
+    ('totals, last 30 days', recent_task_totals),
+    ('all timespans', all_timespans),
+    ('summary refresh', refresh_summary),
+    ('timespans refresh', refresh_timespans),
+    ('timespans of 200 tasks', per_task_timespans),
+]
+
+
+# Run with --memory: the same rows in three representations
+MEMORY_BENCHMARKS = [
+    ('timespans as sqlite3.Row', timespan_rows),
+    ('timespans as Timespan', all_timespans),
+    ('timespans as TimespanArray', timespan_array),
+]
+
+
+def time_call(func, *args, repeat: int = 3) -> float:
+    """Best wall-clock time of several runs, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def result_megabytes(func, *args) -> float:
+    """Memory held by the result of a call, in megabytes."""
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return size / 1e6
+
+
+def check_thresholds(results: Dict[str, float], thresholds: Dict[str, float]) -> List[str]:
+    """Benchmarks that took longer than their threshold (in milliseconds)."""
+    return [name for name, limit in thresholds.items()
+            if name in results and results[name] > limit]
+
+
+def main() -> int:
+    """Generate (or reuse) a synthetic database, time the benchmarks and check thresholds."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=10000)
+    parser.add_argument('--timespans', type=int, default=1000000)
+    parser.add_argument('--fanout', type=int, default=8, help="Maximum children per task")
+    parser.add_argument('--depth', type=int, default=6, help="Maximum tree depth")
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--db', help="Reuse this database if it exists, otherwise generate it there")
+    parser.add_argument('--bare', action='store_true',
+                        help="Also time a copy without indexes and with default PRAGMAs")
+    parser.add_argument('--json', help="Write the timings to this JSON file")
+    parser.add_argument('--check', help="JSON file of benchmark name -> maximum milliseconds; "
+                                        "exit with status 1 if any is exceeded")
+    parser.add_argument('--write-thresholds',
+                        help="Write this run's timings times --tolerance as a thresholds file")
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    parser.add_argument('--memory', action='store_true',
+                        help="Also compare the memory of the timespan representations")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory(prefix='workhours-bench-') as scratch:
+        return run(args, scratch)
+
+
+def run(args: argparse.Namespace, scratch: str) -> int:
+    """Time the benchmarks; generated and bare databases go in scratch and are removed after."""
+    db_path = args.db or os.path.join(scratch, 'tuned.db')
+    if os.path.exists(db_path):
+        print(f"Using {db_path}")
+        tuned = Database(db_path)
+    else:
+        print(f"Generating {args.tasks} tasks and {args.timespans} timespans...")
+        started = time.perf_counter()
+        tuned = generate_database(db_path, args.tasks, args.timespans,
+                                  args.fanout, args.depth, args.years)
+        print(f"Generated in {time.perf_counter() - started:.1f}s")
+    bare = None
+    if args.bare:
+        bare = make_bare_copy(tuned, os.path.join(scratch, 'bare.db'))
+
+    results: Dict[str, float] = {}
+    bare_results: Dict[str, float] = {}
+    header = f"\n{'Benchmark':<26}{'time (ms)':>12}"
+    print(header + (f"{'bare (ms)':>12}{'speedup':>10}" if bare else ''))
+    task_manager = TaskManager(tuned)
+    task_manager.get_task_tree()  # Load the task maps for the cached benchmarks
+    benchmarks = list(BENCHMARKS)
+    try:
+        import numpy  # noqa: F401
+        benchmarks += ANALYTICS_BENCHMARKS
+    except ImportError:
+        print("(NumPy is not installed; skipping the analytics benchmarks)")
+    for name, func in benchmarks:
+        results[name] = time_call(func, tuned, task_manager, repeat=args.repeat)
+        line = f"{name:<26}{results[name]:>12.1f}"
+        if bare:
+            bare_results[name] = time_call(func, bare, TaskManager(bare), repeat=args.repeat)
+            line += f"{bare_results[name]:>12.1f}{bare_results[name] / results[name]:>9.1f}x"
+        print(line)
+
+    if args.memory:
+        print(f"\n{'Representation':<28}{'time (ms)':>10}{'memory (MB)':>13}")
+        for name, func in MEMORY_BENCHMARKS:
+            milliseconds = time_call(func, tuned, task_manager, repeat=args.repeat)
+            print(f"{name:<28}{milliseconds:>10.1f}{result_megabytes(func, tuned, task_manager):>13.1f}")
+
+    if args.json:
+        report = {
+            'config': {'tasks': len(task_manager.get_task_tree()),
+                       'timespans': tuned.count_timespans(),
+                       'repeat': args.repeat, 'sqlite': sqlite3.sqlite_version},
+            'results_ms': {name: round(ms, 2) for name, ms in results.items()},
+        }
+        if bare:
+            report['bare_results_ms'] = {name: round(ms, 2) for name, ms in bare_results.items()}
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.write_thresholds:
+        with open(args.write_thresholds, 'w') as f:
+            json.dump({name: round(ms * args.tolerance, 1) for name, ms in results.items()},
+                      f, indent=2)
+
+    status = 0
+    if args.check:
+        with open(args.check) as f:
+            thresholds = json.load(f)
+        failed = check_thresholds(results, thresholds)
+        for name in failed:
+            print(f"REGRESSION: {name} took {results[name]:.1f} ms "
+                  f"(threshold {thresholds[name]:.1f} ms)")
+        if not failed:
+            print(f"All {len(thresholds)} thresholds met")
+        status = 1 if failed else 0
+
+    if bare:
+        bare.close()
+    tuned.close()
+    if args.db:
+        print(f"\nDatabase left in: {db_path}")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Connection management module for work hours tracker.
+Gives every thread its own SQLite connection and serializes writers.
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+
+@dataclass
+class ConnectionProfile:
+    """SQLite PRAGMA settings applied to every new connection.
+
+    A setting of None leaves SQLite's built-in default untouched.
+    """
+    journal_mode: Optional[str] = "WAL"        # WAL lets readers run during writes
+    synchronous: Optional[str] = "NORMAL"      # Safe with WAL, far fewer fsyncs than FULL
+    mmap_size: Optional[int] = 256 * 1024 * 1024  # Bytes of the file to memory-map
+    cache_size: Optional[int] = -64000         # Negative means KiB (here ~64 MB)
+    foreign_keys: bool = True                  # Needed for ON DELETE CASCADE to run
+    busy_timeout: int = 5000                   # Milliseconds to wait for another writer
+
+    @classmethod
+    def bare(cls) -> 'ConnectionProfile':
+        """Profile with every setting left at SQLite's defaults."""
+        return cls(journal_mode=None, synchronous=None, mmap_size=None,
+                   cache_size=None, foreign_keys=False, busy_timeout=0)
+
+    def apply(self, connection: sqlite3.Connection, read_only: bool = False):
+        """Apply the settings to an open connection."""
+        connection.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        # The journal mode is stored in the file, so only writers may change it
+        if self.journal_mode is not None and not read_only:
+            connection.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        if self.synchronous is not None:
+            connection.execute(f"PRAGMA synchronous = {self.synchronous}")
+        if self.mmap_size is not None:
+            connection.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        if self.cache_size is not None:
+            connection.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        connection.execute(f"PRAGMA foreign_keys = {'ON' if self.foreign_keys else 'OFF'}")
+
+
+def _is_locked_error(error: sqlite3.OperationalError) -> bool:
+    """Check whether an error means another connection holds the lock."""
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class ConnectionManager:
+    """Hands out per-thread SQLite connections for one database file.
+
+    - ``connection``: the calling thread's read/write connection
+    - ``reader``: the calling thread's read-only connection (for reports)
+    - ``transaction()``: a write transaction; only one thread writes at a time,
+      and other processes are waited for with a busy timeout plus retries
+
+    With WAL journaling, readers never wait for the writer and the writer
+    never waits for readers, so long report queries don't delay timer writes.
+    """
+
+    def __init__(self, db_path: str, profile: Optional[ConnectionProfile] = None,
+                 retries: int = 5, retry_delay: float = 0.05):
+        """Prepare the manager; connections are opened lazily per thread."""
+        self.db_path = db_path
+        self.profile = profile or ConnectionProfile()
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.write_lock = threading.RLock()
+        self._local = threading.local()
+        self._all: List[sqlite3.Connection] = []
+        self._all_lock = threading.Lock()
+        # An in-memory database exists only inside one connection, so share it
+        self._shared: Optional[sqlite3.Connection] = None
+        if db_path == ':memory:':
+            self._shared = self._open(read_only=False)
+
+    def _open(self, read_only: bool) -> sqlite3.Connection:
+        """Open and configure a new connection.
+
+        Each connection is only used by the thread that opened it;
+        check_same_thread is off so that close() may run from any thread.
+        """
+        if read_only:
+            from pathlib import Path  # Only needed here; keeps CLI start-up lean
+            uri = Path(self.db_path).absolute().as_uri() + "?mode=ro"
+            connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        self.profile.apply(connection, read_only=read_only)
+        with self._all_lock:
+            self._all.append(connection)
+        return connection
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Read/write connection owned by the calling thread."""
+        if self._shared is not None:
+            return self._shared
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._open(read_only=False)
+            self._local.connection = connection
+        return connection
+
+    @property
+    def reader(self) -> sqlite3.Connection:
+        """Read-only connection owned by the calling thread."""
+        if self._shared is not None:
+            return self._shared
+        connection = getattr(self._local, 'reader', None)
+        if connection is None:
+            connection = self._open(read_only=True)
+            self._local.reader = connection
+        return connection
+
+    @property
+    def depth(self) -> int:
+        """How many transaction() blocks the calling thread is inside."""
+        return getattr(self._local, 'depth', 0)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a write transaction on the calling thread's connection.
+
+        Nested blocks join the outer transaction. The outermost block takes the
+        in-process write lock, starts with BEGIN IMMEDIATE (retrying while another
+        process holds the database) and commits at the end, or rolls back if an
+        exception escapes.
+        """
+        connection = self.connection
+        if self.depth > 0:
+            self._local.depth += 1
+            try:
+                yield connection
+            finally:
+                self._local.depth -= 1
+            return
+
+        with self.write_lock:
+            if connection.in_transaction:
+                connection.commit()
+            self._begin(connection)
+            self._local.depth = 1
+            try:
+                yield connection
+            except BaseException:
+                connection.rollback()
+                raise
+            else:
+                connection.commit()
+            finally:
+                self._local.depth = 0
+
+    def _begin(self, connection: sqlite3.Connection):
+        """Start an immediate transaction, retrying while the file is locked."""
+        for attempt in range(self.retries + 1):
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if not _is_locked_error(e) or attempt == self.retries:
+                    raise
+                time.sleep(self.retry_delay * (2 ** attempt))
+
+    def release_thread(self):
+        """Close the calling thread's connections (call before a worker thread exits)."""
+        for name in ('connection', 'reader'):
+            connection = getattr(self._local, name, None)
+            if connection is not None and connection is not self._shared:
+                with self._all_lock:
+                    self._all.remove(connection)
+                connection.close()
+                setattr(self._local, name, None)
+
+    def close(self):
+        """Close every connection opened by this manager."""
+        with self._all_lock:
+            for connection in self._all:
+                connection.close()
+            self._all.clear()
+        self._shared = None
+        self._local = threading.local()
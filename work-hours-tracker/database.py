@@ -3,25 +3,222 @@ Database module for work hours tracker.
 Handles SQLite database operations for tasks and timespans.
 """
 
+import os
 import sqlite3
-from datetime import datetime
-from typing import List, Optional, Tuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from connection import ConnectionManager, ConnectionProfile
+from events import (DataReset, EventBus, TaskAdded, TaskDeleted, TaskMoved, TimespanReassigned,
+                    TimespansAdded, TimespanStarted, TimespanStopped)
+from records import TASK_COLUMNS, TIMESPAN_COLUMNS, Task, Timespan, TimespanArray
+
+# Moments accepted by range filters: a datetime or epoch milliseconds
+TimeValue = Union[datetime, int]
+
+
+def to_epoch_ms(value: TimeValue) -> int:
+    """Convert a datetime (naive = local time) to epoch milliseconds."""
+    if isinstance(value, datetime):
+        return int(round(value.timestamp() * 1000))
+    return int(value)
+
+
+def from_epoch_ms(value: int) -> datetime:
+    """Convert epoch milliseconds to a naive local datetime."""
+    return datetime.fromtimestamp(value / 1000.0)
+
+
+def archived_day_range(since: Optional[TimeValue],
+                       until: Optional[TimeValue]) -> Tuple[Optional[str], Optional[str]]:
+    """First and end (exclusive) local dates whose midnight lies in [since, until).
+    
+    Archived time is only kept per day, so a range counts the whole days
+    that start inside it; ranges on day boundaries are therefore exact.
+    """
+    def first_midnight(value: TimeValue) -> str:
+        moment = from_epoch_ms(value) if isinstance(value, int) else value
+        day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        return (day if day == moment else day + timedelta(days=1)).date().isoformat()
+    
+    return (first_midnight(since) if since is not None else None,
+            first_midnight(until) if until is not None else None)
+
+
+# Columns of a change log entry, as exchanged by get_changes_since() / apply_changes()
+CHANGE_COLUMNS = ('device_id', 'seq', 'stamp', 'entity', 'uid', 'deleted', 'ref_uid',
+                  'name', 'start_time', 'end_time')
+
+# Current time in epoch milliseconds, inside SQL
+_SQL_NOW_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+
+def _change_log_triggers() -> List[str]:
+    """CREATE TRIGGER statements that log every task and timespan change.
+    
+    Each entry takes the next sequence number of the local device and a
+    stamp that never runs behind the local clock's previous stamp or any
+    stamp received from another device. Nothing is logged while the local
+    device is ``quiet`` (while changes from a sync are applied, or
+    timespans are archived).
+    """
+    def log(entity: str, row: str, deleted: int, ref_uid: str, name: str,
+            start_time: str, end_time: str) -> str:
+        return f"""
+            UPDATE sync_devices SET seq = seq + 1, clock = MAX({_SQL_NOW_MS}, clock, seen + 1)
+            WHERE local = 1 AND quiet = 0;
+            INSERT INTO change_log (device_id, seq, stamp, entity, uid, deleted, ref_uid,
+                                    name, start_time, end_time)
+            SELECT device_id, seq, clock, '{entity}', {row}, {deleted}, {ref_uid},
+                   {name}, {start_time}, {end_time}
+            FROM sync_devices WHERE local = 1 AND quiet = 0;
+        """
+    
+    task_uid = "(SELECT uid FROM tasks WHERE id = {}.id)"
+    parent_uid = "(SELECT uid FROM tasks WHERE id = {}.parent_id)"
+    span_task_uid = "(SELECT uid FROM tasks WHERE id = {}.task_id)"
+    span_uid = "(SELECT uid FROM timespans WHERE id = {}.id)"
+    return [
+        f"""CREATE TRIGGER log_task_insert AFTER INSERT ON tasks BEGIN
+            UPDATE tasks SET uid = lower(hex(randomblob(8))) WHERE id = NEW.id AND uid IS NULL;
+            {log('task', task_uid.format('NEW'), 0, parent_uid.format('NEW'), 'NEW.name',
+                 'NULL', 'NULL')}
+        END""",
+        f"""CREATE TRIGGER log_task_update AFTER UPDATE OF name, parent_id ON tasks BEGIN
+            {log('task', 'NEW.uid', 0, parent_uid.format('NEW'), 'NEW.name', 'NULL', 'NULL')}
+        END""",
+        f"""CREATE TRIGGER log_task_delete AFTER DELETE ON tasks BEGIN
+            {log('task', 'OLD.uid', 1, 'NULL', 'NULL', 'NULL', 'NULL')}
+        END""",
+        f"""CREATE TRIGGER log_timespan_insert AFTER INSERT ON timespans BEGIN
+            UPDATE timespans SET uid = lower(hex(randomblob(8))) WHERE id = NEW.id AND uid IS NULL;
+            {log('span', span_uid.format('NEW'), 0, span_task_uid.format('NEW'), 'NULL',
+                 'NEW.start_time', 'NEW.end_time')}
+        END""",
+        f"""CREATE TRIGGER log_timespan_update
+            AFTER UPDATE OF task_id, start_time, end_time ON timespans BEGIN
+            {log('span', 'NEW.uid', 0, span_task_uid.format('NEW'), 'NULL',
+                 'NEW.start_time', 'NEW.end_time')}
+        END""",
+        f"""CREATE TRIGGER log_timespan_delete AFTER DELETE ON timespans BEGIN
+            {log('span', 'OLD.uid', 1, 'NULL', 'NULL', 'NULL', 'NULL')}
+        END""",
+    ]
+
+
+def now_ms() -> int:
+    """Current time as epoch milliseconds."""
+    return to_epoch_ms(datetime.now())
+
+
+def _iso_to_epoch_ms(value):
+    """SQLite helper used by the epoch migration (passes integers through)."""
+    if value is None or isinstance(value, int):
+        return value
+    return to_epoch_ms(datetime.fromisoformat(value))
 
 
 class Database:
-    """Manages SQLite database for tasks and timespans."""
+    """Manages SQLite database for tasks and timespans.
+    
+    A Database can be shared between threads: every thread transparently gets
+    its own connection, and writes are serialized (see ConnectionManager).
+    Every change is announced on ``events`` once it has been committed.
+    """
     
-    def __init__(self, db_path: str = "workhours.db"):
-        """Initialize database connection and create tables if needed."""
+    def __init__(self, db_path: str = "workhours.db",
+                 profile: Optional[ConnectionProfile] = None):
+        """Initialize database connections and create tables if needed."""
         self.db_path = db_path
-        self.connection = sqlite3.connect(db_path)
-        self.connection.row_factory = sqlite3.Row
+        self.profile = profile or ConnectionProfile()
+        self.connections = ConnectionManager(db_path, self.profile)
+        self.events = EventBus()
+        self.tasks_version = 0  # Bumped on every task change; lets caches of the tree notice
+        # Old timespans are moved here by archive_timespans()
+        self.archive_path = os.path.splitext(db_path)[0] + "-archive.db"
         self._create_tables()
     
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Read/write connection of the calling thread."""
+        return self.connections.connection
+    
+    @property
+    def read_connection(self) -> sqlite3.Connection:
+        """Read-only connection of the calling thread, for reports."""
+        return self.connections.reader
+    
     def _create_tables(self):
-        """Create necessary tables if they don't exist."""
+        """Create tables and migrate the schema to the latest version.
+        
+        Every migration runs in its own transaction and is recorded in the
+        ``schema_version`` table, so an existing database is upgraded in place
+        exactly once per step.
+        """
         cursor = self.connection.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self.connection.commit()
         
+        for version, migration in self._migrations():
+            if version <= self.get_schema_version():
+                continue
+            with self.batch():
+                # Another process may have migrated while we waited for the lock
+                if version <= self.get_schema_version():
+                    continue
+                migration(cursor)
+                cursor.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+    
+    @contextmanager
+    def batch(self) -> Iterator['Database']:
+        """Run several writes in a single transaction.
+        
+        Mutators called inside ``with db.batch():`` don't commit on their own;
+        everything is committed once at the end (one fsync instead of one per
+        row) or rolled back if an exception escapes. Batches can be nested,
+        and only one thread at a time can be inside a batch. Change events are
+        held back until the commit and dropped on rollback.
+        """
+        try:
+            with self.events.deferred(), self.connections.transaction():
+                yield self
+        except BaseException:
+            self.tasks_version += 1  # Cached tasks may include rolled-back rows
+            raise
+    
+    def _migrations(self) -> List[Tuple[int, Callable[[sqlite3.Cursor], None]]]:
+        """Ordered list of (version, migration) steps."""
+        return [
+            (1, self._migrate_base_schema),
+            (2, self._migrate_epoch_timestamps),
+            (3, self._migrate_indexes),
+            (4, self._migrate_running_index),
+            (5, self._migrate_archived_totals),
+            (6, self._migrate_change_log),
+            (7, self._migrate_archive_files),
+        ]
+    
+    def get_data_version(self) -> int:
+        """Number that changes whenever another connection or process commits.
+        
+        Commits through this thread's own connection leave it unchanged;
+        those are tracked by ``tasks_version``.
+        """
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+    
+    def get_schema_version(self) -> int:
+        """Get the version of the last applied migration (0 for a new file)."""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        return cursor.fetchone()[0]
+    
+    def _migrate_base_schema(self, cursor: sqlite3.Cursor):
+        """Version 1: tasks, timespans, closure and aggregate tables."""
         # Tasks table with tree structure using parent_id
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS tasks (
@@ -33,7 +230,7 @@ class Database:
             )
         """)
         
-        # Timespans table
+        # Timespans table (ISO strings until version 2)
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS timespans (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -44,56 +241,513 @@ class Database:
             )
         """)
         
-        self.connection.commit()
+        # Closure table: one row per (ancestor, descendant) pair, including self at depth 0
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS task_closure (
+                ancestor_id INTEGER NOT NULL,
+                descendant_id INTEGER NOT NULL,
+                depth INTEGER NOT NULL,
+                PRIMARY KEY (ancestor_id, descendant_id),
+                FOREIGN KEY (ancestor_id) REFERENCES tasks(id) ON DELETE CASCADE,
+                FOREIGN KEY (descendant_id) REFERENCES tasks(id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_task_closure_descendant
+            ON task_closure (descendant_id, depth)
+        """)
+        
+        # Per-task duration aggregates, kept in sync by the mutators below
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS task_totals (
+                task_id INTEGER PRIMARY KEY,
+                own_seconds REAL NOT NULL DEFAULT 0,
+                subtree_seconds REAL NOT NULL DEFAULT 0,
+                FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE
+            )
+        """)
+        
+        self._rebuild_closure(cursor)
     
-    def add_task(self, name: str, parent_id: Optional[int] = None) -> int:
-        """Add a new task and return its ID."""
-        cursor = self.connection.cursor()
+    def _migrate_epoch_timestamps(self, cursor: sqlite3.Cursor):
+        """Version 2: store timespan start/end as integer epoch milliseconds."""
+        # Old values are naive local-time ISO strings, so convert them in Python
+        self.connection.create_function("iso_to_epoch_ms", 1, _iso_to_epoch_ms)
+        
+        cursor.execute("""
+            CREATE TABLE timespans_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id INTEGER NOT NULL,
+                start_time INTEGER NOT NULL,
+                end_time INTEGER,
+                FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute("""
+            INSERT INTO timespans_new (id, task_id, start_time, end_time)
+            SELECT id, task_id, iso_to_epoch_ms(start_time), iso_to_epoch_ms(end_time)
+            FROM timespans
+        """)
+        cursor.execute("DROP TABLE timespans")
+        cursor.execute("ALTER TABLE timespans_new RENAME TO timespans")
+        
+        self._rebuild_aggregates(cursor, archived=False)
+    
+    def _migrate_indexes(self, cursor: sqlite3.Cursor):
+        """Version 3: drop orphaned rows and add the lookup indexes."""
+        # Foreign keys were never enforced before, so clean up what the cascade missed
+        cursor.execute("""
+            WITH RECURSIVE orphans(id) AS (
+                SELECT id FROM tasks
+                WHERE parent_id IS NOT NULL
+                  AND parent_id NOT IN (SELECT id FROM tasks)
+                UNION
+                SELECT tasks.id FROM tasks JOIN orphans ON tasks.parent_id = orphans.id
+            )
+            DELETE FROM tasks WHERE id IN (SELECT id FROM orphans)
+        """)
+        cursor.execute("DELETE FROM timespans WHERE task_id NOT IN (SELECT id FROM tasks)")
+        
         cursor.execute(
-            "INSERT INTO tasks (name, parent_id) VALUES (?, ?)",
-            (name, parent_id)
+            "CREATE INDEX IF NOT EXISTS idx_timespans_task "
+            "ON timespans (task_id, start_time, end_time)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_timespans_start ON timespans (start_time)"
+        )
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_parent ON tasks (parent_id)")
+        
+        self._rebuild_closure(cursor)
+        self._rebuild_aggregates(cursor, archived=False)
+    
+    def _migrate_running_index(self, cursor: sqlite3.Cursor):
+        """Version 4: index the running timespans so a timer can be resumed instantly."""
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_timespans_running "
+            "ON timespans (start_time) WHERE end_time IS NULL"
         )
-        self.connection.commit()
-        return cursor.lastrowid
     
-    def get_all_tasks(self) -> List[sqlite3.Row]:
+    def _migrate_archived_totals(self, cursor: sqlite3.Cursor):
+        """Version 5: per-day totals of the timespans moved to the archive."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS archived_totals (
+                task_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                seconds REAL NOT NULL,
+                PRIMARY KEY (task_id, day),
+                FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+        """)
+    
+    def _migrate_change_log(self, cursor: sqlite3.Cursor):
+        """Version 6: global row IDs, the change log and the triggers that write it.
+        
+        Existing rows are written to the log as if they had just been added,
+        so a device that migrates an old file can share its whole history.
+        """
+        for table in ('tasks', 'timespans'):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN uid TEXT")
+            cursor.execute(f"UPDATE {table} SET uid = lower(hex(randomblob(8)))")
+            cursor.execute(f"CREATE UNIQUE INDEX idx_{table}_uid ON {table} (uid)")
+        
+        # One row per device seen: the local one (local = 1) with its last
+        # sequence number and stamp, every other one with the sync watermark
+        cursor.execute("""
+            CREATE TABLE sync_devices (
+                device_id TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL DEFAULT 0,
+                local INTEGER NOT NULL DEFAULT 0,
+                clock INTEGER NOT NULL DEFAULT 0,
+                seen INTEGER NOT NULL DEFAULT 0,
+                quiet INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute(
+            "INSERT INTO sync_devices (device_id, local) VALUES (lower(hex(randomblob(6))), 1)"
+        )
+        cursor.execute("""
+            CREATE TABLE change_log (
+                position INTEGER PRIMARY KEY,
+                device_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                stamp INTEGER NOT NULL,
+                entity TEXT NOT NULL,
+                uid TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0,
+                ref_uid TEXT,
+                name TEXT,
+                start_time INTEGER,
+                end_time INTEGER,
+                UNIQUE (device_id, seq)
+            )
+        """)
+        cursor.execute("CREATE INDEX idx_change_log_uid ON change_log (uid, stamp)")
+        cursor.execute("CREATE INDEX idx_change_log_ref_uid ON change_log (ref_uid)")
+        
+        # Snapshot of the existing rows: parents before children, then timespans
+        cursor.execute(f"""
+            INSERT INTO change_log (device_id, seq, stamp, entity, uid, ref_uid, name)
+            SELECT (SELECT device_id FROM sync_devices WHERE local = 1),
+                   ROW_NUMBER() OVER (ORDER BY depth, tasks.id), {_SQL_NOW_MS}, 'task',
+                   tasks.uid, parent.uid, tasks.name
+            FROM tasks
+            LEFT JOIN tasks AS parent ON parent.id = tasks.parent_id
+            JOIN (SELECT descendant_id, MAX(depth) AS depth FROM task_closure
+                  GROUP BY descendant_id) AS levels ON levels.descendant_id = tasks.id
+        """)
+        cursor.execute(f"""
+            INSERT INTO change_log (device_id, seq, stamp, entity, uid, ref_uid,
+                                    start_time, end_time)
+            SELECT (SELECT device_id FROM sync_devices WHERE local = 1),
+                   (SELECT COUNT(*) FROM change_log) + ROW_NUMBER() OVER (ORDER BY timespans.id),
+                   {_SQL_NOW_MS}, 'span', timespans.uid, tasks.uid,
+                   timespans.start_time, timespans.end_time
+            FROM timespans JOIN tasks ON tasks.id = timespans.task_id
+        """)
+        cursor.execute(f"""
+            UPDATE sync_devices SET seq = (SELECT COUNT(*) FROM change_log), clock = {_SQL_NOW_MS}
+            WHERE local = 1
+        """)
+        
+        for statement in _change_log_triggers():
+            cursor.execute(statement)
+    
+    def _migrate_archive_files(self, cursor: sqlite3.Cursor):
+        """Version 7: every archive file that received change log entries."""
+        cursor.execute("CREATE TABLE IF NOT EXISTS archive_files (path TEXT PRIMARY KEY)")
+        # Archives made by version 6 always went to the default file
+        if self.db_path != ':memory:' and os.path.exists(self.archive_path):
+            cursor.execute("INSERT INTO archive_files (path) VALUES (?)",
+                           (os.path.abspath(self.archive_path),))
+    
+    def add_task(self, name: str, parent_id: Optional[int] = None) -> int:
+        """Add a new task and return its ID."""
+        with self.batch():
+            cursor = self.connection.cursor()
+            cursor.execute(
+                "INSERT INTO tasks (name, parent_id) VALUES (?, ?)",
+                (name, parent_id)
+            )
+            task_id = cursor.lastrowid
+            cursor.execute("""
+                INSERT INTO task_closure (ancestor_id, descendant_id, depth)
+                SELECT ancestor_id, ?, depth + 1 FROM task_closure WHERE descendant_id = ?
+                UNION ALL
+                SELECT ?, ?, 0
+            """, (task_id, parent_id, task_id, task_id))
+            cursor.execute("INSERT INTO task_totals (task_id) VALUES (?)", (task_id,))
+            self.tasks_version += 1
+            self.events.publish(TaskAdded(task_id, parent_id, name))
+        return task_id
+    
+    def get_all_tasks(self) -> List[Task]:
         """Get all tasks from database."""
         cursor = self.connection.cursor()
-        cursor.execute("SELECT * FROM tasks ORDER BY id")
+        cursor.row_factory = Task.row_factory
+        cursor.execute(f"SELECT {TASK_COLUMNS} FROM tasks ORDER BY id")
         return cursor.fetchall()
     
-    def get_task_by_id(self, task_id: int) -> Optional[sqlite3.Row]:
+    def get_task_by_id(self, task_id: int) -> Optional[Task]:
         """Get a specific task by ID."""
         cursor = self.connection.cursor()
-        cursor.execute("SELECT * FROM tasks WHERE id = ?", (task_id,))
+        cursor.row_factory = Task.row_factory
+        cursor.execute(f"SELECT {TASK_COLUMNS} FROM tasks WHERE id = ?", (task_id,))
         return cursor.fetchone()
     
     def delete_task(self, task_id: int):
         """Delete a task and its children (cascading)."""
+        with self.batch():
+            cursor = self.connection.cursor()
+            
+            # Remove the subtree's hours from every ancestor
+            cursor.execute(
+                "SELECT parent_id FROM tasks WHERE id = ?", (task_id,)
+            )
+            task = cursor.fetchone()
+            cursor.execute(
+                "SELECT subtree_seconds FROM task_totals WHERE task_id = ?", (task_id,)
+            )
+            totals = cursor.fetchone()
+            if task and totals and task['parent_id'] is not None:
+                self._add_to_ancestors(cursor, task['parent_id'], -totals['subtree_seconds'])
+            
+            # Delete the whole subtree explicitly so no orphaned rows are left behind
+            subtree = "SELECT descendant_id FROM task_closure WHERE ancestor_id = ?"
+            cursor.execute(subtree, (task_id,))
+            deleted_ids = tuple(row[0] for row in cursor.fetchall())
+            cursor.execute(f"DELETE FROM timespans WHERE task_id IN ({subtree})", (task_id,))
+            timespan_count = cursor.rowcount
+            cursor.execute(f"DELETE FROM task_totals WHERE task_id IN ({subtree})", (task_id,))
+            cursor.execute(
+                f"DELETE FROM archived_totals WHERE task_id IN ({subtree})", (task_id,)
+            )
+            cursor.execute(f"DELETE FROM tasks WHERE id IN ({subtree})", (task_id,))
+            cursor.execute(
+                f"DELETE FROM task_closure WHERE descendant_id IN ({subtree})", (task_id,)
+            )
+            self.tasks_version += 1
+            if task:
+                self.events.publish(TaskDeleted(task_id, task['parent_id'], deleted_ids,
+                                               timespan_count))
+    
+    def move_task(self, task_id: int, new_parent_id: Optional[int]):
+        """Move a task (with its whole subtree) under a new parent.
+        
+        Only the closure rows linking the subtree to its old ancestors are
+        replaced; paths inside the subtree stay untouched.
+        
+        Args:
+            task_id: ID of the task to move
+            new_parent_id: ID of the new parent, or None to make it a root task
+            
+        Raises:
+            ValueError: If a task doesn't exist or the move would create a cycle
+        """
         cursor = self.connection.cursor()
-        cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-        self.connection.commit()
+        
+        cursor.execute("SELECT parent_id FROM tasks WHERE id = ?", (task_id,))
+        task = cursor.fetchone()
+        if task is None:
+            raise ValueError(f"Task with id {task_id} does not exist")
+        
+        if new_parent_id is not None:
+            cursor.execute("SELECT id FROM tasks WHERE id = ?", (new_parent_id,))
+            if cursor.fetchone() is None:
+                raise ValueError(f"Task with id {new_parent_id} does not exist")
+            cursor.execute(
+                "SELECT 1 FROM task_closure WHERE ancestor_id = ? AND descendant_id = ?",
+                (task_id, new_parent_id)
+            )
+            if cursor.fetchone() is not None:
+                raise ValueError(f"Cannot move task {task_id} under its own subtree")
+        
+        if task['parent_id'] == new_parent_id:
+            return
+        
+        with self.batch():
+            cursor.execute(
+                "SELECT subtree_seconds FROM task_totals WHERE task_id = ?", (task_id,)
+            )
+            totals = cursor.fetchone()
+            seconds = totals['subtree_seconds'] if totals else 0.0
+            if task['parent_id'] is not None:
+                self._add_to_ancestors(cursor, task['parent_id'], -seconds)
+            
+            # Detach the subtree from its old ancestors
+            cursor.execute("""
+                DELETE FROM task_closure
+                WHERE descendant_id IN (
+                    SELECT descendant_id FROM task_closure WHERE ancestor_id = :task
+                )
+                AND ancestor_id IN (
+                    SELECT ancestor_id FROM task_closure
+                    WHERE descendant_id = :task AND ancestor_id != :task
+                )
+            """, {'task': task_id})
+            
+            # Attach it under the new parent's ancestors
+            if new_parent_id is not None:
+                cursor.execute("""
+                    INSERT INTO task_closure (ancestor_id, descendant_id, depth)
+                    SELECT above.ancestor_id, below.descendant_id, above.depth + below.depth + 1
+                    FROM task_closure above, task_closure below
+                    WHERE above.descendant_id = ? AND below.ancestor_id = ?
+                """, (new_parent_id, task_id))
+                self._add_to_ancestors(cursor, new_parent_id, seconds)
+            
+            cursor.execute(
+                "UPDATE tasks SET parent_id = ? WHERE id = ?", (new_parent_id, task_id)
+            )
+            self.tasks_version += 1
+            self.events.publish(TaskMoved(task_id, task['parent_id'], new_parent_id))
     
-    def start_timespan(self, task_id: int) -> int:
-        """Start a new timespan for a task."""
+    def get_path_names(self, task_id: int) -> List[str]:
+        """Get the names from the root down to a task, in one query."""
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            SELECT tasks.name FROM task_closure
+            JOIN tasks ON tasks.id = task_closure.ancestor_id
+            WHERE task_closure.descendant_id = ?
+            ORDER BY task_closure.depth DESC
+        """, (task_id,))
+        return [row['name'] for row in cursor.fetchall()]
+    
+    def get_descendant_ids(self, task_id: int, include_self: bool = True) -> List[int]:
+        """Get IDs of all tasks in a subtree."""
         cursor = self.connection.cursor()
-        start_time = datetime.now().isoformat()
         cursor.execute(
-            "INSERT INTO timespans (task_id, start_time) VALUES (?, ?)",
-            (task_id, start_time)
+            "SELECT descendant_id FROM task_closure WHERE ancestor_id = ? AND depth >= ?",
+            (task_id, 0 if include_self else 1)
         )
-        self.connection.commit()
-        return cursor.lastrowid
+        return [row['descendant_id'] for row in cursor.fetchall()]
     
-    def stop_timespan(self, timespan_id: int):
-        """Stop a running timespan."""
+    def get_task_depth(self, task_id: int) -> int:
+        """Get the depth of a task (0 for root tasks)."""
         cursor = self.connection.cursor()
-        end_time = datetime.now().isoformat()
         cursor.execute(
-            "UPDATE timespans SET end_time = ? WHERE id = ?",
-            (end_time, timespan_id)
+            "SELECT MAX(depth) FROM task_closure WHERE descendant_id = ?", (task_id,)
         )
-        self.connection.commit()
+        depth = cursor.fetchone()[0]
+        return depth if depth is not None else 0
+    
+    @contextmanager
+    def _bulk_logged(self, cursor: sqlite3.Cursor, table: str) -> Iterator[None]:
+        """Log the rows inserted into a table with one statement instead of per row.
+        
+        The row triggers are silenced (``quiet``) while the block runs; then
+        every new row (ID above the previous maximum) is written to the
+        change log in ID order, taking consecutive sequence numbers and one
+        stamp. Must run inside a batch, so a failure also undoes ``quiet``.
+        """
+        cursor.execute("SELECT quiet FROM sync_devices WHERE local = 1")
+        if cursor.fetchone()[0]:
+            yield  # Already silenced, e.g. while applying a sync
+            return
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+        last_id = cursor.fetchone()[0]
+        cursor.execute("UPDATE sync_devices SET quiet = 1 WHERE local = 1")
+        yield
+        cursor.execute(f"""
+            UPDATE sync_devices SET quiet = 0, clock = MAX({_SQL_NOW_MS}, clock, seen + 1)
+            WHERE local = 1
+        """)
+        if table == 'tasks':
+            rows = """
+                SELECT tasks.id, 'task' AS entity, tasks.uid, parent.uid AS ref_uid, tasks.name,
+                       NULL AS start_time, NULL AS end_time
+                FROM tasks LEFT JOIN tasks AS parent ON parent.id = tasks.parent_id
+                WHERE tasks.id > :last_id
+            """
+        else:
+            rows = """
+                SELECT timespans.id, 'span' AS entity, timespans.uid, tasks.uid AS ref_uid,
+                       NULL AS name, timespans.start_time, timespans.end_time
+                FROM timespans JOIN tasks ON tasks.id = timespans.task_id
+                WHERE timespans.id > :last_id
+            """
+        cursor.execute(f"""
+            INSERT INTO change_log (device_id, seq, stamp, entity, uid, ref_uid,
+                                    name, start_time, end_time)
+            SELECT local.device_id, local.seq + ROW_NUMBER() OVER (ORDER BY rows.id),
+                   local.clock, rows.entity, rows.uid, rows.ref_uid,
+                   rows.name, rows.start_time, rows.end_time
+            FROM ({rows}) AS rows, sync_devices AS local
+            WHERE local.local = 1
+        """, {'last_id': last_id})
+        cursor.execute("UPDATE sync_devices SET seq = seq + ? WHERE local = 1",
+                       (cursor.rowcount,))
+    
+    def add_tasks(self, tasks: Iterable[Tuple[str, Optional[int]]]) -> List[int]:
+        """Add many tasks in one transaction and return their IDs in order.
+        
+        Args:
+            tasks: (name, parent_id) pairs; a parent must exist already or
+                appear earlier in the same call
+        """
+        with self.batch():
+            cursor = self.connection.cursor()
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM tasks")
+            next_id = cursor.fetchone()[0] + 1
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'")
+            row = cursor.fetchone()
+            if row is not None:
+                next_id = max(next_id, row[0] + 1)
+            
+            rows = [(next_id + i, name, parent_id) for i, (name, parent_id) in enumerate(tasks)]
+            task_ids = [row[0] for row in rows]
+            with self._bulk_logged(cursor, 'tasks'):
+                cursor.executemany("""
+                    INSERT INTO tasks (id, name, parent_id, uid)
+                    VALUES (?, ?, ?, lower(hex(randomblob(8))))
+                """, rows)
+            # Rows are processed in order, so parents added above already have their paths
+            cursor.executemany("""
+                INSERT INTO task_closure (ancestor_id, descendant_id, depth)
+                SELECT ancestor_id, ?, depth + 1 FROM task_closure WHERE descendant_id = ?
+                UNION ALL
+                SELECT ?, ?, 0
+            """, [(task_id, parent_id, task_id, task_id) for task_id, _, parent_id in rows])
+            cursor.executemany(
+                "INSERT INTO task_totals (task_id) VALUES (?)", [(tid,) for tid in task_ids]
+            )
+            self.tasks_version += 1
+            for task_id, name, parent_id in rows:
+                self.events.publish(TaskAdded(task_id, parent_id, name))
+        return task_ids
+    
+    def start_timespan(self, task_id: int) -> int:
+        """Start a new timespan for a task."""
+        start_time = now_ms()
+        with self.batch():
+            cursor = self.connection.cursor()
+            cursor.execute(
+                "INSERT INTO timespans (task_id, start_time) VALUES (?, ?)",
+                (task_id, start_time)
+            )
+            self.events.publish(TimespanStarted(cursor.lastrowid, task_id))
+        return cursor.lastrowid
+    
+    def add_timespans(self, timespans: Iterable[Tuple[int, TimeValue, Optional[TimeValue]]]) -> int:
+        """Insert many finished or running timespans in one transaction.
+        
+        The input is consumed lazily, so a generator of any size works.
+        Aggregates are updated once per affected task rather than per row.
+        
+        Args:
+            timespans: (task_id, start, end) tuples; start/end are datetimes or
+                epoch milliseconds, end may be None for a running timespan
+            
+        Returns:
+            Number of timespans inserted
+        """
+        own_seconds: Dict[int, float] = {}
+        count = 0
+        
+        def rows():
+            nonlocal count
+            for task_id, start, end in timespans:
+                start_ms = to_epoch_ms(start)
+                end_ms = to_epoch_ms(end) if end is not None else None
+                seconds = (end_ms - start_ms) / 1000.0 if end_ms is not None else 0.0
+                own_seconds[task_id] = own_seconds.get(task_id, 0.0) + seconds
+                count += 1
+                yield task_id, start_ms, end_ms
+        
+        with self.batch():
+            cursor = self.connection.cursor()
+            with self._bulk_logged(cursor, 'timespans'):
+                cursor.executemany("""
+                    INSERT INTO timespans (task_id, start_time, end_time, uid)
+                    VALUES (?, ?, ?, lower(hex(randomblob(8))))
+                """, rows())
+            for task_id, seconds in own_seconds.items():
+                self._add_to_totals(cursor, task_id, seconds)
+            if count:
+                self.events.publish(TimespansAdded(tuple(own_seconds), count))
+        return count
+    
+    def stop_timespan(self, timespan_id: int) -> bool:
+        """Stop a running timespan.
+        
+        Returns:
+            False if the timespan was already stopped (e.g. by another
+            process sharing the running timer) and was left unchanged
+        """
+        end_time = now_ms()
+        with self.batch():
+            cursor = self.connection.cursor()
+            cursor.execute(
+                "UPDATE timespans SET end_time = ? WHERE id = ? AND end_time IS NULL",
+                (end_time, timespan_id)
+            )
+            if cursor.rowcount == 0:
+                return False
+            
+            cursor.execute("SELECT task_id FROM timespans WHERE id = ?", (timespan_id,))
+            task_id = cursor.fetchone()['task_id']
+            self._add_to_totals(cursor, task_id, self._timespan_seconds(cursor, timespan_id))
+            self.events.publish(TimespanStopped(timespan_id, task_id))
+        return True
     
     def update_timespan_task(self, timespan_id: int, new_task_id: int):
         """Update the task associated with a timespan.
@@ -108,8 +762,9 @@ class Database:
         cursor = self.connection.cursor()
         
         # Validate that timespan exists
-        cursor.execute("SELECT id FROM timespans WHERE id = ?", (timespan_id,))
-        if cursor.fetchone() is None:
+        cursor.execute("SELECT task_id FROM timespans WHERE id = ?", (timespan_id,))
+        timespan = cursor.fetchone()
+        if timespan is None:
             raise ValueError(f"Timespan with id {timespan_id} does not exist")
         
         # Validate that new task exists
@@ -117,72 +772,806 @@ class Database:
         if cursor.fetchone() is None:
             raise ValueError(f"Task with id {new_task_id} does not exist")
         
-        # Perform update
-        cursor.execute(
-            "UPDATE timespans SET task_id = ? WHERE id = ?",
-            (new_task_id, timespan_id)
-        )
-        self.connection.commit()
+        # Perform update and move the hours between ancestor chains
+        with self.batch():
+            seconds = self._timespan_seconds(cursor, timespan_id)
+            cursor.execute(
+                "UPDATE timespans SET task_id = ? WHERE id = ?",
+                (new_task_id, timespan_id)
+            )
+            self._add_to_totals(cursor, timespan['task_id'], -seconds)
+            self._add_to_totals(cursor, new_task_id, seconds)
+            self.events.publish(TimespanReassigned(timespan_id, timespan['task_id'], new_task_id))
     
-    def get_timespans_for_task(self, task_id: int) -> List[sqlite3.Row]:
+    def get_running_timespan(self) -> Optional[Timespan]:
+        """Get the most recently started timespan that has no end time yet."""
+        cursor = self.connection.cursor()
+        cursor.row_factory = Timespan.row_factory
+        cursor.execute(f"""
+            SELECT {TIMESPAN_COLUMNS} FROM timespans t
+            JOIN tasks ON t.task_id = tasks.id
+            WHERE t.end_time IS NULL
+            ORDER BY t.start_time DESC
+            LIMIT 1
+        """)
+        return cursor.fetchone()
+    
+    def get_timespans_for_task(self, task_id: int) -> List[Timespan]:
         """Get all timespans for a specific task."""
         cursor = self.connection.cursor()
-        cursor.execute(
-            "SELECT * FROM timespans WHERE task_id = ? ORDER BY start_time DESC",
-            (task_id,)
-        )
+        cursor.row_factory = Timespan.row_factory
+        cursor.execute(f"""
+            SELECT {TIMESPAN_COLUMNS} FROM timespans t
+            JOIN tasks ON t.task_id = tasks.id
+            WHERE t.task_id = ?
+            ORDER BY t.start_time DESC
+        """, (task_id,))
         return cursor.fetchall()
     
-    def get_all_timespans(self) -> List[sqlite3.Row]:
+    def get_all_timespans(self) -> List[Timespan]:
         """Get all timespans with task names."""
         cursor = self.connection.cursor()
-        cursor.execute("""
-            SELECT t.id, t.task_id, t.start_time, t.end_time, tasks.name as task_name
+        cursor.row_factory = Timespan.row_factory
+        cursor.execute(f"""
+            SELECT {TIMESPAN_COLUMNS}
             FROM timespans t
             JOIN tasks ON t.task_id = tasks.id
             ORDER BY t.start_time DESC
         """)
         return cursor.fetchall()
     
+    def get_timespan_array(self, chunk_size: int = 65536) -> TimespanArray:
+        """Get all timespans, newest first, in a compact TimespanArray.
+        
+        Rows are read in chunks straight into the arrays, so a million
+        timespans take about 34 MB instead of the ~280 MB a list of
+        Timespan records needs (see README, Record Types).
+        """
+        cursor = self.read_connection.cursor()
+        cursor.row_factory = None
+        cursor.execute("SELECT id, name FROM tasks")
+        timespans = TimespanArray(dict(cursor.fetchall()))
+        cursor.execute("""
+            SELECT id, task_id, start_time, COALESCE(end_time, -1)
+            FROM timespans
+            ORDER BY start_time DESC
+        """)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return timespans
+            timespans.extend(rows)
+    
+    def count_timespans(self) -> int:
+        """Get the number of recorded timespans."""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM timespans")
+        return cursor.fetchone()[0]
+    
+    def get_timespans_page(self, task_id: Optional[int] = None,
+                           since: Optional[TimeValue] = None,
+                           until: Optional[TimeValue] = None,
+                           page_size: int = 500,
+                           after: Optional[Tuple[int, int]] = None,
+                           include_children: bool = False,
+                           newest_first: bool = True) -> List[Tuple]:
+        """Get one page of timespans using a keyset cursor.
+        
+        Rows are plain tuples ``(id, task_id, start_time, end_time, task_name)``
+        ordered by ``(start_time, id)``. Pass the ``(start_time, id)`` of the last
+        row as ``after`` to get the next page; each page is an indexed range
+        scan no matter how deep into the history it is.
+        
+        Args:
+            task_id: Only timespans of this task (None for all tasks)
+            since: Only timespans starting on or after this moment
+            until: Only timespans starting before this moment
+            page_size: Maximum number of rows returned
+            after: Keyset cursor ``(start_time, id)`` of the previous page's last row
+            include_children: With task_id, also include timespans of its subtree
+            newest_first: Order descending (default) or ascending
+        """
+        conditions = []
+        params: Dict[str, object] = {'limit': page_size}
+        
+        if task_id is not None:
+            if include_children:
+                conditions.append(
+                    "t.task_id IN (SELECT descendant_id FROM task_closure "
+                    "WHERE ancestor_id = :task_id)"
+                )
+            else:
+                conditions.append("t.task_id = :task_id")
+            params['task_id'] = task_id
+        if since is not None:
+            conditions.append("t.start_time >= :since")
+            params['since'] = to_epoch_ms(since)
+        if until is not None:
+            conditions.append("t.start_time < :until")
+            params['until'] = to_epoch_ms(until)
+        if after is not None:
+            conditions.append(
+                "(t.start_time, t.id) < (:after_start, :after_id)" if newest_first
+                else "(t.start_time, t.id) > (:after_start, :after_id)"
+            )
+            params['after_start'], params['after_id'] = after
+        
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        order = "DESC" if newest_first else "ASC"
+        cursor = self.connection.cursor()
+        cursor.row_factory = None  # Plain tuples are smaller and faster than Row
+        cursor.execute(f"""
+            SELECT t.id, t.task_id, t.start_time, t.end_time, tasks.name
+            FROM timespans t
+            JOIN tasks ON t.task_id = tasks.id
+            {where}
+            ORDER BY t.start_time {order}, t.id {order}
+            LIMIT :limit
+        """, params)
+        return cursor.fetchall()
+    
+    def get_timespan_row(self, timespan_id: int) -> Optional[Tuple]:
+        """Get one timespan in the tuple format of get_timespans_page."""
+        cursor = self.connection.cursor()
+        cursor.row_factory = None
+        cursor.execute("""
+            SELECT t.id, t.task_id, t.start_time, t.end_time, tasks.name
+            FROM timespans t
+            JOIN tasks ON t.task_id = tasks.id
+            WHERE t.id = ?
+        """, (timespan_id,))
+        return cursor.fetchone()
+    
+    def iter_timespans(self, task_id: Optional[int] = None,
+                       since: Optional[TimeValue] = None,
+                       until: Optional[TimeValue] = None,
+                       page_size: int = 500,
+                       after: Optional[Tuple[int, int]] = None,
+                       include_children: bool = False,
+                       newest_first: bool = True) -> Iterator[Tuple]:
+        """Lazily yield timespans page by page (see get_timespans_page)."""
+        while True:
+            page = self.get_timespans_page(task_id, since, until, page_size, after,
+                                           include_children, newest_first)
+            yield from page
+            if len(page) < page_size:
+                return
+            last = page[-1]
+            after = (last[2], last[0])
+    
     def get_task_total_hours(self, task_id: int, include_children: bool = True) -> float:
         """Calculate total hours for a task and optionally its children."""
         cursor = self.connection.cursor()
+        cursor.execute(
+            "SELECT own_seconds, subtree_seconds FROM task_totals WHERE task_id = ?",
+            (task_id,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return 0.0
+        
+        total_seconds = row['subtree_seconds'] if include_children else row['own_seconds']
+        return total_seconds / 3600.0  # Convert to hours
+    
+    def get_all_task_totals(self, since: Optional[TimeValue] = None,
+                            until: Optional[TimeValue] = None) -> Dict[int, Tuple[float, float]]:
+        """Calculate hours for every task in one pass.
+        
+        Without a range the totals come straight from the ``task_totals``
+        aggregates. When ``since``/``until`` are given, timespans are clipped
+        to that range, summed in SQLite and rolled up the tree with a
+        recursive CTE, so the cost is one query regardless of tree size.
         
-        if include_children:
-            # Get all child task IDs recursively
-            task_ids = self._get_task_and_children_ids(task_id)
+        Args:
+            since: Only count time on or after this moment
+            until: Only count time before this moment
+            (both accept a datetime or epoch milliseconds)
+            
+        Returns:
+            Dict mapping task_id to (own_hours, total_hours_including_children)
+        """
+        if since is None and until is None:
+            cursor = self.connection.cursor()
+            cursor.execute("""
+                SELECT tasks.id AS task_id,
+                       COALESCE(task_totals.own_seconds, 0) AS own_seconds,
+                       COALESCE(task_totals.subtree_seconds, 0) AS total_seconds
+                FROM tasks LEFT JOIN task_totals ON task_totals.task_id = tasks.id
+            """)
+            rows = cursor.fetchall()
         else:
-            task_ids = [task_id]
+            rows = self._compute_task_totals(since, until)
         
-        total_seconds = 0
-        for tid in task_ids:
-            cursor.execute(
-                "SELECT start_time, end_time FROM timespans WHERE task_id = ?",
-                (tid,)
+        return {
+            row['task_id']: (row['own_seconds'] / 3600.0, row['total_seconds'] / 3600.0)
+            for row in rows
+        }
+    
+    def get_ancestor_totals(self, task_id: int) -> Dict[int, Tuple[float, float]]:
+        """Hours of a task and each of its ancestors, read from the aggregates.
+        
+        Returns:
+            Dict mapping task_id to (own_hours, total_hours_including_children)
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            SELECT task_totals.task_id, task_totals.own_seconds, task_totals.subtree_seconds
+            FROM task_closure
+            JOIN task_totals ON task_totals.task_id = task_closure.ancestor_id
+            WHERE task_closure.descendant_id = ?
+        """, (task_id,))
+        return {row['task_id']: (row['own_seconds'] / 3600.0, row['subtree_seconds'] / 3600.0)
+                for row in cursor.fetchall()}
+    
+    def _compute_task_totals(self, since: Optional[TimeValue] = None,
+                             until: Optional[TimeValue] = None,
+                             archived: bool = True) -> List[sqlite3.Row]:
+        """Compute (task_id, own_seconds, total_seconds) rows from raw timespans.
+        
+        Archived days whose midnight lies in the range are added from
+        ``archived_totals`` (unless ``archived`` is False, for migrations
+        that run before the table exists).
+        """
+        cursor = self.connection.cursor()
+        since_ms = to_epoch_ms(since) if since is not None else None
+        until_ms = to_epoch_ms(until) if until is not None else None
+        first_day, end_day = archived_day_range(since, until)
+        archive = """
+                UNION ALL
+                SELECT task_id, SUM(seconds)
+                FROM archived_totals
+                WHERE (:first_day IS NULL OR day >= :first_day)
+                  AND (:end_day IS NULL OR day < :end_day)
+                GROUP BY task_id
+        """ if archived else ""
+        
+        cursor.execute("""
+            WITH clipped AS (
+                SELECT task_id,
+                       CASE WHEN :since IS NOT NULL AND start_time < :since
+                            THEN :since ELSE start_time END AS start_ms,
+                       CASE WHEN :until IS NOT NULL AND end_time > :until
+                            THEN :until ELSE end_time END AS end_ms
+                FROM timespans
+                WHERE end_time IS NOT NULL
+                  AND (:since IS NULL OR end_time > :since)
+                  AND (:until IS NULL OR start_time < :until)
+            ),
+            own(task_id, seconds) AS (
+                SELECT task_id, SUM(end_ms - start_ms) / 1000.0
+                FROM clipped
+                GROUP BY task_id
+                """ + archive + """
+            )
+            SELECT task_closure.ancestor_id AS task_id,
+                   COALESCE(SUM(CASE WHEN task_closure.depth = 0
+                                     THEN own.seconds END), 0) AS own_seconds,
+                   COALESCE(SUM(own.seconds), 0) AS total_seconds
+            FROM task_closure
+            LEFT JOIN own ON own.task_id = task_closure.descendant_id
+            GROUP BY task_closure.ancestor_id
+        """, {'since': since_ms, 'until': until_ms,
+              'first_day': first_day, 'end_day': end_day})
+        return cursor.fetchall()
+    
+    def rebuild_closure(self):
+        """Recompute the ``task_closure`` table from ``tasks.parent_id``."""
+        with self.batch():
+            self._rebuild_closure(self.connection.cursor())
+            self.events.publish(DataReset())
+    
+    def _rebuild_closure(self, cursor: sqlite3.Cursor):
+        """Recompute the closure table inside the caller's transaction."""
+        cursor.execute("DELETE FROM task_closure")
+        cursor.execute("""
+            INSERT INTO task_closure (ancestor_id, descendant_id, depth)
+            WITH RECURSIVE paths(ancestor_id, descendant_id, depth) AS (
+                SELECT id, id, 0 FROM tasks
+                UNION ALL
+                SELECT paths.ancestor_id, tasks.id, paths.depth + 1
+                FROM tasks JOIN paths ON tasks.parent_id = paths.descendant_id
             )
-            timespans = cursor.fetchall()
+            SELECT ancestor_id, descendant_id, depth FROM paths
+        """)
+    
+    def rebuild_aggregates(self):
+        """Recompute the ``task_totals`` table from raw timespans."""
+        with self.batch():
+            self._rebuild_aggregates(self.connection.cursor())
+            self.events.publish(DataReset())
+    
+    def _rebuild_aggregates(self, cursor: sqlite3.Cursor, archived: bool = True):
+        """Recompute the aggregates inside the caller's transaction."""
+        rows = self._compute_task_totals(archived=archived)
+        cursor.execute("DELETE FROM task_totals")
+        cursor.executemany(
+            "INSERT INTO task_totals (task_id, own_seconds, subtree_seconds) "
+            "VALUES (?, ?, ?)",
+            [(row['task_id'], row['own_seconds'], row['total_seconds']) for row in rows]
+        )
+    
+    def check_aggregates(self, tolerance: float = 0.001) -> List[int]:
+        """Compare stored aggregates with raw timespans.
+        
+        Args:
+            tolerance: Allowed difference in seconds (incremental float sums drift slightly)
             
-            for ts in timespans:
-                if ts['end_time']:
-                    start = datetime.fromisoformat(ts['start_time'])
-                    end = datetime.fromisoformat(ts['end_time'])
-                    total_seconds += (end - start).total_seconds()
+        Returns:
+            IDs of tasks whose stored totals are wrong or missing
+        """
+        stored = self.get_all_task_totals()
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT task_id FROM task_totals")
+        has_row = {row['task_id'] for row in cursor.fetchall()}
         
-        return total_seconds / 3600.0  # Convert to hours
+        mismatched = []
+        for row in self._compute_task_totals():
+            own_hours, total_hours = stored.get(row['task_id'], (0.0, 0.0))
+            if (row['task_id'] not in has_row
+                    or abs(own_hours * 3600.0 - row['own_seconds']) > tolerance
+                    or abs(total_hours * 3600.0 - row['total_seconds']) > tolerance):
+                mismatched.append(row['task_id'])
+        return sorted(mismatched)
     
-    def _get_task_and_children_ids(self, task_id: int) -> List[int]:
-        """Recursively get task ID and all its children IDs."""
+    def archive_timespans(self, before: TimeValue, archive_path: Optional[str] = None,
+                          vacuum: bool = False) -> int:
+        """Move finished timespans older than a cutoff into the archive database.
+        
+        The cutoff is rounded down to local midnight, and only timespans that
+        end by then are moved. Their time is kept in ``archived_totals`` as one
+        row per task and day, so totals and reports stay exact while the live
+        file (and every view over it) only holds recent history. The raw
+        rows go to the ``timespans`` table of the archive file.
+        
+        The rows are copied into the archive first and committed, then the
+        day totals are added and the rows deleted in a second transaction;
+        copying ignores rows that are already archived, so re-running after
+        an interruption never loses or double-counts time. Archiving is not
+        written to the change log, so synced devices keep their own copies.
+        The log entries of the moved timespans go to the archive's
+        ``change_log`` the same way, so the live log stays small;
+        ``get_changes_since()`` still hands them to devices that are behind,
+        reading every archive file recorded in ``archive_files``.
+        
+        Args:
+            before: Archive timespans that ended before this day
+            archive_path: Archive file (default: ``<database>-archive.db``)
+            vacuum: Shrink the live file afterwards
+            
+        Returns:
+            Number of timespans moved
+        """
+        if self.db_path == ':memory:':
+            raise ValueError("An in-memory database cannot be archived")
+        moment = from_epoch_ms(before) if isinstance(before, int) else before
+        cutoff = to_epoch_ms(moment.replace(hour=0, minute=0, second=0, microsecond=0))
+        archive_path = os.path.abspath(archive_path or self.archive_path)
+        
+        with self.connections.write_lock:
+            connection = self.connection
+            if self.connections.depth > 0:
+                raise RuntimeError("archive_timespans() cannot run inside a batch")
+            if connection.in_transaction:
+                connection.commit()
+            connection.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+            try:
+                with self.connections.transaction():
+                    # Recorded with the copy, so sync never misses the entries moved there
+                    connection.execute(
+                        "INSERT OR IGNORE INTO main.archive_files (path) VALUES (?)", (archive_path,)
+                    )
+                    connection.execute("""
+                        CREATE TABLE IF NOT EXISTS archive.timespans (
+                            id INTEGER PRIMARY KEY,
+                            task_id INTEGER NOT NULL,
+                            start_time INTEGER NOT NULL,
+                            end_time INTEGER NOT NULL
+                        )
+                    """)
+                    connection.execute(
+                        "CREATE INDEX IF NOT EXISTS archive.idx_timespans_start "
+                        "ON timespans (start_time)"
+                    )
+                    connection.execute("""
+                        INSERT OR IGNORE INTO archive.timespans (id, task_id, start_time, end_time)
+                        SELECT id, task_id, start_time, end_time FROM main.timespans
+                        WHERE end_time IS NOT NULL AND end_time <= ?
+                    """, (cutoff,))
+                    connection.execute("""
+                        CREATE TABLE IF NOT EXISTS archive.change_log (
+                            position INTEGER NOT NULL,
+                            device_id TEXT NOT NULL,
+                            seq INTEGER NOT NULL,
+                            stamp INTEGER NOT NULL,
+                            entity TEXT NOT NULL,
+                            uid TEXT NOT NULL,
+                            deleted INTEGER NOT NULL DEFAULT 0,
+                            ref_uid TEXT,
+                            name TEXT,
+                            start_time INTEGER,
+                            end_time INTEGER,
+                            UNIQUE (device_id, seq)
+                        )
+                    """)
+                    connection.execute(f"""
+                        INSERT OR IGNORE INTO archive.change_log (position, {', '.join(CHANGE_COLUMNS)})
+                        SELECT position, {', '.join(CHANGE_COLUMNS)} FROM main.change_log
+                        WHERE entity = 'span' AND uid IN (
+                            SELECT uid FROM main.timespans
+                            WHERE end_time IS NOT NULL AND end_time <= ?
+                        )
+                    """, (cutoff,))
+                
+                with self.batch():
+                    cursor = connection.cursor()
+                    # Archiving is local housekeeping: keep it out of the change log
+                    cursor.execute("UPDATE sync_devices SET quiet = 1 WHERE local = 1")
+                    # Split at local midnights, like reports.bucketed_totals()
+                    cursor.execute("""
+                        INSERT INTO archived_totals (task_id, day, seconds)
+                        WITH RECURSIVE pieces(task_id, start_ms, end_ms, day) AS (
+                            SELECT task_id, start_time, end_time,
+                                   date(start_time / 1000, 'unixepoch', 'localtime')
+                            FROM main.timespans
+                            WHERE end_time IS NOT NULL AND end_time <= :cutoff
+                            UNION ALL
+                            SELECT task_id,
+                                   CAST(strftime('%s', date(day, '+1 day'), 'utc') AS INTEGER) * 1000,
+                                   end_ms, date(day, '+1 day')
+                            FROM pieces
+                            WHERE CAST(strftime('%s', date(day, '+1 day'), 'utc') AS INTEGER) * 1000
+                                  < end_ms
+                        )
+                        SELECT task_id, day,
+                               SUM(MIN(end_ms, CAST(strftime('%s', date(day, '+1 day'), 'utc')
+                                                    AS INTEGER) * 1000) - start_ms) / 1000.0
+                        FROM pieces
+                        WHERE true
+                        GROUP BY task_id, day
+                        ON CONFLICT (task_id, day) DO UPDATE SET seconds = seconds + excluded.seconds
+                    """, {'cutoff': cutoff})
+                    # Only log entries that made it into the archive above
+                    cursor.execute("""
+                        DELETE FROM main.change_log
+                        WHERE entity = 'span' AND uid IN (
+                            SELECT uid FROM main.timespans
+                            WHERE end_time IS NOT NULL AND end_time <= ?
+                        ) AND EXISTS (
+                            SELECT 1 FROM archive.change_log AS archived
+                            WHERE archived.device_id = change_log.device_id
+                              AND archived.seq = change_log.seq
+                        )
+                    """, (cutoff,))
+                    cursor.execute(
+                        "DELETE FROM main.timespans WHERE end_time IS NOT NULL AND end_time <= ?",
+                        (cutoff,)
+                    )
+                    moved = cursor.rowcount
+                    cursor.execute("UPDATE sync_devices SET quiet = 0 WHERE local = 1")
+                    if moved:
+                        self.events.publish(DataReset())
+            finally:
+                connection.execute("DETACH DATABASE archive")
+            if vacuum and moved:
+                connection.execute("VACUUM")
+        return moved
+    
+    @property
+    def device_id(self) -> str:
+        """ID of this device in the change log."""
         cursor = self.connection.cursor()
-        task_ids = [task_id]
+        cursor.execute("SELECT device_id FROM sync_devices WHERE local = 1")
+        return cursor.fetchone()[0]
+    
+    def new_device_id(self) -> str:
+        """Give this file a new device ID (after copying a database to another machine).
         
-        cursor.execute("SELECT id FROM tasks WHERE parent_id = ?", (task_id,))
-        children = cursor.fetchall()
+        The changes logged so far keep the old ID, which becomes an
+        ordinary synced device; new changes are logged under the new one.
+        """
+        with self.batch():
+            cursor = self.connection.cursor()
+            cursor.execute("""
+                INSERT INTO sync_devices (device_id, local, clock, seen)
+                SELECT lower(hex(randomblob(6))), 1, clock, seen FROM sync_devices WHERE local = 1
+            """)
+            cursor.execute("UPDATE sync_devices SET local = 0 WHERE local = 1 AND rowid != ?",
+                           (cursor.lastrowid,))
+        return self.device_id
+    
+    def get_sync_watermarks(self) -> Dict[str, int]:
+        """Last sequence number held from every device (device_id -> seq)."""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT device_id, seq FROM sync_devices")
+        return {row['device_id']: row['seq'] for row in cursor.fetchall()}
+    
+    def get_changes_since(self, watermarks: Dict[str, int]) -> List[Tuple]:
+        """Change log entries another database is missing, in the order they were logged.
         
-        for child in children:
-            task_ids.extend(self._get_task_and_children_ids(child['id']))
+        Args:
+            watermarks: The other database's ``get_sync_watermarks()``
+            
+        Entries of archived timespans are read from the archive files they
+        were moved to.
         
-        return task_ids
+        Returns:
+            Tuples in ``CHANGE_COLUMNS`` order; reads only the missing entries
+            
+        Raises:
+            FileNotFoundError: If an archive file holding entries is gone
+        """
+        changes = []
+        logs = [self.connection]
+        archives = self._open_archived_logs()
+        logs.extend(archives)
+        try:
+            for device_id, seq in self.get_sync_watermarks().items():
+                if seq > watermarks.get(device_id, 0):
+                    for log in logs:
+                        cursor = log.execute(f"""
+                            SELECT position, {', '.join(CHANGE_COLUMNS)} FROM change_log
+                            WHERE device_id = ? AND seq > ?
+                        """, (device_id, watermarks.get(device_id, 0)))
+                        changes.extend(tuple(row) for row in cursor.fetchall())
+        finally:
+            for archive in archives:
+                archive.close()
+        changes.sort()
+        return [change[1:] for change in changes]
+    
+    def _open_archived_logs(self) -> List[sqlite3.Connection]:
+        """Read-only connections to the archive files that hold log entries."""
+        from pathlib import Path  # Only needed here; keeps CLI start-up lean
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT path FROM archive_files ORDER BY path")
+        paths = [row[0] for row in cursor.fetchall()]
+        archives = []
+        try:
+            for path in paths:
+                if not os.path.exists(path):
+                    raise FileNotFoundError(
+                        f"Archive {path} holds change log entries but is missing"
+                    )
+                archive = sqlite3.connect(Path(path).as_uri() + "?mode=ro", uri=True)
+                archives.append(archive)
+                if archive.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'"
+                ).fetchone() is None:
+                    archives.pop().close()  # Interrupted before the first copy
+        except BaseException:
+            for archive in archives:
+                archive.close()
+            raise
+        return archives
+    
+    def apply_changes(self, changes: Iterable[Tuple]) -> int:
+        """Apply change log entries from another database, in one transaction.
+        
+        Entries already held are skipped; the others are appended to the
+        local log as they are, so they can be passed on to further devices.
+        Each row that received an entry is then brought in line with all the
+        entries held for it, so devices agree no matter in which order the
+        entries arrived. Conflicts are resolved the same way on every device:
+        
+        - Deletes win: a task or timespan that was deleted anywhere stays
+          deleted, and so does anything added or moved into a deleted task.
+        - Otherwise the entry with the highest (stamp, device_id, seq) for a
+          row decides its state (last writer wins).
+        - Moves that would put tasks inside each other are settled by the
+          newer moves: of the tasks in the loop, the one moved longest ago
+          goes to the top level.
+        - Timespans that end before the archive cutoff are not brought back
+          once archived (sync before archiving to keep devices identical).
+        
+        Args:
+            changes: Tuples in ``CHANGE_COLUMNS`` order, from ``get_changes_since()``
+            
+        Returns:
+            Number of new entries received
+        """
+        received = 0
+        with self.batch():
+            cursor = self.connection.cursor()
+            watermarks = self.get_sync_watermarks()
+            cursor.execute("UPDATE sync_devices SET quiet = 1 WHERE local = 1")
+            for change in changes:
+                device_id, seq, stamp, entity, uid = change[:5]
+                if seq <= watermarks.get(device_id, 0):
+                    continue
+                cursor.execute(f"""
+                    INSERT INTO change_log ({', '.join(CHANGE_COLUMNS)})
+                    VALUES ({', '.join('?' * len(CHANGE_COLUMNS))})
+                """, tuple(change))
+                cursor.execute("""
+                    INSERT INTO sync_devices (device_id, seq) VALUES (?, ?)
+                    ON CONFLICT (device_id) DO UPDATE SET seq = excluded.seq
+                """, (device_id, seq))
+                cursor.execute("UPDATE sync_devices SET seen = MAX(seen, ?) WHERE local = 1",
+                               (stamp,))
+                watermarks[device_id] = seq
+                received += 1
+                
+                if entity == 'task':
+                    self._apply_task_change(cursor, uid)
+                else:
+                    self._apply_timespan_change(cursor, uid)
+            
+            # Tasks parked at the top level (behind a loop, or waiting for the
+            # tasks below to move) go where their log says once nothing blocks them
+            settled = False
+            while received and not settled:
+                cursor.execute("SELECT uid FROM tasks WHERE parent_id IS NULL")
+                settled = not any([self._apply_task_change(cursor, row[0])
+                                   for row in cursor.fetchall()])
+            cursor.execute("UPDATE sync_devices SET quiet = 0 WHERE local = 1")
+            if received:
+                self.events.publish(DataReset())
+        return received
+    
+    def _winning_change(self, cursor: sqlite3.Cursor, uid: str) -> Optional[sqlite3.Row]:
+        """Newest logged state of a row, or None if it was deleted anywhere."""
+        cursor.execute("""
+            SELECT stamp, device_id, seq, ref_uid, name, start_time, end_time,
+                   (SELECT MAX(deleted) FROM change_log WHERE uid = :uid) AS deleted
+            FROM change_log WHERE uid = :uid
+            ORDER BY stamp DESC, device_id DESC, seq DESC LIMIT 1
+        """, {'uid': uid})
+        winner = cursor.fetchone()
+        return None if winner is None or winner['deleted'] else winner
+    
+    def _parent_uid(self, cursor: sqlite3.Cursor, uid: str, winner: sqlite3.Row) -> Optional[str]:
+        """Parent a task should have: its newest parent, unless that closes a loop.
+        
+        In a loop of newest parents the task whose move is the oldest goes to
+        the top level, so the newer moves win.
+        """
+        chain = {uid: (winner['stamp'], winner['device_id'], winner['seq'])}
+        parent_uid = winner['ref_uid']
+        while parent_uid is not None and parent_uid not in chain:
+            parent = self._winning_change(cursor, parent_uid)
+            if parent is None:
+                break
+            chain[parent_uid] = (parent['stamp'], parent['device_id'], parent['seq'])
+            parent_uid = parent['ref_uid']
+        if parent_uid == uid and min(chain, key=chain.get) == uid:
+            return None
+        return winner['ref_uid']
+    
+    def _apply_task_change(self, cursor: sqlite3.Cursor, uid: str) -> bool:
+        """Bring a task in line with its logged changes (see apply_changes()).
+        
+        Returns:
+            True if the task was added, moved or deleted
+        """
+        winner = self._winning_change(cursor, uid)
+        parent_id = None
+        parent_uid = self._parent_uid(cursor, uid, winner) if winner is not None else None
+        if parent_uid is not None:
+            cursor.execute("SELECT id FROM tasks WHERE uid = ?", (parent_uid,))
+            parent = cursor.fetchone()
+            if parent is None and self._apply_task_change(cursor, parent_uid):
+                # Gone here with a deleted task it no longer belongs to
+                cursor.execute("SELECT id FROM tasks WHERE uid = ?", (parent_uid,))
+                parent = cursor.fetchone()
+            if parent is None:
+                # The parent was deleted: whatever moved into it goes with it
+                winner = None
+            else:
+                parent_id = parent['id']
+        
+        cursor.execute("SELECT id, parent_id, name FROM tasks WHERE uid = ?", (uid,))
+        task = cursor.fetchone()
+        if winner is None:
+            if task:
+                self.delete_task(task['id'])
+            return task is not None
+        
+        if task is None:
+            task_id = self.add_task(winner['name'], parent_id)
+            cursor.execute("UPDATE tasks SET uid = ? WHERE id = ?", (uid, task_id))
+            # Back after it went down with a deleted parent here: so is its content
+            cursor.execute("SELECT DISTINCT entity, uid FROM change_log WHERE ref_uid = ?", (uid,))
+            for entity, child_uid in cursor.fetchall():
+                if entity == 'task':
+                    self._apply_task_change(cursor, child_uid)
+                else:
+                    self._apply_timespan_change(cursor, child_uid)
+            return True
+        if winner['name'] != task['name']:
+            cursor.execute("UPDATE tasks SET name = ? WHERE id = ?", (winner['name'], task['id']))
+            self.tasks_version += 1
+        if parent_id == task['parent_id']:
+            return False
+        if parent_id is not None and parent_id in self.get_descendant_ids(task['id']):
+            # The tasks between here and the new parent move first (one of
+            # them to the top level, if this move closed a loop)
+            cursor.execute("""
+                SELECT tasks.uid FROM task_closure JOIN tasks ON tasks.id = task_closure.ancestor_id
+                WHERE task_closure.descendant_id = ? AND task_closure.ancestor_id IN (
+                    SELECT descendant_id FROM task_closure WHERE ancestor_id = ? AND depth > 0
+                )
+            """, (parent_id, task['id']))
+            for path_uid in [row[0] for row in cursor.fetchall()]:
+                self._apply_task_change(cursor, path_uid)
+        if parent_id is not None and parent_id in self.get_descendant_ids(task['id']):
+            # Tasks below have not caught up yet; wait at the top level
+            if task['parent_id'] is None:
+                return False
+            parent_id = None
+        self.move_task(task['id'], parent_id)
+        return True
+    
+    def _apply_timespan_change(self, cursor: sqlite3.Cursor, uid: str):
+        """Bring a timespan in line with its logged changes (see apply_changes())."""
+        winner = self._winning_change(cursor, uid)
+        task = None
+        if winner is not None:
+            cursor.execute("SELECT id FROM tasks WHERE uid = ?", (winner['ref_uid'],))
+            task = cursor.fetchone()
+            if task is None and self._apply_task_change(cursor, winner['ref_uid']):
+                cursor.execute("SELECT id FROM tasks WHERE uid = ?", (winner['ref_uid'],))
+                task = cursor.fetchone()
+        
+        cursor.execute("SELECT id, task_id FROM timespans WHERE uid = ?", (uid,))
+        timespan = cursor.fetchone()
+        if timespan:
+            self._add_to_totals(cursor, timespan['task_id'],
+                                -self._timespan_seconds(cursor, timespan['id']))
+        if task is None:
+            # Deleted here or there, or its task is gone
+            if timespan:
+                cursor.execute("DELETE FROM timespans WHERE id = ?", (timespan['id'],))
+            return
+        
+        if timespan is None:
+            # Missing timespans that end before the archive cutoff were archived here
+            cursor.execute("""
+                SELECT CAST(strftime('%s', date(MAX(day), '+1 day'), 'utc') AS INTEGER) * 1000
+                FROM archived_totals
+            """)
+            archived_until = cursor.fetchone()[0]
+            if archived_until is not None and winner['end_time'] is not None \
+                    and winner['end_time'] <= archived_until:
+                return
+            cursor.execute("""
+                INSERT INTO timespans (task_id, start_time, end_time, uid) VALUES (?, ?, ?, ?)
+            """, (task['id'], winner['start_time'], winner['end_time'], uid))
+            timespan_id = cursor.lastrowid
+        else:
+            timespan_id = timespan['id']
+            cursor.execute("""
+                UPDATE timespans SET task_id = ?, start_time = ?, end_time = ? WHERE id = ?
+            """, (task['id'], winner['start_time'], winner['end_time'], timespan_id))
+        self._add_to_totals(cursor, task['id'], self._timespan_seconds(cursor, timespan_id))
+    
+    def _timespan_seconds(self, cursor: sqlite3.Cursor, timespan_id: int) -> float:
+        """Duration of a finished timespan in seconds (0 while running)."""
+        cursor.execute("""
+            SELECT COALESCE((end_time - start_time) / 1000.0, 0)
+            FROM timespans WHERE id = ?
+        """, (timespan_id,))
+        row = cursor.fetchone()
+        return row[0] if row else 0.0
+    
+    def _add_to_totals(self, cursor: sqlite3.Cursor, task_id: int, seconds: float):
+        """Add seconds to a task's own total and to its whole ancestor chain."""
+        if not seconds:
+            return
+        cursor.execute(
+            "UPDATE task_totals SET own_seconds = own_seconds + ? WHERE task_id = ?",
+            (seconds, task_id)
+        )
+        self._add_to_ancestors(cursor, task_id, seconds)
+    
+    def _add_to_ancestors(self, cursor: sqlite3.Cursor, task_id: int, seconds: float):
+        """Add seconds to the subtree total of a task and all its ancestors."""
+        cursor.execute("""
+            UPDATE task_totals SET subtree_seconds = subtree_seconds + ?
+            WHERE task_id IN (
+                SELECT ancestor_id FROM task_closure WHERE descendant_id = ?
+            )
+        """, (seconds, task_id))
     
     def close(self):
-        """Close database connection."""
-        self.connection.close()
+        """Close all database connections."""
+        self.connections.close()
@@ -4,7 +4,7 @@ This demonstrates how the modules work together.
 """
 
 import time
-from database import Database
+from database import Database, from_epoch_ms
 from task_manager import TaskManager
 from timer import Timer
 
@@ -60,8 +60,9 @@ def demo():
     print("   Timer stopped!")
     
     print("\n5. Summary of hours by task:")
+    totals = db.get_all_task_totals()
     for task_id, name, level in tree:
-        hours = db.get_task_total_hours(task_id, include_children=True)
+        own_hours, hours = totals[task_id]
         if hours > 0:
             print(f"   {name}: {hours:.4f} hours")
     
@@ -69,8 +70,8 @@ def demo():
     timespans = db.get_all_timespans()
     for ts in timespans:
         print(f"   Task: {ts['task_name']}")
-        print(f"   Start: {ts['start_time']}")
-        print(f"   End: {ts['end_time']}")
+        print(f"   Start: {from_epoch_ms(ts['start_time'])}")
+        print(f"   End: {from_epoch_ms(ts['end_time'])}")
         print()
     
     # Cleanup
@@ -19,9 +19,8 @@ import os
 script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, script_dir)
 
-from database import Database
+from database import Database, from_epoch_ms
 from task_manager import TaskManager
-from datetime import datetime, timedelta
 
 # Create demo database
 demo_db_path = "/tmp/demo_edit_feature.db"
@@ -60,7 +59,7 @@ db.stop_timespan(ts3_id)
 print("\nInitial timespans:")
 timespans = db.get_all_timespans()
 for ts in timespans:
-    start_time = datetime.fromisoformat(ts['start_time']).strftime('%H:%M:%S')
+    start_time = from_epoch_ms(ts['start_time']).strftime('%H:%M:%S')
     print(f"  Timespan {ts['id']}: {ts['task_name']} (started at {start_time})")
 
 # Demonstrate the edit feature
@@ -78,7 +77,7 @@ print("\n✓ Timespan updated successfully!")
 print("\nUpdated timespans:")
 timespans = db.get_all_timespans()
 for ts in timespans:
-    start_time = datetime.fromisoformat(ts['start_time']).strftime('%H:%M:%S')
+    start_time = from_epoch_ms(ts['start_time']).strftime('%H:%M:%S')
     marker = " ← Updated!" if ts['id'] == ts1_id else ""
     print(f"  Timespan {ts['id']}: {ts['task_name']} (started at {start_time}){marker}")
 
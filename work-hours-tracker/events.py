@@ -0,0 +1,143 @@
+"""
+Change notification module for work hours tracker.
+Publishes typed events about task and timespan changes to subscribed views.
+"""
+
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Type
+
+
+@dataclass(frozen=True)
+class Event:
+    """Base class of all change events; subscribe to it to receive every event."""
+
+
+@dataclass(frozen=True)
+class TaskAdded(Event):
+    """A new task was created."""
+    task_id: int
+    parent_id: Optional[int]
+    name: str
+
+
+@dataclass(frozen=True)
+class TaskDeleted(Event):
+    """A task was deleted together with its subtree and their timespans."""
+    task_id: int
+    parent_id: Optional[int]
+    deleted_ids: Tuple[int, ...]  # The task and all its descendants
+    timespan_count: int  # Timespans deleted with them
+
+
+@dataclass(frozen=True)
+class TaskMoved(Event):
+    """A task (with its subtree) got a new parent."""
+    task_id: int
+    old_parent_id: Optional[int]
+    new_parent_id: Optional[int]
+
+
+@dataclass(frozen=True)
+class TimespanStarted(Event):
+    """A running timespan was started."""
+    timespan_id: int
+    task_id: int
+
+
+@dataclass(frozen=True)
+class TimespanStopped(Event):
+    """A running timespan got its end time."""
+    timespan_id: int
+    task_id: int
+
+
+@dataclass(frozen=True)
+class TimespanReassigned(Event):
+    """A timespan was moved to another task."""
+    timespan_id: int
+    old_task_id: int
+    new_task_id: int
+
+
+@dataclass(frozen=True)
+class TimespansAdded(Event):
+    """Timespans were inserted in bulk (e.g. by an import)."""
+    task_ids: Tuple[int, ...]  # Tasks that received at least one timespan
+    count: int
+
+
+@dataclass(frozen=True)
+class DataReset(Event):
+    """Stored data changed wholesale; views should reload everything."""
+
+
+Handler = Callable[[Event], None]
+
+
+class EventBus:
+    """Delivers events to the handlers subscribed to their type.
+
+    Handlers subscribed to a base class (e.g. ``Event``) also receive its
+    subclasses. Inside ``deferred()`` events are queued instead, and only
+    delivered once the outermost block exits without an exception, so
+    subscribers never hear about writes that were rolled back.
+
+    Handlers run on the thread that published (or committed) the change;
+    GUI subscribers that may be called from worker threads should hand the
+    event over to their main loop.
+    """
+
+    def __init__(self):
+        """Create a bus without subscribers."""
+        self._handlers: Dict[Type[Event], List[Handler]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def subscribe(self, event_type: Type[Event], handler: Handler) -> Handler:
+        """Call ``handler(event)`` for every event of the given type."""
+        with self._lock:
+            self._handlers.setdefault(event_type, []).append(handler)
+        return handler
+
+    def unsubscribe(self, event_type: Type[Event], handler: Handler):
+        """Stop calling a handler (no error if it was not subscribed)."""
+        with self._lock:
+            handlers = self._handlers.get(event_type, [])
+            if handler in handlers:
+                handlers.remove(handler)
+
+    def publish(self, event: Event):
+        """Deliver an event now, or queue it while inside deferred()."""
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            pending.append(event)
+            return
+        with self._lock:
+            handlers = [handler
+                        for event_type in type(event).__mro__
+                        for handler in self._handlers.get(event_type, ())]
+        for handler in handlers:
+            handler(event)
+
+    @contextmanager
+    def deferred(self) -> Iterator[None]:
+        """Queue events published by this thread until the block succeeds.
+
+        Nested blocks join the outermost one. If an exception escapes, the
+        queued events are dropped.
+        """
+        if getattr(self._local, 'pending', None) is not None:
+            yield
+            return
+
+        self._local.pending = []
+        try:
+            yield
+        except BaseException:
+            self._local.pending = None
+            raise
+        pending, self._local.pending = self._local.pending, None
+        for event in pending:
+            self.publish(event)
@@ -0,0 +1,183 @@
+"""
+Interval index module for work hours tracker.
+Finds what was running at a moment, timespans overlapping a range, and
+overlaps and gaps in the whole history (double-counted hours).
+"""
+
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+from database import Database, TimeValue, now_ms, to_epoch_ms
+
+
+@dataclass(frozen=True)
+class Overlap:
+    """Two timespans that cover the same time."""
+    first_id: int
+    second_id: int
+    start_ms: int
+    end_ms: int
+
+    @property
+    def hours(self) -> float:
+        """Length of the shared time in hours."""
+        return (self.end_ms - self.start_ms) / 3600000.0
+
+
+class IntervalIndex:
+    """Nested containment list over timespans, stored in flat sorted arrays.
+
+    Timespans are sorted by start (longest first on ties) and every
+    timespan that lies completely inside another one goes into that one's
+    sublist. Within a list no entry contains another, so both starts and
+    ends are sorted, and the entries overlapping a range are found with one
+    bisect on the ends followed by a scan that stops at the first start
+    past the range. A query therefore costs O(log n + k) for k results
+    (plus a bisect per sublist it enters).
+
+    Each list occupies a contiguous slice of the arrays; ``_sub_start`` and
+    ``_sub_end`` give the slice of an entry's sublist (empty if none).
+    Running timespans count as ending at the time the index was built.
+    The index is a snapshot: load it again after timespans change.
+    """
+
+    def __init__(self, timespans: List[Tuple[int, int, int, int]]):
+        """Build the index.
+
+        Args:
+            timespans: (timespan_id, task_id, start_ms, end_ms) tuples
+        """
+        ordered = sorted((span for span in timespans if span[3] > span[2]),
+                         key=lambda span: (span[2], -span[3], span[0]))
+
+        # Parent of each entry: the innermost earlier entry that contains it
+        sublists: Dict[int, List[int]] = {-1: []}
+        stack: List[int] = []
+        for position, (_, _, start, end) in enumerate(ordered):
+            while stack and ordered[stack[-1]][3] < end:
+                stack.pop()
+            sublists.setdefault(stack[-1] if stack else -1, []).append(position)
+            stack.append(position)
+
+        # Lay the lists out one after another, the top-level list first
+        self.ids = array('q')
+        self.task_ids = array('q')
+        self.starts = array('q')
+        self.ends = array('q')
+        self._sub_start = array('q')
+        self._sub_end = array('q')
+        slot: Dict[int, int] = {}
+        queue = [-1]
+        for parent in queue:
+            if parent != -1:
+                self._sub_start[slot[parent]] = len(self.ids)
+            for position in sublists[parent]:
+                slot[position] = len(self.ids)
+                timespan_id, task_id, start, end = ordered[position]
+                self.ids.append(timespan_id)
+                self.task_ids.append(task_id)
+                self.starts.append(start)
+                self.ends.append(end)
+                self._sub_start.append(0)
+                self._sub_end.append(0)
+                if position in sublists:
+                    queue.append(position)
+            if parent != -1:
+                self._sub_end[slot[parent]] = len(self.ids)
+        self._top = len(sublists[-1])
+
+    @classmethod
+    def load(cls, db: Database, since: Optional[TimeValue] = None,
+             until: Optional[TimeValue] = None) -> 'IntervalIndex':
+        """Index the timespans of a database that touch [since, until)."""
+        cursor = db.read_connection.cursor()
+        cursor.row_factory = None
+        cursor.execute("""
+            SELECT id, task_id, start_time, COALESCE(end_time, :now)
+            FROM timespans
+            WHERE (:since IS NULL OR end_time IS NULL OR end_time > :since)
+              AND (:until IS NULL OR start_time < :until)
+        """, {'now': now_ms(),
+              'since': to_epoch_ms(since) if since is not None else None,
+              'until': to_epoch_ms(until) if until is not None else None})
+        return cls(cursor.fetchall())
+
+    def __len__(self) -> int:
+        """Number of indexed timespans."""
+        return len(self.ids)
+
+    def _overlapping(self, start_ms: int, end_ms: int) -> Iterator[int]:
+        """Array slots of the entries overlapping [start_ms, end_ms)."""
+        lists = [(0, self._top)]
+        while lists:
+            first, last = lists.pop()
+            slot = bisect_right(self.ends, start_ms, first, last)
+            while slot < last and self.starts[slot] < end_ms:
+                yield slot
+                if self._sub_end[slot] > self._sub_start[slot]:
+                    lists.append((self._sub_start[slot], self._sub_end[slot]))
+                slot += 1
+
+    def overlapping(self, since: TimeValue, until: TimeValue) -> List[Tuple[int, int, int, int]]:
+        """Timespans that share time with [since, until), ordered by start.
+
+        Returns:
+            (timespan_id, task_id, start_ms, end_ms) tuples
+        """
+        slots = self._overlapping(to_epoch_ms(since), to_epoch_ms(until))
+        return sorted(((self.ids[slot], self.task_ids[slot], self.starts[slot], self.ends[slot])
+                       for slot in slots), key=lambda span: (span[2], span[0]))
+
+    def at(self, moment: TimeValue) -> List[Tuple[int, int, int, int]]:
+        """Timespans running at a moment (start <= moment < end)."""
+        moment_ms = to_epoch_ms(moment)
+        return self.overlapping(moment_ms, moment_ms + 1)
+
+    def overlaps(self) -> Iterator[Overlap]:
+        """Every pair of timespans sharing time, each pair once."""
+        for slot in range(len(self.ids)):
+            start, end = self.starts[slot], self.ends[slot]
+            for other in self._overlapping(start, end):
+                # Report each pair from the entry that sorts first
+                if (self.starts[other], -self.ends[other], self.ids[other]) > \
+                        (start, -end, self.ids[slot]):
+                    yield Overlap(self.ids[slot], self.ids[other],
+                                  max(start, self.starts[other]), min(end, self.ends[other]))
+
+    def covered(self) -> List[Tuple[int, int]]:
+        """Merged (start_ms, end_ms) stretches during which anything was running."""
+        # Nested entries add nothing, so the top-level list alone gives the union
+        stretches: List[Tuple[int, int]] = []
+        for slot in range(self._top):
+            start, end = self.starts[slot], self.ends[slot]
+            if stretches and start <= stretches[-1][1]:
+                stretches[-1] = (stretches[-1][0], max(stretches[-1][1], end))
+            else:
+                stretches.append((start, end))
+        return stretches
+
+    def gaps(self, min_ms: int = 0, max_ms: Optional[int] = None) -> List[Tuple[int, int]]:
+        """(start_ms, end_ms) pauses between covered stretches, filtered by length."""
+        stretches = self.covered()
+        return [(before[1], after[0]) for before, after in zip(stretches, stretches[1:])
+                if after[0] - before[1] >= min_ms
+                and (max_ms is None or after[0] - before[1] <= max_ms)]
+
+    def double_counted_hours(self) -> Tuple[float, Dict[int, float]]:
+        """Hours counted more than once.
+
+        Returns:
+            (tracked hours minus the hours during which anything ran,
+            task_id -> hours its timespans share with other timespans);
+            an overlap between two tasks counts for both of them
+        """
+        tracked = sum(end - start for start, end in zip(self.starts, self.ends))
+        covered = sum(end - start for start, end in self.covered())
+        task_of = dict(zip(self.ids, self.task_ids))
+        per_task: Dict[int, float] = {}
+        for overlap in self.overlaps():
+            tasks = {task_of[overlap.first_id], task_of[overlap.second_id]}
+            for task_id in tasks:
+                per_task[task_id] = per_task.get(task_id, 0.0) + overlap.hours
+        return (tracked - covered) / 3600000.0, per_task
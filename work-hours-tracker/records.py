@@ -0,0 +1,101 @@
+"""
+Record types for work hours tracker.
+Typed, compact rows for tasks and timespans, and an array-backed list for
+loading very many timespans at once.
+"""
+
+import sqlite3
+from array import array
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Sequence, Union
+
+# Stored in TimespanArray.ends for running timespans (times are never negative)
+_RUNNING = -1
+
+
+class _Record(tuple):
+    """Tuple base of the records; also readable by column name like sqlite3.Row."""
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    @classmethod
+    def row_factory(cls, cursor: sqlite3.Cursor, row: tuple):
+        """sqlite3 row factory; the query must select the fields in order."""
+        return cls._make(row)
+
+
+class Task(_Record, NamedTuple('Task', [('id', int), ('name', str),
+                                        ('parent_id', Optional[int]),
+                                        ('created_at', Optional[str]),
+                                        ('uid', Optional[str])])):
+    """A row of the ``tasks`` table."""
+    __slots__ = ()
+
+
+class Timespan(_Record, NamedTuple('Timespan', [('id', int), ('task_id', int),
+                                                ('start_time', int),
+                                                ('end_time', Optional[int]),
+                                                ('task_name', str)])):
+    """A row of the ``timespans`` table with its task's name (times in epoch ms)."""
+    __slots__ = ()
+
+
+# Columns to select for each record type, in field order
+TASK_COLUMNS = "tasks.id, tasks.name, tasks.parent_id, tasks.created_at, tasks.uid"
+TIMESPAN_COLUMNS = "t.id, t.task_id, t.start_time, t.end_time, tasks.name"
+
+
+class TimespanArray(Sequence[Timespan]):
+    """Timespans stored column by column in typed arrays.
+
+    A list of records costs a tuple plus an int object per column for every
+    row; here a row is four 8-byte array slots, and the task names are kept
+    once per task. Indexing builds the Timespan on the fly, and the
+    ``ids``/``task_ids``/``starts``/``ends`` columns can be scanned directly
+    (``ends`` holds -1 for running timespans).
+    """
+    __slots__ = ('ids', 'task_ids', 'starts', 'ends', 'task_names')
+
+    def __init__(self, task_names: Dict[int, str]):
+        """Create an empty array.
+
+        Args:
+            task_names: task_id -> name of every task rows may refer to
+        """
+        self.ids = array('q')
+        self.task_ids = array('q')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.task_names = task_names
+
+    def extend(self, rows: Iterable[tuple]):
+        """Append (id, task_id, start_time, end_time) rows (end_time -1 while running)."""
+        rows = list(rows)
+        if not rows:
+            return
+        ids, task_ids, starts, ends = zip(*rows)
+        self.ids.extend(ids)
+        self.task_ids.extend(task_ids)
+        self.starts.extend(starts)
+        self.ends.extend(ends)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        end = self.ends[index]
+        task_id = self.task_ids[index]
+        return Timespan(self.ids[index], task_id, self.starts[index],
+                        None if end == _RUNNING else end, self.task_names[task_id])
+
+    def __iter__(self) -> Iterator[Timespan]:
+        names = self.task_names
+        for timespan_id, task_id, start, end in zip(self.ids, self.task_ids,
+                                                     self.starts, self.ends):
+            yield Timespan(timespan_id, task_id, start,
+                           None if end == _RUNNING else end, names[task_id])
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Reporting module for work hours tracker.
+Computes hours per task subtree in day, week or month buckets.
+
+Usage:
+    python reports.py --bucket week --since 2024-01-01 --root "Work/Client 1" report.csv
+"""
+
+import argparse
+import csv
+import sys
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, TextIO
+from database import Database, TimeValue, archived_day_range, from_epoch_ms, to_epoch_ms
+from task_manager import TaskManager
+
+BUCKETS = ('day', 'week', 'month')
+
+
+def bucket_start(moment: datetime, bucket: str) -> datetime:
+    """Start of the day/week (Monday)/month containing a moment."""
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == 'day':
+        return day
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    raise ValueError(f"Unknown bucket {bucket!r}, expected one of {', '.join(BUCKETS)}")
+
+
+def next_bucket(start: datetime, bucket: str) -> datetime:
+    """Start of the bucket following the one starting at ``start``."""
+    if bucket == 'day':
+        return start + timedelta(days=1)
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def bucket_bounds(since: datetime, until: datetime, bucket: str) -> List[datetime]:
+    """Bucket boundaries covering [since, until); n buckets give n + 1 values."""
+    bounds = [bucket_start(since, bucket)]
+    while bounds[-1] < until:
+        bounds.append(next_bucket(bounds[-1], bucket))
+    return bounds
+
+
+@dataclass
+class BucketReport:
+    """Hours per task and time bucket, stored as one flat row-major array.
+
+    ``hours[row * len(buckets) + column]`` holds the hours of
+    ``task_ids[row]`` (including its subtree) in ``buckets[column]``.
+    """
+    bucket: str
+    task_ids: List[int]
+    buckets: List[datetime]
+    hours: array
+
+    def __post_init__(self):
+        self._rows = {task_id: row for row, task_id in enumerate(self.task_ids)}
+
+    def row(self, task_id: int) -> array:
+        """Hours of one task for every bucket."""
+        width = len(self.buckets)
+        start = self._rows[task_id] * width
+        return self.hours[start:start + width]
+
+    def value(self, task_id: int, column: int) -> float:
+        """Hours of one task in one bucket."""
+        return self.hours[self._rows[task_id] * len(self.buckets) + column]
+
+    def total(self, task_id: int) -> float:
+        """Hours of one task over the whole report range."""
+        return sum(self.row(task_id))
+
+    def write_csv(self, fp: TextIO, paths: Dict[int, str]):
+        """Write the matrix as CSV: one row per task, one column per bucket."""
+        writer = csv.writer(fp)
+        writer.writerow(['task'] + [b.date().isoformat() for b in self.buckets] + ['total'])
+        for task_id in self.task_ids:
+            row = self.row(task_id)
+            writer.writerow([paths.get(task_id, task_id)]
+                            + [f"{hours:.2f}" for hours in row]
+                            + [f"{sum(row):.2f}"])
+
+
+# SQLite date modifiers: (floor to bucket start, step to the next bucket)
+_SQL_MODIFIERS = {
+    'day': (('start of day', 'start of day'), '+1 day'),
+    'week': (('-6 days', 'weekday 1'), '+7 days'),
+    'month': (('start of month', 'start of month'), '+1 month'),
+}
+
+
+def bucketed_totals(db: Database, since: TimeValue, until: TimeValue,
+                    bucket: str = 'day', root_id: Optional[int] = None) -> BucketReport:
+    """Hours per task subtree in day/week/month buckets over [since, until).
+
+    Inside SQLite, timespans are clipped to the range and split at bucket
+    boundaries (midnight, Monday, first of the month, in local time) by a
+    recursive CTE, so the work grows with the number of pieces rather than
+    timespans x buckets. The pieces are then rolled up the hierarchy through
+    the closure table, all in one query. Archived time comes from the
+    per-day ``archived_totals`` rows (days whose midnight is in the range).
+
+    Args:
+        db: Database to read from
+        since: Start of the report range
+        until: End of the report range
+        bucket: 'day', 'week' or 'month'
+        root_id: Only report this task's subtree (None for all tasks)
+    """
+    since_dt = from_epoch_ms(since) if isinstance(since, int) else since
+    until_dt = from_epoch_ms(until) if isinstance(until, int) else until
+    buckets = bucket_bounds(since_dt, until_dt, bucket)[:-1]
+    (floor1, floor2), step = _SQL_MODIFIERS[bucket]
+    first_day, end_day = archived_day_range(since_dt, until_dt)
+
+    cursor = db.read_connection.cursor()
+    cursor.row_factory = None
+    if root_id is None:
+        cursor.execute("SELECT id FROM tasks ORDER BY id")
+    else:
+        cursor.execute(
+            "SELECT descendant_id FROM task_closure WHERE ancestor_id = ? ORDER BY descendant_id",
+            (root_id,)
+        )
+    task_ids = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute("""
+        WITH RECURSIVE pieces(task_id, start_ms, end_ms, bucket) AS (
+            SELECT task_id, MAX(start_time, :since), MIN(end_time, :until),
+                   date(MAX(start_time, :since) / 1000, 'unixepoch', 'localtime', :floor1, :floor2)
+            FROM timespans
+            WHERE end_time IS NOT NULL AND start_time < :until AND end_time > :since
+              AND (:root IS NULL OR task_id IN (
+                  SELECT descendant_id FROM task_closure WHERE ancestor_id = :root
+              ))
+            UNION ALL
+            SELECT task_id, CAST(strftime('%s', date(bucket, :step), 'utc') AS INTEGER) * 1000,
+                   end_ms, date(bucket, :step)
+            FROM pieces
+            WHERE CAST(strftime('%s', date(bucket, :step), 'utc') AS INTEGER) * 1000 < end_ms
+        ),
+        own(task_id, bucket, ms) AS (
+            SELECT task_id, bucket,
+                   SUM(MIN(end_ms, CAST(strftime('%s', date(bucket, :step), 'utc') AS INTEGER) * 1000)
+                       - start_ms)
+            FROM pieces
+            GROUP BY task_id, bucket
+            UNION ALL
+            SELECT task_id, date(day, :floor1, :floor2), SUM(seconds) * 1000
+            FROM archived_totals
+            WHERE day >= :first_day AND day < :end_day
+              AND (:root IS NULL OR task_id IN (
+                  SELECT descendant_id FROM task_closure WHERE ancestor_id = :root
+              ))
+            GROUP BY 1, 2
+        )
+        SELECT task_closure.ancestor_id, own.bucket, SUM(own.ms)
+        FROM own
+        JOIN task_closure ON task_closure.descendant_id = own.task_id
+        WHERE :root IS NULL OR task_closure.ancestor_id IN (
+            SELECT descendant_id FROM task_closure WHERE ancestor_id = :root
+        )
+        GROUP BY task_closure.ancestor_id, own.bucket
+    """, {'since': to_epoch_ms(since_dt), 'until': to_epoch_ms(until_dt), 'root': root_id,
+          'floor1': floor1, 'floor2': floor2, 'step': step,
+          'first_day': first_day, 'end_day': end_day})
+
+    width = len(buckets)
+    rows = {task_id: row for row, task_id in enumerate(task_ids)}
+    columns = {start.date().isoformat(): column for column, start in enumerate(buckets)}
+    hours = array('d', bytes(8 * width * len(task_ids)))
+    for task_id, bucket_key, ms in cursor:
+        if task_id in rows and bucket_key in columns:
+            hours[rows[task_id] * width + columns[bucket_key]] = ms / 3600000.0
+
+    return BucketReport(bucket, task_ids, buckets, hours)
+
+
+def main(argv=None) -> int:
+    """Command-line entry point: write a bucketed report as CSV."""
+    parser = argparse.ArgumentParser(description="Hours per task in day/week/month buckets.")
+    parser.add_argument('file', nargs='?', default='-', help="CSV file to write (default stdout)")
+    parser.add_argument('--db', default='workhours.db', help="Database file")
+    parser.add_argument('--bucket', choices=BUCKETS, default='day')
+    parser.add_argument('--since', type=datetime.fromisoformat, required=True)
+    parser.add_argument('--until', type=datetime.fromisoformat, default=None,
+                        help="End of the range (default: now)")
+    parser.add_argument('--root', help="Only report this task path and its children")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    try:
+        task_manager = TaskManager(db)
+        root_id = None
+        if args.root:
+            root_id = task_manager.resolve_task_path(args.root, create=False)
+            if root_id is None:
+                parser.error(f"Task {args.root!r} does not exist")
+
+        report = bucketed_totals(db, args.since, args.until or datetime.now(),
+                                 args.bucket, root_id)
+        paths = task_manager.get_all_task_paths()
+        if args.file == '-':
+            report.write_csv(sys.stdout, paths)
+        else:
+            with open(args.file, 'w', newline='', encoding='utf-8') as fp:
+                report.write_csv(fp, paths)
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Search module for work hours tracker.
+Finds tasks by any part of their full path while the user types.
+"""
+
+import heapq
+import re
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Set, Tuple
+from events import DataReset, TaskAdded, TaskDeleted, TaskMoved
+from task_manager import TaskManager
+
+_WORD = re.compile(r'\w+')
+
+
+def _trigrams(text: str) -> Set[str]:
+    """All 3-character substrings of a string."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TaskPathIndex:
+    """In-memory index over full task paths ('Work/Client 1/Feature A').
+
+    - Terms of 3+ characters are looked up in a trigram index (and checked
+      as substrings when longer than one trigram).
+    - Shorter terms match the start of any word in the path, through a
+      dictionary of all 1- and 2-character word prefixes.
+
+    Every whitespace-separated term of the query must match. Results are
+    ranked: task name starts with the first term, then a path segment does,
+    then a word does, then any substring; shorter paths first within a rank.
+    """
+
+    def __init__(self, paths: Optional[Dict[int, str]] = None):
+        """Create an index, optionally filled with task_id -> path entries."""
+        self.paths: Dict[int, str] = {}
+        self._lower: Dict[int, str] = {}
+        self._trigrams: Dict[str, Set[int]] = {}
+        self._short: Dict[str, Set[int]] = {}
+        self._names: List[Tuple[str, int]] = []    # Sorted (lowercase name, id)
+        self._ordered: List[Tuple[str, int]] = []  # Sorted (lowercase path, id)
+        self._task_manager: Optional[TaskManager] = None
+        if paths:
+            self.rebuild(paths)
+
+    @classmethod
+    def for_task_manager(cls, task_manager: TaskManager) -> 'TaskPathIndex':
+        """Build an index of all tasks that follows task changes from now on."""
+        index = cls(task_manager.get_all_task_paths())
+        index._task_manager = task_manager
+        task_manager.events.subscribe(TaskAdded, index._on_task_added)
+        task_manager.events.subscribe(TaskDeleted, index._on_task_deleted)
+        task_manager.events.subscribe(TaskMoved, index._on_paths_changed)
+        task_manager.events.subscribe(DataReset, index._on_paths_changed)
+        return index
+
+    def rebuild(self, paths: Dict[int, str]):
+        """Replace the whole index."""
+        self.paths = {}
+        self._lower = {}
+        self._trigrams = {}
+        self._short = {}
+        for task_id, path in paths.items():
+            self._index(task_id, path)
+        self._names = sorted((self._name(task_id), task_id) for task_id in self.paths)
+        self._ordered = sorted((lower, task_id) for task_id, lower in self._lower.items())
+
+    def _name(self, task_id: int) -> str:
+        """Lowercase task name (last path segment)."""
+        return self._lower[task_id].rsplit('/', 1)[-1]
+
+    @staticmethod
+    def _keys(lower: str) -> Set[str]:
+        """Trigrams and short word prefixes under which a path is indexed."""
+        keys = _trigrams(lower)
+        for word in _WORD.findall(lower):
+            keys.add(word[:1])
+            keys.add(word[:2])
+        return keys
+
+    def _index(self, task_id: int, path: str):
+        """Add a path to the dictionaries (but not to the sorted lists)."""
+        lower = path.lower()
+        self.paths[task_id] = path
+        self._lower[task_id] = lower
+        for key in self._keys(lower):
+            table = self._trigrams if len(key) == 3 else self._short
+            table.setdefault(key, set()).add(task_id)
+
+    def add(self, task_id: int, path: str):
+        """Index a new task (or replace the path of an existing one)."""
+        if task_id in self.paths:
+            self.remove(task_id)
+        self._index(task_id, path)
+        insort(self._names, (self._name(task_id), task_id))
+        insort(self._ordered, (self._lower[task_id], task_id))
+
+    def remove(self, task_id: int):
+        """Drop a task from the index."""
+        if task_id not in self._lower:
+            return
+        self._discard(self._names, (self._name(task_id), task_id))
+        self._discard(self._ordered, (self._lower[task_id], task_id))
+        lower = self._lower.pop(task_id)
+        del self.paths[task_id]
+        for key in self._keys(lower):
+            table = self._trigrams if len(key) == 3 else self._short
+            ids = table.get(key)
+            if ids is not None:
+                ids.discard(task_id)
+                if not ids:
+                    del table[key]
+
+    @staticmethod
+    def _discard(entries: List[Tuple[str, int]], entry: Tuple[str, int]):
+        """Remove an entry from a sorted list if present."""
+        position = bisect_left(entries, entry)
+        if position < len(entries) and entries[position] == entry:
+            del entries[position]
+
+    @staticmethod
+    def _prefixed(entries: List[Tuple[str, int]], prefix: str) -> Set[int]:
+        """IDs of the entries of a sorted (text, id) list whose text starts with prefix."""
+        start = bisect_left(entries, (prefix,))
+        end = bisect_left(entries, (prefix + '\U0010ffff',), start)
+        return {task_id for _, task_id in entries[start:end]}
+
+    def _postings(self, term: str) -> Set[int]:
+        """IDs of the paths that may match one lowercase term (superset for long terms)."""
+        if len(term) < 3:
+            return self._short.get(term, set())
+        # The rarest trigram is selective enough; the substring check does the rest
+        return min((self._trigrams.get(trigram, set()) for trigram in _trigrams(term)), key=len)
+
+    def search(self, query: str, limit: int = 50) -> List[Tuple[int, str]]:
+        """Best matching tasks for a query, as (task_id, path) pairs.
+
+        An empty query returns the first ``limit`` paths alphabetically.
+        """
+        terms = query.lower().split()
+        if not terms:
+            return [(task_id, self.paths[task_id]) for _, task_id in self._ordered[:limit]]
+
+        # Intersect the index entries of all terms first (in C), then confirm
+        # the terms longer than one trigram on the few paths that are left
+        postings = sorted((self._postings(term) for term in terms), key=len)
+        ids = postings[0].intersection(*postings[1:])
+        lower = self._lower
+        long_terms = [term for term in terms if len(term) > 3]
+        if long_terms:
+            ids = {task_id for task_id in ids
+                   if all(term in lower[task_id] for term in long_terms)}
+
+        # Ranks: 0 = name starts with the first term, 1 = a path segment does,
+        # 2 = a word does, 3 = substring elsewhere. Most queries are answered
+        # from the name-prefix tier alone, without looking at the other matches.
+        first = terms[0]
+        by_length = lambda task_id: (len(lower[task_id]), lower[task_id])
+        best = heapq.nsmallest(limit, self._prefixed(self._names, first) & ids, key=by_length)
+        if len(best) < limit:
+            segment = '/' + first
+            word = re.compile(r'\b' + re.escape(first))
+
+            def rank(task_id):
+                path = lower[task_id]
+                if path.startswith(first) or segment in path:
+                    return 1
+                return 2 if word.search(path) else 3
+
+            rest = ids.difference(best)
+            best += heapq.nsmallest(limit - len(best), rest,
+                                    key=lambda task_id: (rank(task_id),) + by_length(task_id))
+        return [(task_id, self.paths[task_id]) for task_id in best]
+
+    def _on_task_added(self, event: TaskAdded):
+        """Index a new task under its parent's path."""
+        parent_path = self.paths.get(event.parent_id) if event.parent_id is not None else None
+        if event.parent_id is not None and parent_path is None:
+            parent_path = self._task_manager.get_task_path(event.parent_id)
+        self.add(event.task_id,
+                 f"{parent_path}/{event.name}" if parent_path is not None else event.name)
+
+    def _on_task_deleted(self, event: TaskDeleted):
+        """Forget a deleted subtree."""
+        for task_id in event.deleted_ids:
+            self.remove(task_id)
+
+    def _on_paths_changed(self, event):
+        """Re-read every path after tasks moved."""
+        self.rebuild(self._task_manager.get_all_task_paths())
@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+"""
+HTTP API module for work hours tracker.
+Serves tasks, timers and reports as JSON to local scripts, the GUI and browser
+extensions, so they share one process (and one writer) instead of fighting
+over SQLite locks.
+
+Usage:
+    python server.py --port 8765
+    python server.py --load-test
+
+Request bodies must be sent as Content-Type: application/json. Requests
+carrying an Origin header (browsers) are refused unless the origin was allowed
+with --allow-origin, and the Host header must name the address the server
+listens on, so web pages cannot drive the API.
+
+Endpoints (JSON in, JSON out):
+    GET    /status                      running timer, if any
+    POST   /start      {"task": path}   start timing a task (or {"task_id": id})
+    POST   /stop                        stop the running timer
+    GET    /tasks                       all tasks with their paths
+    POST   /tasks      {"path": path}   create a task (or {"name", "parent_id"})
+    DELETE /tasks/<id>                  delete a task and its subtree
+    POST   /tasks/<id>/move {"parent_id"}
+    GET    /totals?since=&until=        hours per task
+    GET    /timespans?task_id=&since=&until=&limit=&after_start=&after_id=
+    POST   /timespans/<id>/task {"task_id"}
+    GET    /reports/buckets?since=&until=&bucket=&root_id=
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from database import Database, now_ms, to_epoch_ms
+from reports import bucketed_totals
+from task_manager import TaskManager
+from timer import Timer
+
+MAX_BODY = 1024 * 1024
+REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+           405: 'Method Not Allowed', 413: 'Payload Too Large', 415: 'Unsupported Media Type',
+           500: 'Internal Server Error'}
+LOCAL_HOSTS = {'localhost', '127.0.0.1', '::1'}
+ANY_HOST = {'', '0.0.0.0', '::'}
+
+
+class HTTPError(Exception):
+    """Error answered with a JSON {"error": message} body."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _parse_time(value: Optional[str]) -> Optional[int]:
+    """Query parameter (ISO date/time or epoch milliseconds) to epoch milliseconds."""
+    if value is None or value == '':
+        return None
+    if value.isdigit():
+        return int(value)
+    try:
+        return to_epoch_ms(datetime.fromisoformat(value))
+    except ValueError:
+        raise HTTPError(400, f"Invalid date/time {value!r}")
+
+
+def _parse_int(value: Optional[str], name: str) -> Optional[int]:
+    """Optional integer query parameter."""
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPError(400, f"Parameter {name!r} must be an integer")
+
+
+class TrackerServer:
+    """Local HTTP/JSON service over one Database.
+
+    All writes are queued and executed one at a time by a single writer task
+    on its own thread (and SQLite connection), so clients never compete for
+    the write lock. Reads run concurrently on a pool of reader threads, each
+    with its own connection; with WAL they never wait for the writer.
+    """
+
+    def __init__(self, db: Database, host: str = '127.0.0.1', port: int = 8765,
+                 readers: int = 4, allowed_origins: Iterable[str] = ()):
+        """Prepare the server; call start() inside a running event loop.
+
+        Args:
+            allowed_origins: Origin header values (e.g. of a browser extension)
+                that may call the API; other browser requests are refused
+        """
+        self.db = db
+        self.host = host
+        self.port = port
+        self.allowed_origins = frozenset(allowed_origins)
+        self._read_pool = ThreadPoolExecutor(max_workers=readers,
+                                             thread_name_prefix='workhours-read')
+        self._write_pool = ThreadPoolExecutor(max_workers=1,
+                                              thread_name_prefix='workhours-write')
+        self._writes: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._routes: List[Tuple[str, re.Pattern, Callable]] = [
+            ('GET', re.compile(r'/status'), self.get_status),
+            ('POST', re.compile(r'/start'), self.post_start),
+            ('POST', re.compile(r'/stop'), self.post_stop),
+            ('GET', re.compile(r'/tasks'), self.get_tasks),
+            ('POST', re.compile(r'/tasks'), self.post_task),
+            ('DELETE', re.compile(r'/tasks/(\d+)'), self.delete_task),
+            ('POST', re.compile(r'/tasks/(\d+)/move'), self.post_move),
+            ('GET', re.compile(r'/totals'), self.get_totals),
+            ('GET', re.compile(r'/timespans'), self.get_timespans),
+            ('POST', re.compile(r'/timespans/(\d+)/task'), self.post_reassign),
+            ('GET', re.compile(r'/reports/buckets'), self.get_buckets),
+        ]
+
+    async def start(self) -> int:
+        """Start listening and return the bound port (useful with port=0)."""
+        self._writes = asyncio.Queue(maxsize=1000)
+        self._writer_task = asyncio.create_task(self._writer())
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        """Stop accepting requests, finish queued writes and release the threads."""
+        self._server.close()
+        await self._server.wait_closed()
+        await self._writes.join()
+        self._writer_task.cancel()
+        self._read_pool.shutdown()
+        self._write_pool.shutdown()
+
+    async def read(self, func: Callable[[], Any]) -> Any:
+        """Run a read-only function on the reader pool."""
+        return await asyncio.get_running_loop().run_in_executor(self._read_pool, func)
+
+    async def write(self, func: Callable[[], Any]) -> Any:
+        """Queue a function for the single writer and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        await self._writes.put((func, future))
+        return await future
+
+    async def _writer(self):
+        """Execute queued writes one after another on the writer thread."""
+        loop = asyncio.get_running_loop()
+        while True:
+            func, future = await self._writes.get()
+            try:
+                result = await loop.run_in_executor(self._write_pool, func)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+            finally:
+                self._writes.task_done()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter):
+        """Serve HTTP/1.1 requests on one connection (with keep-alive)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._send(writer, 400, {'error': 'Malformed request line'}, False)
+                    break
+
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = (version == 'HTTP/1.1'
+                              and headers.get('connection', '').lower() != 'close')
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._send(writer, 400, {'error': 'Invalid Content-Length'}, False)
+                    break
+                if length > MAX_BODY:
+                    await self._send(writer, 413, {'error': 'Request body too large'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                refused = self._refuse(headers, body)
+                if refused is not None:
+                    status, payload = refused
+                else:
+                    status, payload = await self._dispatch(method, target, body)
+                await self._send(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _refuse(self, headers: Dict[str, str], body: bytes) -> Optional[Tuple[int, Any]]:
+        """Error response for requests a web page could have forged, else None.
+
+        Browsers send cross-site "simple" requests (form posts, text/plain
+        bodies) without asking first, so bodies must be declared as JSON, and
+        requests from an unknown Origin or for a foreign Host (DNS rebinding)
+        are refused.
+        """
+        origin = headers.get('origin')
+        if origin is not None and origin not in self.allowed_origins:
+            return 403, {'error': f"Origin {origin} is not allowed"}
+        if self.host not in ANY_HOST:
+            host = urlsplit('//' + headers.get('host', '')).hostname or ''
+            if host not in LOCAL_HOSTS and host != self.host.strip('[]').lower():
+                return 403, {'error': f"Host {headers.get('host', '')!r} is not allowed"}
+        content_type = headers.get('content-type', '').partition(';')[0].strip().lower()
+        if body and content_type != 'application/json':
+            return 415, {'error': "Request body must be sent as application/json"}
+        return None
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, payload: Any,
+                    keep_alive: bool):
+        """Write a JSON response."""
+        body = json.dumps(payload).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Any]:
+        """Route a request to its handler and turn errors into JSON responses."""
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            data = json.loads(body) if body else {}
+        except json.JSONDecodeError as e:
+            return 400, {'error': f"Invalid JSON: {e}"}
+        if not isinstance(data, dict):
+            return 400, {'error': "Request body must be a JSON object"}
+
+        path_matched = False
+        for route_method, pattern, handler in self._routes:
+            match = pattern.fullmatch(url.path)
+            if match is None:
+                continue
+            path_matched = True
+            if route_method != method:
+                continue
+            try:
+                return await handler(query, data, *(int(group) for group in match.groups()))
+            except HTTPError as e:
+                return e.status, {'error': str(e)}
+            except KeyError as e:
+                return 400, {'error': f"Missing field {e}"}
+            except (ValueError, TypeError) as e:
+                return 400, {'error': str(e)}
+            except Exception as e:
+                return 500, {'error': f"{type(e).__name__}: {e}"}
+        if path_matched:
+            return 405, {'error': f"{method} is not allowed on {url.path}"}
+        return 404, {'error': f"No such endpoint {url.path}"}
+
+    def _task_path(self, task_id: int) -> str:
+        """Full path of a task."""
+        return '/'.join(self.db.get_path_names(task_id))
+
+    def _status(self) -> Dict[str, Any]:
+        """The running timespan as a JSON object."""
+        timespan = self.db.get_running_timespan()
+        if timespan is None:
+            return {'running': False}
+        return {
+            'running': True,
+            'timespan_id': timespan.id,
+            'task_id': timespan.task_id,
+            'task': self._task_path(timespan.task_id),
+            'start_time': timespan.start_time,
+            'elapsed_seconds': (now_ms() - timespan.start_time) / 1000.0,
+        }
+
+    async def get_status(self, query, data):
+        """GET /status"""
+        return 200, await self.read(self._status)
+
+    async def post_start(self, query, data):
+        """POST /start"""
+        def start():
+            task_id = data.get('task_id')
+            if task_id is None:
+                task_id = TaskManager(self.db).resolve_task_path(data['task'])
+            elif self.db.get_task_by_id(task_id) is None:
+                raise HTTPError(404, f"Task with id {task_id} does not exist")
+            timer = Timer(self.db)
+            timer.resume()  # Stops a timer started elsewhere, too
+            timer.start(task_id)
+            return self._status()
+        return 200, await self.write(start)
+
+    async def post_stop(self, query, data):
+        """POST /stop"""
+        def stop():
+            timer = Timer(self.db)
+            stopped = timer.resume() and timer.stop()
+            return {'stopped': stopped, **self._status()}
+        return 200, await self.write(stop)
+
+    async def get_tasks(self, query, data):
+        """GET /tasks"""
+        def tasks():
+            paths = TaskManager(self.db).get_all_task_paths()
+            return [{'id': task.id, 'parent_id': task.parent_id, 'name': task.name,
+                     'path': paths.get(task.id)} for task in self.db.get_all_tasks()]
+        return 200, await self.read(tasks)
+
+    async def post_task(self, query, data):
+        """POST /tasks"""
+        def add():
+            if 'path' in data:
+                task_id = TaskManager(self.db).resolve_task_path(data['path'])
+            else:
+                parent_id = data.get('parent_id')
+                if parent_id is not None and self.db.get_task_by_id(parent_id) is None:
+                    raise HTTPError(404, f"Task with id {parent_id} does not exist")
+                task_id = self.db.add_task(data['name'], parent_id)
+            return {'id': task_id, 'path': self._task_path(task_id)}
+        return 201, await self.write(add)
+
+    async def delete_task(self, query, data, task_id):
+        """DELETE /tasks/<id>"""
+        def delete():
+            if self.db.get_task_by_id(task_id) is None:
+                raise HTTPError(404, f"Task with id {task_id} does not exist")
+            self.db.delete_task(task_id)
+            return {'deleted': task_id}
+        return 200, await self.write(delete)
+
+    async def post_move(self, query, data, task_id):
+        """POST /tasks/<id>/move"""
+        def move():
+            parent_id = data.get('parent_id')
+            for missing in (task_id, parent_id):
+                if missing is not None and self.db.get_task_by_id(missing) is None:
+                    raise HTTPError(404, f"Task with id {missing} does not exist")
+            self.db.move_task(task_id, parent_id)
+            return {'id': task_id, 'path': self._task_path(task_id)}
+        return 200, await self.write(move)
+
+    async def get_totals(self, query, data):
+        """GET /totals"""
+        since, until = _parse_time(query.get('since')), _parse_time(query.get('until'))
+        totals = await self.read(lambda: self.db.get_all_task_totals(since, until))
+        return 200, {str(task_id): {'own_hours': own, 'total_hours': total}
+                     for task_id, (own, total) in totals.items()}
+
+    async def get_timespans(self, query, data):
+        """GET /timespans (newest first, keyset paging via after_start/after_id)"""
+        after_start = _parse_int(query.get('after_start'), 'after_start')
+        after_id = _parse_int(query.get('after_id'), 'after_id')
+        after = (after_start, after_id) if after_start is not None and after_id is not None else None
+        limit = min(_parse_int(query.get('limit'), 'limit') or 100, 1000)
+        rows = await self.read(lambda: self.db.get_timespans_page(
+            task_id=_parse_int(query.get('task_id'), 'task_id'),
+            since=_parse_time(query.get('since')), until=_parse_time(query.get('until')),
+            page_size=limit, after=after,
+        ))
+        return 200, [{'id': row[0], 'task_id': row[1], 'start_time': row[2],
+                      'end_time': row[3], 'task': row[4]} for row in rows]
+
+    async def post_reassign(self, query, data, timespan_id):
+        """POST /timespans/<id>/task"""
+        def reassign():
+            self.db.update_timespan_task(timespan_id, data['task_id'])
+            return {'id': timespan_id, 'task_id': data['task_id']}
+        return 200, await self.write(reassign)
+
+    async def get_buckets(self, query, data):
+        """GET /reports/buckets"""
+        since = _parse_time(query.get('since'))
+        if since is None:
+            raise HTTPError(400, "Parameter 'since' is required")
+        until = _parse_time(query.get('until')) or now_ms()
+        bucket = query.get('bucket', 'day')
+        root_id = _parse_int(query.get('root_id'), 'root_id')
+
+        def report():
+            result = bucketed_totals(self.db, since, until, bucket, root_id)
+            paths = TaskManager(self.db).get_all_task_paths()
+            return {
+                'bucket': bucket,
+                'buckets': [start.isoformat() for start in result.buckets],
+                'tasks': [{'id': task_id, 'path': paths.get(task_id),
+                           'hours': list(result.row(task_id))} for task_id in result.task_ids],
+            }
+        return 200, await self.read(report)
+
+
+async def serve(db_path: str, host: str, port: int, readers: int,
+                allowed_origins: Iterable[str] = ()):
+    """Run the server until interrupted."""
+    db = Database(db_path)
+    server = TrackerServer(db, host, port, readers, allowed_origins)
+    port = await server.start()
+    print(f"Serving {db_path} on http://{host}:{port}", file=sys.stderr)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+        db.close()
+
+
+@contextmanager
+def serving(db: Database) -> Iterator[int]:
+    """Run a server for a database on a free port in a background thread.
+
+    Yields:
+        The port; the server is closed when the block ends
+    """
+    import threading
+
+    loop = asyncio.new_event_loop()
+    server = TrackerServer(db, port=0)
+    port = loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield port
+    finally:
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def hammer(port: int, clients: int = 16,
+           requests_per_client: int = 100) -> Tuple[List[str], List[float]]:
+    """Fire concurrent clients at a server from many threads at once.
+
+    Every client keeps one HTTP connection open and mixes timer starts/stops
+    with status, totals and timespan reads.
+
+    Returns:
+        (failed requests, latency of every request in seconds)
+    """
+    import http.client
+    import random
+    import threading
+    import time
+
+    failures: List[str] = []
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def client(number: int):
+        rng = random.Random(number)
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        for _ in range(requests_per_client):
+            roll = rng.random()
+            if roll < 0.3:
+                request = ('POST', '/start', {'task': f"Load/Client {rng.randrange(5)}/Task {number}"})
+            elif roll < 0.5:
+                request = ('POST', '/stop', None)
+            elif roll < 0.7:
+                request = ('GET', '/status', None)
+            elif roll < 0.85:
+                request = ('GET', '/totals', None)
+            else:
+                request = ('GET', '/timespans?limit=50', None)
+            method, path, payload = request
+            body = json.dumps(payload) if payload is not None else None
+            started = time.perf_counter()
+            connection.request(method, path, body, {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if response.status >= 400:
+                    failures.append(f"{method} {path}: {response.status}")
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return failures, latencies
+
+
+def count_running(db: Database) -> int:
+    """Number of timespans without an end."""
+    return db.connection.execute(
+        "SELECT COUNT(*) FROM timespans WHERE end_time IS NULL"
+    ).fetchone()[0]
+
+
+def load_test(clients: int = 16, requests_per_client: int = 100) -> bool:
+    """Hammer a server on a temporary database and print throughput and latency.
+
+    Afterwards the database must hold at most one running timespan and
+    consistent aggregates (``test_server.py`` asserts the same).
+
+    Returns:
+        True if no request failed and the database is consistent
+    """
+    import os
+    import tempfile
+    import time
+
+    with tempfile.TemporaryDirectory(prefix='workhours-load-') as workdir:
+        db = Database(os.path.join(workdir, 'load.db'))
+        try:
+            started = time.perf_counter()
+            with serving(db) as port:
+                failures, latencies = hammer(port, clients, requests_per_client)
+            duration = time.perf_counter() - started
+            running = count_running(db)
+            drift = db.check_aggregates()
+        finally:
+            db.close()
+
+    latencies.sort()
+    total = len(latencies)
+    print(f"{total} requests from {clients} clients in {duration:.2f}s "
+          f"({total / duration:.0f} req/s)")
+    print(f"latency p50 {latencies[total // 2] * 1000:.1f} ms, "
+          f"p99 {latencies[int(total * 0.99)] * 1000:.1f} ms")
+    print(f"failed requests: {len(failures)}, running timespans: {running}, "
+          f"tasks with wrong totals: {len(drift)}")
+    for failure in failures[:10]:
+        print(f"  {failure}")
+    return not failures and running <= 1 and not drift
+
+
+def main(argv=None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Local JSON API for work hours tracker.")
+    parser.add_argument('--db', default='workhours.db', help="Database file")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--readers', type=int, default=4, help="Reader threads")
+    parser.add_argument('--allow-origin', action='append', default=[], metavar='ORIGIN',
+                        help="Let browser requests from this Origin through "
+                             "(e.g. moz-extension://<id>); repeatable")
+    parser.add_argument('--load-test', action='store_true',
+                        help="Run a concurrency load test on a temporary database and exit")
+    parser.add_argument('--clients', type=int, default=16, help="Clients for --load-test")
+    parser.add_argument('--requests', type=int, default=100,
+                        help="Requests per client for --load-test")
+    args = parser.parse_args(argv)
+
+    if args.load_test:
+        return 0 if load_test(args.clients, args.requests) else 1
+    try:
+        asyncio.run(serve(args.db, args.host, args.port, args.readers, args.allow_origin))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Sync module for work hours tracker.
+Merges two tracker databases (e.g. laptop and desktop) by exchanging only the
+change log entries each one is missing.
+
+Usage:
+    python sync.py workhours.db /mnt/laptop/workhours.db
+    python sync.py --demo
+
+Every database logs its own changes with a per-device sequence number (see
+``Database.apply_changes()`` for how conflicts are resolved). A sync reads the
+other side's watermarks (last sequence number held per device), sends the
+newer entries both ways and never touches unchanged history.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from typing import Tuple
+from database import Database
+from task_manager import TaskManager
+
+
+def sync(first: Database, second: Database) -> Tuple[int, int]:
+    """Exchange changes between two databases.
+
+    Returns:
+        (entries received by ``first``, entries received by ``second``)
+
+    Raises:
+        ValueError: If both files log under the same device ID (one is a plain
+            copy of the other; call ``new_device_id()`` on the copy once)
+    """
+    if first.device_id == second.device_id:
+        raise ValueError(f"Both databases log as device {first.device_id}; "
+                         "give the copy its own ID with new_device_id() first")
+    to_second = second.apply_changes(first.get_changes_since(second.get_sync_watermarks()))
+    to_first = first.apply_changes(second.get_changes_since(first.get_sync_watermarks()))
+    return to_first, to_second
+
+
+def _describe(db: Database) -> str:
+    """Task paths with their hours, one per line."""
+    totals = db.get_all_task_totals()
+    paths = TaskManager(db).get_all_task_paths()
+    return '\n'.join(f"  {totals[task_id][1]:5.1f} h  {path}"
+                     for task_id, path in sorted(paths.items(), key=lambda item: item[1]))
+
+
+def demo() -> int:
+    """Sync two databases in a temp dir after concurrent edits on both."""
+    workdir = tempfile.mkdtemp(prefix='workhours-sync-')
+    desktop = Database(os.path.join(workdir, 'desktop.db'))
+    work = desktop.add_task('Work')
+    client = desktop.add_task('Client 1', work)
+    day = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    desktop.add_timespans([(client, day, day + timedelta(hours=3))])
+
+    laptop = Database(os.path.join(workdir, 'laptop.db'))
+    print("First sync: received %d / %d changes" % sync(desktop, laptop))
+
+    # Concurrent edits: each side adds work, and both move the same task
+    laptop_client = TaskManager(laptop).resolve_task_path('Work/Client 1')
+    laptop.add_timespans([(laptop_client, day + timedelta(hours=4), day + timedelta(hours=6))])
+    laptop.move_task(laptop_client, None)
+    side = desktop.add_task('Side project')
+    desktop.add_timespans([(side, day + timedelta(hours=7), day + timedelta(hours=8))])
+    desktop.move_task(client, side)
+
+    print("Second sync: received %d / %d changes" % sync(desktop, laptop))
+    print("Desktop:\n" + _describe(desktop))
+    print("Laptop:\n" + _describe(laptop))
+    print("Third sync: received %d / %d changes" % sync(desktop, laptop))
+    same = _describe(desktop) == _describe(laptop)
+    print(f"Databases in {workdir} are {'identical' if same else 'DIFFERENT'}")
+    desktop.close()
+    laptop.close()
+    return 0 if same else 1
+
+
+def main(argv=None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Sync two work hours databases.")
+    parser.add_argument('databases', nargs='*', metavar='DB', help="Two database files")
+    parser.add_argument('--demo', action='store_true',
+                        help="Sync two fresh databases in a temp dir")
+    args = parser.parse_args(argv)
+    if args.demo:
+        return demo()
+    if len(args.databases) != 2:
+        parser.error("expected two database files")
+
+    first, second = (Database(path) for path in args.databases)
+    try:
+        received = sync(first, second)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        first.close()
+        second.close()
+    print(f"{args.databases[0]}: received {received[0]} changes; "
+          f"{args.databases[1]}: received {received[1]} changes")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
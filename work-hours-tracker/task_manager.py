@@ -3,63 +3,216 @@ Task management module for work hours tracker.
 Handles task tree structure and operations.
 """
 
-from typing import List, Optional, Tuple
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
 from database import Database
+from records import Task
 
 
 class TaskManager:
-    """Manages tasks in a hierarchical tree structure."""
+    """Manages tasks in a hierarchical tree structure.
+    
+    All tasks are cached in two maps built in one pass over the table:
+    id -> task row and parent id -> child ids (in id order). Changes made
+    through this manager patch the maps; any other task change (through
+    the database directly, another manager or a rolled-back batch) bumps
+    ``Database.tasks_version`` and the maps are rebuilt on next use, so a
+    cached lookup is a dictionary access. Commits by other processes (the
+    CLI or the server) cost a query to notice, so long-lived callers check
+    for them once per refresh with ``check_outside_changes()``.
+    """
     
     def __init__(self, database: Database):
         """Initialize task manager with database."""
         self.db = database
+        self.events = database.events  # Task changes are announced here
+        self._tasks: Dict[int, Task] = {}
+        self._children: Dict[Optional[int], List[int]] = {}
+        self._version: Optional[int] = None  # tasks_version the maps reflect
+        self._data_version: Optional[int] = None  # get_data_version() when they were built
+    
+    def _current(self) -> bool:
+        """Whether the maps reflect every task change made in this process."""
+        return self._version == self.db.tasks_version
+    
+    def _load(self):
+        """Build the id -> task and parent -> children maps unless they are current."""
+        if self._current():
+            return
+        version = self.db.tasks_version
+        data_version = self.db.get_data_version()
+        tasks: Dict[int, Task] = {}
+        children: Dict[Optional[int], List[int]] = {}
+        for task in self.db.get_all_tasks():
+            tasks[task.id] = task
+            children.setdefault(task.parent_id, []).append(task.id)
+        self._tasks, self._children = tasks, children
+        self._version, self._data_version = version, data_version
+    
+    def invalidate(self):
+        """Rebuild the maps on next use."""
+        self._version = None
+    
+    def check_outside_changes(self) -> bool:
+        """Drop the maps if another process committed since they were built.
+        
+        Runs one ``PRAGMA data_version`` query, so call it once per refresh
+        or timer tick rather than before every lookup.
+        
+        Returns:
+            True if maps were dropped and views built from them are stale
+        """
+        if self._version is None or self._data_version == self.db.get_data_version():
+            return False
+        self.invalidate()
+        return True
+    
+    def _patching(self) -> Optional[int]:
+        """Version after one more change, if the maps are current and can be patched."""
+        return self._version + 1 if self._current() else None
+    
+    def _link(self, task_id: int):
+        """Re-read one task and add it to the maps (a no-op if they already hold it).
+        
+        Event subscribers may have reloaded the maps during the change.
+        """
+        task = self.db.get_task_by_id(task_id)
+        self._tasks[task_id] = task
+        siblings = self._children.setdefault(task.parent_id, [])
+        position = bisect_left(siblings, task_id)
+        if position == len(siblings) or siblings[position] != task_id:
+            siblings.insert(position, task_id)
+    
+    def _unlink(self, task_id: int):
+        """Remove one task from its parent's children."""
+        siblings = self._children.get(self._tasks[task_id].parent_id, [])
+        if task_id in siblings:
+            siblings.remove(task_id)
     
     def add_task(self, name: str, parent_id: Optional[int] = None) -> int:
         """Add a new task."""
-        return self.db.add_task(name, parent_id)
+        expected = self._patching()
+        task_id = self.db.add_task(name, parent_id)
+        if expected is not None and self.db.tasks_version == expected:
+            self._link(task_id)
+            self._version = expected
+        return task_id
     
     def delete_task(self, task_id: int):
         """Delete a task."""
+        expected = self._patching()
         self.db.delete_task(task_id)
+        if expected is not None and self.db.tasks_version == expected:
+            if task_id in self._tasks:
+                self._unlink(task_id)
+                stack = [task_id]
+                while stack:
+                    deleted = stack.pop()
+                    del self._tasks[deleted]
+                    stack.extend(self._children.pop(deleted, ()))
+            self._version = expected
+    
+    def move_task(self, task_id: int, new_parent_id: Optional[int]):
+        """Move a task and its subtree under a new parent (None for root)."""
+        expected = self._patching()
+        self.db.move_task(task_id, new_parent_id)
+        if expected is not None and self.db.tasks_version == expected:
+            self._unlink(task_id)
+            self._link(task_id)
+            self._version = expected
+    
+    def get_task(self, task_id: int) -> Optional[Task]:
+        """Get a task by ID from the cache."""
+        self._load()
+        return self._tasks.get(task_id)
     
     def get_task_path(self, task_id: int) -> str:
         """Get full path of a task (e.g., 'work/client1/feature/playtech')."""
-        path_parts = []
-        current_id = task_id
+        self._load()
+        names = []
+        task = self._tasks.get(task_id)
+        while task is not None:
+            names.append(task.name)
+            task = self._tasks.get(task.parent_id)
+        return '/'.join(reversed(names))
+    
+    def get_all_task_paths(self) -> Dict[int, str]:
+        """Get full paths of all tasks at once (task_id -> path)."""
+        self._load()
+        all_tasks = self._tasks
+        paths: Dict[int, str] = {}
+        
+        def path_of(task_id: int) -> str:
+            if task_id not in paths:
+                task = all_tasks[task_id]
+                parent_id = task.parent_id
+                if parent_id is None or parent_id not in all_tasks:
+                    paths[task_id] = task.name
+                else:
+                    paths[task_id] = path_of(parent_id) + '/' + task.name
+            return paths[task_id]
+        
+        for task_id in all_tasks:
+            path_of(task_id)
+        return paths
+    
+    def resolve_task_path(self, path: str, cache: Optional[Dict[str, int]] = None,
+                          create: bool = True) -> Optional[int]:
+        """Find the task for a path like 'work/client1/feature', creating missing levels.
+        
+        Args:
+            path: Slash-separated task names from the root
+            cache: Optional path -> task_id dict reused across calls
+            create: Create missing tasks instead of returning None
+        """
+        if cache is None:
+            cache = {}
+        if path in cache:
+            return cache[path]
+        
+        parent_path, _, name = path.rpartition('/')
+        parent_id = None
+        if parent_path:
+            parent_id = self.resolve_task_path(parent_path, cache, create)
+            if parent_id is None:
+                return None
         
-        while current_id is not None:
-            task = self.db.get_task_by_id(current_id)
-            if task:
-                path_parts.insert(0, task['name'])
-                current_id = task['parent_id']
-            else:
-                break
+        match = [t for t in self.get_children(parent_id) if t.name == name]
+        if match:
+            task_id = match[0].id
+        elif create:
+            task_id = self.add_task(name, parent_id)
+        else:
+            return None
         
-        return '/'.join(path_parts)
+        cache[path] = task_id
+        return task_id
+    
+    def get_task_nodes(self) -> List[Tuple[int, Optional[int], str, int]]:
+        """
+        Get all tasks in tree order (each parent before its children).
+        Returns list of tuples: (task_id, parent_id, name, level)
+        """
+        self._load()
+        tasks, children = self._tasks, self._children
+        nodes = []
+        stack = [(task_id, 0) for task_id in reversed(children.get(None, []))]
+        while stack:
+            task_id, level = stack.pop()
+            task = tasks[task_id]
+            nodes.append((task_id, task.parent_id, task.name, level))
+            stack.extend((child, level + 1) for child in reversed(children.get(task_id, [])))
+        return nodes
     
     def get_task_tree(self) -> List[Tuple[int, str, int]]:
         """
         Get tasks organized as a tree structure.
         Returns list of tuples: (task_id, indented_name, level)
         """
-        all_tasks = self.db.get_all_tasks()
-        
-        # Build tree structure
-        tree = []
-        root_tasks = [t for t in all_tasks if t['parent_id'] is None]
-        
-        def add_task_and_children(task, level=0):
-            tree.append((task['id'], '  ' * level + task['name'], level))
-            children = [t for t in all_tasks if t['parent_id'] == task['id']]
-            for child in children:
-                add_task_and_children(child, level + 1)
-        
-        for root in root_tasks:
-            add_task_and_children(root)
-        
-        return tree
+        return [(task_id, '  ' * level + name, level)
+                for task_id, parent_id, name, level in self.get_task_nodes()]
     
     def get_children(self, parent_id: Optional[int]) -> List:
         """Get direct children of a task (or root tasks if parent_id is None)."""
-        all_tasks = self.db.get_all_tasks()
-        return [t for t in all_tasks if t['parent_id'] == parent_id]
+        self._load()
+        return [self._tasks[child] for child in self._children.get(parent_id, [])]
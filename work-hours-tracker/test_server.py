@@ -0,0 +1,76 @@
+"""
+Tests for the local JSON API.
+Run with: python -m unittest (or pytest) inside work-hours-tracker/
+"""
+
+import http.client
+import json
+import os
+import tempfile
+import unittest
+from database import Database
+from server import count_running, hammer, serving
+
+
+class ServerTest(unittest.TestCase):
+    """A server on a temporary database."""
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory(prefix='workhours-server-test-')
+        self.db = Database(os.path.join(self.workdir.name, 'server.db'))
+        self.server = serving(self.db)
+        self.port = self.server.__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        self.db.close()
+        self.workdir.cleanup()
+
+    def request(self, method, path, body=None, headers=None):
+        """Send one request and return (status, decoded JSON body)."""
+        connection = http.client.HTTPConnection('127.0.0.1', self.port)
+        try:
+            if headers is None:
+                headers = {'Content-Type': 'application/json'}
+            if body is not None and not isinstance(body, (str, bytes)):
+                body = json.dumps(body)
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            connection.close()
+
+    def test_concurrent_clients_keep_one_running_timespan(self):
+        failures, latencies = hammer(self.port, clients=8, requests_per_client=40)
+        self.assertEqual(failures, [])
+        self.assertEqual(len(latencies), 8 * 40)
+        # Whatever the last request was, one more start leaves exactly one running
+        self.assertEqual(self.request('POST', '/start', {'task': 'Load/Final'})[0], 200)
+        self.assertEqual(count_running(self.db), 1)
+        self.assertEqual(self.db.check_aggregates(), [])
+
+    def test_unknown_tasks_are_not_found(self):
+        task_id = self.request('POST', '/tasks', {'path': 'Work'})[1]['id']
+        self.assertEqual(self.request('POST', '/tasks', {'name': 'A', 'parent_id': 999})[0], 404)
+        self.assertEqual(self.request('POST', '/tasks/999/move', {'parent_id': None})[0], 404)
+        self.assertEqual(self.request('POST', f'/tasks/{task_id}/move', {'parent_id': 999})[0],
+                         404)
+        self.assertEqual(self.request('DELETE', '/tasks/999')[0], 404)
+
+    def test_forged_browser_requests_are_refused(self):
+        body = '{"task": "Work"}'
+        self.assertEqual(self.request('POST', '/start', body, {'Content-Type': 'text/plain'})[0],
+                         415)
+        self.assertEqual(self.request('POST', '/stop', None,
+                                      {'Origin': 'https://example.com'})[0], 403)
+        self.assertEqual(self.request('GET', '/status', None,
+                                      {'Host': f'example.com:{self.port}'})[0], 403)
+        self.assertEqual(count_running(self.db), 0)
+
+    def test_negative_content_length_is_rejected(self):
+        status, payload = self.request('POST', '/stop', None, {'Content-Length': '-5'})
+        self.assertEqual(status, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+Tests for syncing two tracker databases.
+Run with: python -m unittest (or pytest) inside work-hours-tracker/
+"""
+
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from database import Database
+from sync import sync
+from task_manager import TaskManager
+
+DAY = datetime(2024, 3, 4, 9, 0)
+
+
+def hours_by_path(db: Database):
+    """Total hours (children included) per task path, archived time included."""
+    totals = db.get_all_task_totals()
+    return {path: round(totals.get(task_id, (0.0, 0.0))[1], 6)
+            for task_id, path in TaskManager(db).get_all_task_paths().items()}
+
+
+class SyncTest(unittest.TestCase):
+    """Two files in a temp dir, edited on both sides between syncs."""
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory(prefix='workhours-sync-test-')
+        self.desktop = self.open('desktop.db')
+        self.laptop = self.open('laptop.db')
+
+        work = self.desktop.add_task('Work')
+        self.desktop.add_task('Client 1', work)
+        self.desktop.add_task('Client 2', work)
+        self.desktop.add_task('Home')
+        desktop = self.tasks(self.desktop)
+        # A month of old history (to archive) and one recent timespan per client
+        self.desktop.add_timespans(
+            [(desktop['Work/Client 1'], DAY - timedelta(days=60 - day),
+              DAY - timedelta(days=60 - day) + timedelta(hours=2)) for day in range(30)]
+            + [(desktop['Work/Client 1'], DAY, DAY + timedelta(hours=3)),
+               (desktop['Work/Client 2'], DAY + timedelta(hours=4), DAY + timedelta(hours=5))]
+        )
+        sync(self.desktop, self.laptop)
+
+    def tearDown(self):
+        for db in self.opened:
+            db.close()
+        self.workdir.cleanup()
+
+    def open(self, name: str) -> Database:
+        """Open (or create) a database in the temp dir."""
+        db = Database(os.path.join(self.workdir.name, name))
+        self.opened = getattr(self, 'opened', []) + [db]
+        return db
+
+    def tasks(self, db: Database):
+        """Task path -> ID."""
+        return {path: task_id for task_id, path in TaskManager(db).get_all_task_paths().items()}
+
+    def recent_timespan(self, db: Database, path: str) -> int:
+        """ID of the timespan a task got on DAY."""
+        return next(timespan.id for timespan in db.get_timespans_for_task(self.tasks(db)[path])
+                    if timespan.start_time >= int(DAY.timestamp() * 1000))
+
+    def assert_converged(self, *databases: Database):
+        """Same tasks and hours everywhere, and consistent aggregates."""
+        expected = hours_by_path(databases[0])
+        for db in databases:
+            self.assertEqual(hours_by_path(db), expected)
+            self.assertEqual(db.check_aggregates(), [])
+
+    def test_initial_sync_copies_everything(self):
+        self.assert_converged(self.desktop, self.laptop)
+        self.assertEqual(self.laptop.count_timespans(), 32)
+        self.assertEqual(sync(self.desktop, self.laptop), (0, 0))
+
+    def test_conflicting_edits_converge(self):
+        desktop, laptop = self.tasks(self.desktop), self.tasks(self.laptop)
+        desktop_span = self.recent_timespan(self.desktop, 'Work/Client 1')
+        laptop_span = self.recent_timespan(self.laptop, 'Work/Client 1')
+
+        # Delete vs edit: the desktop deletes Client 2 while the laptop books time on it
+        self.desktop.delete_task(desktop['Work/Client 2'])
+        self.laptop.add_timespans([(laptop['Work/Client 2'], DAY + timedelta(hours=6),
+                                    DAY + timedelta(hours=7))])
+        # Cross moves: each side puts the other top-level task inside its own
+        self.desktop.move_task(desktop['Home'], desktop['Work'])
+        self.laptop.move_task(laptop['Work'], laptop['Home'])
+        # The same timespan reassigned differently on both sides
+        self.desktop.update_timespan_task(desktop_span, desktop['Home'])
+        self.laptop.update_timespan_task(laptop_span, laptop['Work'])
+        # One side archives its old history before the next sync
+        self.assertEqual(self.desktop.archive_timespans(DAY - timedelta(days=7)), 30)
+
+        sync(self.desktop, self.laptop)
+        self.assertEqual(sync(self.desktop, self.laptop), (0, 0))
+        self.assert_converged(self.desktop, self.laptop)
+
+        paths = hours_by_path(self.desktop)
+        # Deletes win over the concurrent booking
+        self.assertFalse(any(path.endswith('Client 2') for path in paths))
+        # One of the crossed moves wins (edits in the same millisecond are
+        # ordered by device ID), the other task stays at the top level
+        self.assertIn(set(paths), ({'Home', 'Home/Work', 'Home/Work/Client 1'},
+                                   {'Work', 'Work/Home', 'Work/Client 1'}))
+        top = 'Home' if 'Home/Work' in paths else 'Work'
+        self.assertEqual(paths[top], 63.0)
+        # The reassigned timespan is on exactly one of the two tasks
+        own = {path: self.desktop.get_task_total_hours(task_id, include_children=False)
+               for path, task_id in self.tasks(self.desktop).items()}
+        self.assertEqual(sorted(own.values()), [0.0, 3.0, 60.0])
+
+    def test_fresh_peer_receives_archived_history(self):
+        archive = os.path.join(self.workdir.name, 'elsewhere', 'old.db')
+        os.mkdir(os.path.dirname(archive))
+        self.assertEqual(self.desktop.archive_timespans(DAY - timedelta(days=7), archive,
+                                                        vacuum=True), 30)
+        self.assertEqual(self.desktop.count_timespans(), 2)
+
+        peer = self.open('peer.db')
+        sync(self.desktop, peer)
+        self.assertEqual(peer.count_timespans(), 32)
+        self.assert_converged(self.desktop, self.laptop, peer)
+
+    def test_missing_archive_fails_loudly(self):
+        archive = os.path.join(self.workdir.name, 'old.db')
+        self.desktop.archive_timespans(DAY - timedelta(days=7), archive)
+        os.remove(archive)
+        with self.assertRaises(FileNotFoundError):
+            sync(self.desktop, self.open('peer.db'))
+
+
+if __name__ == '__main__':
+    unittest.main()
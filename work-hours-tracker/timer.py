@@ -3,9 +3,10 @@ Timer module for work hours tracker.
 Handles timing functionality for tracking work hours.
 """
 
+import time
 from datetime import datetime, timedelta
 from typing import Optional
-from database import Database
+from database import Database, from_epoch_ms
 
 
 class Timer:
@@ -29,16 +30,41 @@ class Timer:
         self.current_timespan_id = self.db.start_timespan(task_id)
         self.is_running = True
     
-    def stop(self):
-        """Stop the current timer."""
+    def resume(self) -> bool:
+        """Pick up a timespan that is still running in the database.
+        
+        Lets a timer started by another process (or before a restart) be
+        shown and stopped.
+        
+        Returns:
+            True if a running timespan was found
+        """
+        timespan = self.db.get_running_timespan()
+        if timespan is None:
+            return False
+        
+        self.current_task_id = timespan.task_id
+        self.current_timespan_id = timespan.id
+        self.start_time = from_epoch_ms(timespan.start_time)
+        self.is_running = True
+        return True
+    
+    def stop(self) -> bool:
+        """Stop the current timer.
+        
+        Returns:
+            False if nothing was running here, or the timespan had already
+            been stopped by another process (its end time is kept)
+        """
         if not self.is_running or self.current_timespan_id is None:
-            return
+            return False
         
-        self.db.stop_timespan(self.current_timespan_id)
+        stopped = self.db.stop_timespan(self.current_timespan_id)
         self.is_running = False
         self.current_task_id = None
         self.current_timespan_id = None
         self.start_time = None
+        return stopped
     
     def get_elapsed_time(self) -> timedelta:
         """Get elapsed time for current running timer."""
@@ -47,6 +73,16 @@ class Timer:
         
         return datetime.now() - self.start_time
     
+    def ms_until_next_second(self) -> int:
+        """Milliseconds until the wall clock reaches its next whole second.
+        
+        Scheduling each display update with this delay keeps the ticks on the
+        clock's second boundaries, in step with the system clock, so they
+        never drift however long the timer runs. The elapsed time keeps the
+        same fraction of a second at every tick, so it still counts up by one.
+        """
+        return 1000 - int(time.time() * 1000) % 1000
+    
     def format_elapsed_time(self) -> str:
         """Format elapsed time as HH:MM:SS."""
         elapsed = self.get_elapsed_time()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Command-line interface for work hours tracker.
+Starts, stops and reports timers without the GUI, e.g. from shell hooks.
+
+Usage:
+    python tracker.py start "Work/Client 1/Feature A"
+    python tracker.py status
+    python tracker.py stop
+    python tracker.py report --since 2024-01-01
+    python tracker.py at "2024-03-01 14:30"
+    python tracker.py audit --since 2024-01-01
+    python tracker.py archive --before 2024-01-01
+    python tracker.py sync /mnt/laptop/workhours.db
+
+The running timer lives in the database, so it survives between calls (and
+is shared with the GUI). Only the modules a command needs are imported.
+"""
+
+import argparse
+import os
+import sys
+
+
+def _open_db(args):
+    """Open the database."""
+    from database import Database
+    return Database(args.db)
+
+
+def _open(args):
+    """Open the database and a timer resumed from its running timespan."""
+    from timer import Timer
+    db = _open_db(args)
+    timer = Timer(db)
+    timer.resume()
+    return db, timer
+
+
+def _task_path(db, task_id: int) -> str:
+    """Full path of a task."""
+    return '/'.join(db.get_path_names(task_id))
+
+
+def cmd_start(args) -> int:
+    """Start timing a task (stopping the running timer first)."""
+    from task_manager import TaskManager
+    db, timer = _open(args)
+    try:
+        task_id = TaskManager(db).resolve_task_path(args.task, create=not args.no_create)
+        if task_id is None:
+            print(f"Task {args.task!r} does not exist", file=sys.stderr)
+            return 1
+        if timer.is_running:
+            stopped = _task_path(db, timer.current_task_id)
+            timer.stop()
+            print(f"Stopped {stopped}")
+        timer.start(task_id)
+        print(f"Started {_task_path(db, task_id)}")
+    finally:
+        db.close()
+    return 0
+
+
+def cmd_stop(args) -> int:
+    """Stop the running timer."""
+    db, timer = _open(args)
+    try:
+        if not timer.is_running:
+            print("No timer running", file=sys.stderr)
+            return 1
+        path = _task_path(db, timer.current_task_id)
+        elapsed = timer.format_elapsed_time()
+        if not timer.stop():
+            print(f"{path} was stopped by someone else just now", file=sys.stderr)
+            return 1
+        print(f"Stopped {path} after {elapsed}")
+    finally:
+        db.close()
+    return 0
+
+
+def cmd_status(args) -> int:
+    """Print the running task and its elapsed time; exit code 1 when idle."""
+    db, timer = _open(args)
+    try:
+        if not timer.is_running:
+            print("Not running")
+            return 1
+        print(f"{_task_path(db, timer.current_task_id)}  {timer.format_elapsed_time()}")
+    finally:
+        db.close()
+    return 0
+
+
+def cmd_report(args) -> int:
+    """Print hours per task in a date range (or a bucketed CSV with --bucket)."""
+    from datetime import datetime
+    from task_manager import TaskManager
+    db, timer = _open(args)
+    try:
+        until = args.until or datetime.now()
+        task_manager = TaskManager(db)
+        root_id = None
+        if args.root:
+            root_id = task_manager.resolve_task_path(args.root, create=False)
+            if root_id is None:
+                print(f"Task {args.root!r} does not exist", file=sys.stderr)
+                return 1
+
+        if args.bucket:
+            from reports import bucketed_totals
+            report = bucketed_totals(db, args.since, until, args.bucket, root_id)
+            report.write_csv(sys.stdout, task_manager.get_all_task_paths())
+            return 0
+
+        totals = db.get_all_task_totals(since=args.since, until=until)
+        subtree = set(db.get_descendant_ids(root_id)) if root_id is not None else None
+        paths = task_manager.get_all_task_paths()
+        for task_id, path in sorted(paths.items(), key=lambda item: item[1]):
+            own_hours, hours = totals.get(task_id, (0.0, 0.0))
+            if hours > 0 and (subtree is None or task_id in subtree):
+                print(f"{hours:8.2f}  {path}")
+    finally:
+        db.close()
+    return 0
+
+
+def cmd_at(args) -> int:
+    """Print the timespans that were running at a moment; exit code 1 if none."""
+    from database import from_epoch_ms, to_epoch_ms
+    from intervals import IntervalIndex
+    db = _open_db(args)
+    try:
+        moment = to_epoch_ms(args.moment)
+        # until is exclusive; include timespans that start exactly at the moment
+        running = IntervalIndex.load(db, since=moment, until=moment + 1).at(moment)
+        for timespan_id, task_id, start_ms, end_ms in running:
+            print(f"{from_epoch_ms(start_ms):%Y-%m-%d %H:%M} - {from_epoch_ms(end_ms):%H:%M}  "
+                  f"{_task_path(db, task_id)}  (timespan {timespan_id})")
+        if not running:
+            print("Nothing was running")
+    finally:
+        db.close()
+    return 0 if running else 1
+
+
+def cmd_audit(args) -> int:
+    """Report overlapping timespans (double-counted hours); exit code 1 if any."""
+    from database import from_epoch_ms
+    from intervals import IntervalIndex
+    from task_manager import TaskManager
+    db = _open_db(args)
+    try:
+        index = IntervalIndex.load(db, args.since, args.until)
+        double_counted, per_task = index.double_counted_hours()
+        paths = TaskManager(db).get_all_task_paths()
+        print(f"{len(index)} timespans, {double_counted:.2f} hours counted more than once")
+        for task_id, hours in sorted(per_task.items(), key=lambda item: -item[1]):
+            print(f"{hours:8.2f}  {paths.get(task_id, task_id)}")
+
+        if args.gaps is not None:
+            print(f"Pauses of at most {args.gaps} minutes:")
+            for start_ms, end_ms in index.gaps(max_ms=args.gaps * 60000):
+                print(f"  {from_epoch_ms(start_ms):%Y-%m-%d %H:%M:%S} - "
+                      f"{from_epoch_ms(end_ms):%H:%M:%S}")
+    finally:
+        db.close()
+    return 1 if per_task else 0
+
+
+def cmd_archive(args) -> int:
+    """Move timespans that ended before a day into the archive database."""
+    db = _open_db(args)
+    try:
+        moved = db.archive_timespans(args.before, args.archive, vacuum=args.vacuum)
+        print(f"Archived {moved} timespans to {args.archive or db.archive_path}")
+    finally:
+        db.close()
+    return 0
+
+
+def cmd_sync(args) -> int:
+    """Exchange changes with another database file."""
+    from database import Database
+    from sync import sync
+    db = _open_db(args)
+    peer = Database(args.peer)
+    try:
+        received, sent = sync(db, peer)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+        peer.close()
+    print(f"Received {received} changes, sent {sent}")
+    return 0
+
+
+def _parse_date_arg(value: str):
+    """argparse type for --since/--until."""
+    from datetime import datetime
+    return datetime.fromisoformat(value)
+
+
+def main(argv=None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Track work hours from the command line.")
+    parser.add_argument('--db', default=os.environ.get('WORKHOURS_DB', 'workhours.db'),
+                        help="Database file (default: $WORKHOURS_DB or workhours.db)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    start = commands.add_parser('start', help="Start timing a task")
+    start.add_argument('task', help="Task path, e.g. 'Work/Client 1/Feature A'")
+    start.add_argument('--no-create', action='store_true',
+                       help="Fail instead of creating a missing task")
+    start.set_defaults(func=cmd_start)
+
+    commands.add_parser('stop', help="Stop the running timer").set_defaults(func=cmd_stop)
+    commands.add_parser('status', help="Show the running timer").set_defaults(func=cmd_status)
+
+    report = commands.add_parser('report', help="Hours per task in a date range")
+    report.add_argument('--since', type=_parse_date_arg, required=True)
+    report.add_argument('--until', type=_parse_date_arg, default=None,
+                        help="End of the range (default: now)")
+    report.add_argument('--root', help="Only report this task path and its children")
+    report.add_argument('--bucket', choices=('day', 'week', 'month'),
+                        help="Print a CSV with one column per day/week/month instead")
+    report.set_defaults(func=cmd_report)
+
+    at = commands.add_parser('at', help="Show what was running at a moment")
+    at.add_argument('moment', type=_parse_date_arg, help="e.g. '2024-03-01 14:30'")
+    at.set_defaults(func=cmd_at)
+
+    audit = commands.add_parser('audit', help="Find overlapping (double-counted) timespans")
+    audit.add_argument('--since', type=_parse_date_arg, default=None)
+    audit.add_argument('--until', type=_parse_date_arg, default=None)
+    audit.add_argument('--gaps', type=int, metavar='MINUTES',
+                       help="Also list pauses between timespans of at most this many minutes")
+    audit.set_defaults(func=cmd_audit)
+
+    archive = commands.add_parser('archive', help="Move old timespans to the archive database")
+    archive.add_argument('--before', type=_parse_date_arg, required=True,
+                         help="Archive timespans that ended before this day")
+    archive.add_argument('--archive', help="Archive file (default: <db>-archive.db)")
+    archive.add_argument('--vacuum', action='store_true', help="Shrink the database afterwards")
+    archive.set_defaults(func=cmd_archive)
+
+    sync = commands.add_parser('sync', help="Exchange changes with another database")
+    sync.add_argument('peer', help="The other database file, e.g. on a laptop")
+    sync.set_defaults(func=cmd_sync)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
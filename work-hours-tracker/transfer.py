@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Import/export module for work hours tracker.
+Streams timespans to and from CSV or JSON Lines files in constant memory.
+
+Usage:
+    python transfer.py export history.csv --since 2024-01-01
+    python transfer.py import history.jsonl --format jsonl --db laptop.db
+"""
+
+import argparse
+import csv
+import json
+import sys
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterator, Optional, TextIO, Tuple
+from database import Database, TimeValue, from_epoch_ms, to_epoch_ms
+from task_manager import TaskManager
+
+FORMATS = ('csv', 'jsonl')
+FIELDS = ['task', 'start', 'end']
+
+
+def _format_time(value: Optional[int]) -> str:
+    """Epoch milliseconds to an ISO string (empty for a running timespan)."""
+    if value is None:
+        return ''
+    return from_epoch_ms(value).isoformat(timespec='milliseconds')
+
+
+def _parse_time(value) -> Optional[int]:
+    """ISO string or epoch milliseconds to epoch milliseconds (None if empty)."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)) or str(value).isdigit():
+        return int(value)
+    return to_epoch_ms(datetime.fromisoformat(value))
+
+
+def _check_format(fmt: str):
+    """Raise ValueError for unsupported formats."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
+
+
+def iter_export_rows(db: Database, since: Optional[TimeValue] = None,
+                     until: Optional[TimeValue] = None) -> Iterator[Dict[str, str]]:
+    """Yield timespans as {'task', 'start', 'end'} dicts, oldest first.
+
+    Rows are read from the cursor one at a time; only the task path map
+    (one entry per task) is held in memory.
+    """
+    paths = TaskManager(db).get_all_task_paths()
+    cursor = db.connection.cursor()
+    cursor.execute("""
+        SELECT task_id, start_time, end_time FROM timespans
+        WHERE (:since IS NULL OR start_time >= :since)
+          AND (:until IS NULL OR start_time < :until)
+        ORDER BY start_time, id
+    """, {
+        'since': to_epoch_ms(since) if since is not None else None,
+        'until': to_epoch_ms(until) if until is not None else None,
+    })
+    for task_id, start_time, end_time in cursor:
+        yield {
+            'task': paths.get(task_id, ''),
+            'start': _format_time(start_time),
+            'end': _format_time(end_time),
+        }
+
+
+def export_timespans(db: Database, fp: TextIO, fmt: str = 'csv',
+                     since: Optional[TimeValue] = None,
+                     until: Optional[TimeValue] = None) -> int:
+    """Write timespans that start within [since, until) to a file.
+
+    Args:
+        db: Database to read from
+        fp: Text file opened for writing (open CSV files with newline='')
+        fmt: 'csv' or 'jsonl'
+        since: Only export timespans starting on or after this moment
+        until: Only export timespans starting before this moment
+
+    Returns:
+        Number of timespans written
+    """
+    _check_format(fmt)
+    rows = iter_export_rows(db, since, until)
+    count = 0
+
+    if fmt == 'csv':
+        writer = csv.DictWriter(fp, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            fp.write(json.dumps(row) + '\n')
+            count += 1
+
+    return count
+
+
+def iter_import_rows(fp: TextIO, fmt: str = 'csv') -> Iterator[Tuple[str, int, Optional[int]]]:
+    """Yield (task_path, start_ms, end_ms) tuples parsed from a file."""
+    _check_format(fmt)
+    if fmt == 'csv':
+        records = csv.DictReader(fp)
+    else:
+        records = (json.loads(line) for line in fp if line.strip())
+
+    for line_number, record in enumerate(records, start=1):
+        try:
+            start = _parse_time(record['start'])
+            if start is None:
+                raise ValueError("start is missing")
+            row = record['task'], start, _parse_time(record.get('end'))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid timespan record {line_number}: {e}") from e
+        yield row
+
+
+def import_timespans(db: Database, fp: TextIO, fmt: str = 'csv',
+                     chunk_size: int = 5000) -> int:
+    """Read timespans from a file and add them to the database.
+
+    Task paths like 'work/client1/feature' are resolved to IDs through an
+    in-memory cache (missing tasks are created), and rows are committed in
+    chunks so memory use does not depend on the file size.
+
+    Args:
+        db: Database to write to
+        fp: Text file opened for reading (open CSV files with newline='')
+        fmt: 'csv' or 'jsonl'
+        chunk_size: Number of timespans committed per transaction
+
+    Returns:
+        Number of timespans imported
+    """
+    task_manager = TaskManager(db)
+    cache: Dict[str, int] = {}
+    for task_id, path in sorted(task_manager.get_all_task_paths().items()):
+        cache.setdefault(path, task_id)
+
+    rows = iter_import_rows(fp, fmt)
+    count = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        with db.batch():
+            resolved = [(task_manager.resolve_task_path(path, cache), start, end)
+                        for path, start, end in chunk]
+            count += db.add_timespans(resolved)
+    return count
+
+
+def _parse_date_arg(value: str) -> datetime:
+    """argparse type for --since/--until."""
+    return datetime.fromisoformat(value)
+
+
+def main(argv=None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Import or export work hours timespans.")
+    parser.add_argument('command', choices=['export', 'import'])
+    parser.add_argument('file', help="File to write/read ('-' for stdout/stdin)")
+    parser.add_argument('--db', default='workhours.db', help="Database file")
+    parser.add_argument('--format', choices=FORMATS, default=None,
+                        help="File format (default: from the file extension, else csv)")
+    parser.add_argument('--since', type=_parse_date_arg, help="Export from this date/time")
+    parser.add_argument('--until', type=_parse_date_arg, help="Export up to this date/time")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('jsonl' if args.file.endswith('.jsonl') else 'csv')
+    db = Database(args.db)
+    try:
+        if args.command == 'export':
+            if args.file == '-':
+                count = export_timespans(db, sys.stdout, fmt, args.since, args.until)
+            else:
+                with open(args.file, 'w', newline='', encoding='utf-8') as fp:
+                    count = export_timespans(db, fp, fmt, args.since, args.until)
+            print(f"Exported {count} timespans", file=sys.stderr)
+        else:
+            if args.file == '-':
+                count = import_timespans(db, sys.stdin, fmt)
+            else:
+                with open(args.file, newline='', encoding='utf-8') as fp:
+                    count = import_timespans(db, fp, fmt)
+            print(f"Imported {count} timespans", file=sys.stderr)
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
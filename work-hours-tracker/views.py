@@ -0,0 +1,315 @@
+"""
+View models for work hours tracker.
+Keeps the data behind the GUI lists independent of tkinter, so it can be
+tested and benchmarked headless.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from database import Database, from_epoch_ms
+
+# (id, task_id, start_time, end_time, task_name), as returned by Database.get_timespans_page
+TimespanRow = Tuple[int, int, int, Optional[int], str]
+
+# (iid, parent_iid, text, values) for one Treeview item; '' is the root
+TreeRow = Tuple[str, str, str, tuple]
+
+
+def format_timespan(row: TimespanRow) -> Tuple[str, str, str, str]:
+    """Display values (task, start, end, duration) for a timespan row."""
+    timespan_id, task_id, start_ms, end_ms, task_name = row
+    start_time = from_epoch_ms(start_ms).strftime('%Y-%m-%d %H:%M:%S')
+    if end_ms is not None:
+        end_time = from_epoch_ms(end_ms).strftime('%Y-%m-%d %H:%M:%S')
+        duration = f"{(end_ms - start_ms) / 3600000:.2f}h"
+    else:
+        end_time = "Running..."
+        duration = "N/A"
+    return task_name, start_time, end_time, duration
+
+
+class TimespanWindow:
+    """Sliding window over the timespan history, newest first.
+
+    Only ``max_rows`` rows are kept. Pages are fetched with keyset cursors
+    when the user scrolls near either end, and rows that fall far outside
+    the visible area are dropped again, so memory and widget size stay
+    bounded however long the history is.
+    """
+
+    def __init__(self, db: Database, page_size: int = 200, max_rows: int = 1000):
+        """Create an empty window; call reset() to load the newest page."""
+        self.db = db
+        self.page_size = page_size
+        self.max_rows = max_rows
+        self.rows: List[TimespanRow] = []
+        self.has_newer = False
+        self.has_older = False
+
+    @staticmethod
+    def key(row: TimespanRow) -> Tuple[int, int]:
+        """Keyset cursor (start_time, id) of a row."""
+        return row[2], row[0]
+
+    def reset(self) -> List[TimespanRow]:
+        """Reload the window with the newest page and return its rows."""
+        self.rows = self.db.get_timespans_page(page_size=self.page_size)
+        self.has_newer = False
+        self.has_older = len(self.rows) == self.page_size
+        return self.rows
+
+    def load_older(self) -> Tuple[List[TimespanRow], List[TimespanRow]]:
+        """Append the next older page.
+
+        Returns:
+            (rows appended at the bottom, rows dropped from the top)
+        """
+        if not self.has_older or not self.rows:
+            return [], []
+        page = self.db.get_timespans_page(page_size=self.page_size,
+                                          after=self.key(self.rows[-1]))
+        self.has_older = len(page) == self.page_size
+        self.rows.extend(page)
+
+        dropped: List[TimespanRow] = []
+        if len(self.rows) > self.max_rows:
+            excess = len(self.rows) - self.max_rows
+            dropped, self.rows = self.rows[:excess], self.rows[excess:]
+            self.has_newer = True
+        return page, dropped
+
+    def load_newer(self) -> Tuple[List[TimespanRow], List[TimespanRow]]:
+        """Prepend the next newer page (only after older pages pushed it out).
+
+        Returns:
+            (rows inserted at the top, newest first; rows dropped from the bottom)
+        """
+        if not self.has_newer or not self.rows:
+            return [], []
+        page = self.db.get_timespans_page(page_size=self.page_size,
+                                          after=self.key(self.rows[0]),
+                                          newest_first=False)
+        self.has_newer = len(page) == self.page_size
+        page.reverse()
+        self.rows[:0] = page
+
+        dropped: List[TimespanRow] = []
+        if len(self.rows) > self.max_rows:
+            keep = self.max_rows
+            self.rows, dropped = self.rows[:keep], self.rows[keep:]
+            self.has_older = True
+        return page, dropped
+
+    def upsert(self, row: TimespanRow) -> Tuple[Optional[int], List[TimespanRow]]:
+        """Replace a changed row, or insert a new one if it falls inside the window.
+
+        Returns:
+            (index of the row in the window or None if it is outside it,
+             rows dropped from the bottom to stay within max_rows)
+        """
+        for index, current in enumerate(self.rows):
+            if current[0] == row[0]:
+                self.rows[index] = row
+                return index, []
+
+        key = self.key(row)
+        index = 0
+        while index < len(self.rows) and self.key(self.rows[index]) > key:
+            index += 1
+        if (index == 0 and self.has_newer) or (index == len(self.rows) and self.has_older):
+            return None, []
+        self.rows.insert(index, row)
+
+        dropped: List[TimespanRow] = []
+        if len(self.rows) > self.max_rows:
+            dropped, self.rows = self.rows[self.max_rows:], self.rows[:self.max_rows]
+            self.has_older = True
+        return index, dropped
+
+    def remove_tasks(self, task_ids: Iterable[int]) -> List[TimespanRow]:
+        """Drop the rows of deleted tasks and return them."""
+        task_ids = set(task_ids)
+        removed = [row for row in self.rows if row[1] in task_ids]
+        if removed:
+            self.rows = [row for row in self.rows if row[1] not in task_ids]
+        return removed
+
+    def find(self, timespan_id: int) -> Optional[TimespanRow]:
+        """Row of a timespan if it is currently inside the window."""
+        for row in self.rows:
+            if row[0] == timespan_id:
+                return row
+        return None
+
+
+class SummaryTotals:
+    """Persisted hours per task subtree, kept in memory for the summary view.
+
+    The running timer's time is not in the database until it stops, so the
+    view adds it on top: ``live_hours()`` returns the shown hours of the
+    running task and its ancestors without touching the database.
+    """
+
+    def __init__(self):
+        """Start without tasks."""
+        self.parents: Dict[int, Optional[int]] = {}
+        self.hours: Dict[int, float] = {}
+
+    def load(self, parents: Dict[int, Optional[int]], hours: Dict[int, float]):
+        """Replace everything with freshly computed totals."""
+        self.parents = dict(parents)
+        self.hours = dict(hours)
+
+    def add_task(self, task_id: int, parent_id: Optional[int], hours: float = 0.0):
+        """Register a new task."""
+        self.parents[task_id] = parent_id
+        self.hours[task_id] = hours
+
+    def remove_tasks(self, task_ids: Iterable[int]):
+        """Forget deleted tasks."""
+        for task_id in task_ids:
+            self.parents.pop(task_id, None)
+            self.hours.pop(task_id, None)
+
+    def ancestors(self, task_id: int) -> List[int]:
+        """The task itself followed by its parent, grandparent, ... up to the root."""
+        chain = []
+        current: Optional[int] = task_id
+        while current is not None and current in self.parents:
+            chain.append(current)
+            current = self.parents[current]
+        return chain
+
+    def live_hours(self, task_id: int, extra_hours: float) -> Dict[int, float]:
+        """Hours of a task and its ancestors with ``extra_hours`` of unsaved time added."""
+        return {ancestor_id: self.hours.get(ancestor_id, 0.0) + extra_hours
+                for ancestor_id in self.ancestors(task_id)}
+
+
+class TreeModel:
+    """Mirror of a ttk.Treeview's items that updates it with minimal changes.
+
+    ``apply()`` compares the wanted rows with what the widget already shows
+    and only inserts, moves, edits or deletes the items that differ. Items
+    that stay keep their open/closed state and selection. The widget can be
+    anything with Treeview's insert/move/item/delete methods.
+    """
+
+    def __init__(self):
+        """Start with an empty model (matching an empty widget)."""
+        self.rows: Dict[str, Tuple[str, str, tuple]] = {}
+        self.children: Dict[str, List[str]] = {'': []}
+
+    def apply(self, tree, rows: Iterable[TreeRow], open_new: bool = True) -> int:
+        """Make the widget show ``rows`` (pre-order: parents before children).
+
+        Returns:
+            Number of widget operations performed
+        """
+        wanted: Dict[str, Tuple[str, str, tuple]] = {}
+        wanted_children: Dict[str, List[str]] = {'': []}
+        for iid, parent, text, values in rows:
+            wanted[iid] = (parent, text, tuple(values))
+            wanted_children.setdefault(parent, []).append(iid)
+            wanted_children.setdefault(iid, [])
+        operations = 0
+
+        # Rescue kept items from under deleted parents, then delete top-most stale items
+        stale: Set[str] = {iid for iid in self.rows if iid not in wanted}
+        for iid in list(self.rows):
+            if iid in wanted and self.rows[iid][0] in stale:
+                self._move(tree, iid, '', len(self.children['']))
+                operations += 1
+        for iid in stale:
+            if self.rows[iid][0] not in stale:
+                tree.delete(iid)
+                self.children[self.rows[iid][0]].remove(iid)
+                operations += 1
+        for iid in stale:
+            del self.rows[iid]
+            self.children.pop(iid, None)
+
+        # Walk the wanted rows per parent, inserting or moving only what is out of place
+        for parent, iids in wanted_children.items():
+            for index, iid in enumerate(iids):
+                _, text, values = wanted[iid]
+                current = self.children.setdefault(parent, [])
+                if iid not in self.rows:
+                    tree.insert(parent, index, iid=iid, text=text, values=values, open=open_new)
+                    self.rows[iid] = (parent, text, values)
+                    current.insert(index, iid)
+                    self.children.setdefault(iid, [])
+                    operations += 1
+                    continue
+                if self.rows[iid][0] != parent or index >= len(current) or current[index] != iid:
+                    self._move(tree, iid, parent, index)
+                    operations += 1
+                if self.rows[iid][1:] != (text, values):
+                    tree.item(iid, text=text, values=values)
+                    self.rows[iid] = (parent, text, values)
+                    operations += 1
+        return operations
+
+    def set_row(self, tree, iid: str, parent: str, text: str, values: tuple,
+                index: Optional[int] = None) -> int:
+        """Insert or update a single item (appended to its parent unless index is given).
+
+        Returns:
+            Number of widget operations performed
+        """
+        values = tuple(values)
+        siblings = self.children.setdefault(parent, [])
+        if iid not in self.rows:
+            index = len(siblings) if index is None else index
+            tree.insert(parent, index, iid=iid, text=text, values=values, open=True)
+            siblings.insert(index, iid)
+            self.children.setdefault(iid, [])
+            self.rows[iid] = (parent, text, values)
+            return 1
+
+        operations = 0
+        if self.rows[iid][0] != parent:
+            self._move(tree, iid, parent, len(siblings) if index is None else index)
+            operations += 1
+        elif index is not None and siblings.index(iid) != index:
+            self._move(tree, iid, parent, index)
+            operations += 1
+        if self.rows[iid][1:] != (text, values):
+            tree.item(iid, text=text, values=values)
+            self.rows[iid] = (parent, text, values)
+            operations += 1
+        return operations
+
+    def set_values(self, tree, iid: str, values: tuple) -> int:
+        """Update the column values of an existing item (ignored if it is not shown)."""
+        if iid not in self.rows:
+            return 0
+        parent, text, _ = self.rows[iid]
+        return self.set_row(tree, iid, parent, text, values)
+
+    def remove(self, tree, iid: str) -> int:
+        """Delete an item and its descendants (ignored if it is not shown)."""
+        if iid not in self.rows:
+            return 0
+        tree.delete(iid)
+        self.children[self.rows[iid][0]].remove(iid)
+        stack = [iid]
+        while stack:
+            item = stack.pop()
+            stack.extend(self.children.pop(item, ()))
+            del self.rows[item]
+        return 1
+
+    def _move(self, tree, iid: str, parent: str, index: int):
+        """Move an item in the widget and in the model."""
+        old_parent, text, values = self.rows[iid]
+        self.children[old_parent].remove(iid)
+        tree.move(iid, parent, index)
+        self.children.setdefault(parent, []).insert(index, iid)
+        self.rows[iid] = (parent, text, values)
+
+    def clear(self, tree):
+        """Remove every item from the widget and the model."""
+        for iid in list(self.children['']):
+            tree.delete(iid)
+        self.rows.clear()
+        self.children = {'': []}